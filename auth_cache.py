@@ -0,0 +1,62 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Сколько заголовков Authorization помним и сколько секунд доверяем проверке
+AUTH_CACHE_SIZE = int(os.environ.get('AUTH_CACHE_SIZE', 10000))
+AUTH_CACHE_TTL = float(os.environ.get('AUTH_CACHE_TTL', 300))
+
+
+class AuthCache:
+    """
+    LRU-кэш проверенных заголовков Authorization: sha256(заголовок) -> (user_id, username).
+    Mini App шлет одну и ту же строку initData всю сессию, поэтому HMAC
+    и разбор строки нужны только на первом запросе.
+    Запись живет не дольше ttl и не дольше срока самого токена
+    (exp у JWT, auth_date + AUTH_MAX_AGE у initData).
+    Храним только успешные проверки: мусорные заголовки кэш не вытесняют.
+    """
+
+    def __init__(self, maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(header):
+        return hashlib.sha256(header.encode('utf-8')).digest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            identity, expires_at = entry
+            # Срок считаем по часам (exp и auth_date — unix time)
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return identity
+
+    def put(self, key, identity, expires_at=None):
+        if self.maxsize <= 0:
+            return
+        expires_at = min(time.time() + self.ttl, expires_at or float('inf'))
+        with self._lock:
+            self._entries[key] = (identity, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
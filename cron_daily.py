@@ -1,12 +1,20 @@
 import os
 import time
-import random
-import requests
+import socket
+from collections import deque
 from datetime import datetime, timedelta, timezone
-from sqlalchemy import create_engine, Column, Integer, BigInteger, Text, DateTime, func
+from sqlalchemy import create_engine, Column, Integer, BigInteger, Text, DateTime, Index, func, select, update, insert, delete, case, literal, cast, and_, or_, inspect, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.dialects.postgresql import JSONB
 
+from dictionary_store import DictionaryStore
+from word_engine import WordEngine
+from grid_generator import GridEvaluator, generate_grid, generate_quality_grid
+from tg_delivery import TelegramDelivery, SENT, FAILED
+from metrics import Registry, write_textfile
+from notification_hub import NOTIFY_CHANNEL
+import star_payments
+
 # --- КОНФИГУРАЦИЯ ---
 def get_db_url():
     user = os.environ.get('POSTGRES_USER')
@@ -63,6 +71,22 @@ class Notification(Base):
     type = Column(Text)
     data = Column(JSONB)
     created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    __table_args__ = (
+        # Уведомления игрока (/api/notifications, подтверждение пачкой)
+        Index('idx_notifications_user', 'telegram_id', 'id'),
+        # Очистка по возрасту (cron_daily.py cleanup)
+        Index('idx_notifications_created', 'created_at'),
+    )
+
+class ChallengePool(Base):
+    __tablename__ = 'challenge_pool'
+    id = Column(BigInteger, primary_key=True)
+    letters = Column(JSONB)
+    stats = Column(JSONB)
+    solutions = Column(JSONB)
+    challenge_id = Column(BigInteger)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    used_at = Column(DateTime(timezone=True))
 
 class Broadcast(Base):
     __tablename__ = 'broadcasts'
@@ -70,58 +94,243 @@ class Broadcast(Base):
     message = Column(Text)
     status = Column(Text, default='pending')
     sent_count = Column(BigInteger, default=0)
+    failed_count = Column(BigInteger, default=0)
+    total_count = Column(BigInteger)
+    last_telegram_id = Column(BigInteger)
+    started_at = Column(DateTime(timezone=True))
     processed_at = Column(DateTime(timezone=True))
+    # Аренда: какой запуск шлет рассылку и когда последний раз отметился
+    locked_by = Column(Text)
+    heartbeat_at = Column(DateTime(timezone=True))
+
+class Delivery(Base):
+    # Кому рассылка уже ушла: по этой таблице рассылка продолжается после перезапуска
+    __tablename__ = 'deliveries'
+    broadcast_id = Column(BigInteger, primary_key=True)
+    telegram_id = Column(BigInteger, primary_key=True)
+    status = Column(Text)
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
 
 # --- ГЕНЕРАТОР БУКВ ---
-VOWELS_UNIQUE = "АЕИОУЮЯ"
-COMMON_CONSONANTS = "БВГДЗКЛМНПРСТ"
-RARE_LIST = "ЙЦФЧШЩЬЫЖЭ"
-
-def generate_grid(level):
-    letters = []
-    target_vowels = 4 if level == 10 else 3 if level == 8 else 2
-    v_pool = list(VOWELS_UNIQUE)
-    random.shuffle(v_pool)
-    letters.extend(v_pool[:target_vowels])
-    
-    allow_rare = random.random() < 0.3
-    cons_pool = list(COMMON_CONSONANTS + RARE_LIST)
-    random.shuffle(cons_pool)
-    
-    rare_count = 0
-    for c in cons_pool:
-        if len(letters) >= level: break
-        if c in RARE_LIST:
-            if allow_rare and rare_count < 1:
-                letters.append(c)
-                rare_count += 1
-        else:
-            letters.append(c)
-            
-    if len(letters) < level:
-        backup = list(COMMON_CONSONANTS)
-        random.shuffle(backup)
-        letters.extend(backup[:level - len(letters)])
-        
-    random.shuffle(letters)
-    return letters
-
-def send_tg(chat_id, text):
-    if not BOT_TOKEN: return
-    
+# random — как раньше, вслепую; quality — перебор полей с оценкой по словарю
+GRID_MODE = os.environ.get('GRID_MODE', 'quality')
+
+def get_dictionary_path():
+    path = os.environ.get('DICTIONARY_PATH')
+    if path: return path
+    # api видит словарь в public/, планировщик — в data/ (см. docker-compose.yml)
+    for candidate in (os.path.join("public", "words.json"), os.path.join("data", "words.json"), os.path.join("data", "words_list.json")):
+        if os.path.exists(candidate):
+            return candidate
+    return os.path.join("public", "words.json")
+
+_evaluator = None
+
+def get_grid_evaluator():
+    global _evaluator
+    if _evaluator is None:
+        store = DictionaryStore(get_dictionary_path()).load()
+        _evaluator = GridEvaluator(WordEngine(store))
+    return _evaluator
+
+def generate_challenge_letters():
+    if GRID_MODE == 'quality':
+        evaluator = get_grid_evaluator()
+        if len(evaluator.engine.store):
+            letters = {}
+            for level in (10, 8, 6):
+                grid, stats = generate_quality_grid(evaluator, level)
+                print(f"🔤 Level {level}: {''.join(grid)} -> {stats}")
+                letters[str(level)] = grid
+            return letters
+        print("⚠️ Dictionary not found, falling back to random grids.")
+
+    return {
+        "10": generate_grid(10),
+        "8": generate_grid(8),
+        "6": generate_grid(6)
+    }
+
+# --- ПУЛ ИСПЫТАНИЙ ---
+# Сколько готовых испытаний держим про запас
+CHALLENGE_POOL_SIZE = int(os.environ.get('CHALLENGE_POOL_SIZE', 7))
+
+def build_pool_entry():
+    """Генерирует испытание вместе с решениями и статистикой по уровням"""
+    letters = generate_challenge_letters()
+    stats, solutions = {}, {}
+    if GRID_MODE == 'quality' and len(get_grid_evaluator().engine.store):
+        engine = get_grid_evaluator().engine
+        for level, grid in letters.items():
+            stats[level] = engine.solution_stats(grid, level)
+            solutions[level] = engine.solutions(grid)
+    return ChallengePool(letters=letters, stats=stats, solutions=solutions)
+
+def process_pool_refill(session):
+    print("🧺 Running CHALLENGE POOL REFILL...")
+    # Фоновая задача: не мешаем api, который может крутиться на той же машине
+    if hasattr(os, 'nice'):
+        os.nice(10)
+    ChallengePool.__table__.create(session.get_bind(), checkfirst=True)
+
+    available = session.query(func.count(ChallengePool.id)).filter(ChallengePool.challenge_id.is_(None)).scalar()
+    missing = CHALLENGE_POOL_SIZE - available
+    if missing <= 0:
+        print(f"Pool is full ({available}/{CHALLENGE_POOL_SIZE}).")
+        return
+
+    for _ in range(missing):
+        session.add(build_pool_entry())
+        # Коммитим по одному: если задачу прервут, готовое не пропадет
+        session.commit()
+    print(f"✅ Pool refilled: +{missing} (now {CHALLENGE_POOL_SIZE}).")
+
+def pop_pool_letters(session):
+    """Забирает самое старое готовое испытание из пула (None, если пул пуст)"""
     try:
-        url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-        res = requests.post(url, json={"chat_id": chat_id, "text": text, "parse_mode": "HTML"}, timeout=10)
-        result = res.json()
-        if not result.get('ok'):
-            print(f"❌ TG API Error (chat_id={chat_id}): {result}")
-    except Exception as e: 
-        print(f"❌ Send TG Exception: {e}")
+        entry = session.query(ChallengePool)\
+            .filter(ChallengePool.challenge_id.is_(None))\
+            .order_by(ChallengePool.id)\
+            .with_for_update(skip_locked=True)\
+            .first()
+    except Exception as e:
+        # Таблицы еще нет (refill ни разу не запускался)
+        print(f"⚠️ Challenge pool unavailable: {e}")
+        session.rollback()
+        return None
+    return entry
 
 import sys
 
 # ... (импорты и конфиг те же)
 
+# Метрики запуска пишутся в METRICS_DIR/cron_<mode>.prom (textfile collector),
+# scheduler.py отдает их вместе со своими по HTTP
+METRICS_DIR = os.environ.get('METRICS_DIR', 'metrics')
+cron_metrics = Registry()
+cron_stage_seconds = cron_metrics.gauge(
+    "slovodel_cron_stage_seconds", "Duration of cron job stages in the last run", ("job", "stage"))
+cron_stage_rows = cron_metrics.gauge(
+    "slovodel_cron_stage_rows", "Rows touched by cron job stages in the last run", ("job", "stage"))
+cron_messages = cron_metrics.gauge(
+    "slovodel_cron_telegram_messages", "Telegram messages processed in the last run", ("job", "status"))
+cron_telegram_retries = cron_metrics.gauge(
+    "slovodel_cron_telegram_retries", "Telegram retries and 429 responses in the last run", ("job", "kind"))
+cron_run_seconds = cron_metrics.gauge("slovodel_cron_run_seconds", "Duration of the last run", ("job",))
+cron_run_success = cron_metrics.gauge("slovodel_cron_run_success", "1 if the last run finished without an error", ("job",))
+cron_run_timestamp = cron_metrics.gauge("slovodel_cron_run_timestamp_seconds", "Unix time the last run finished", ("job",))
+
+def record_delivery_metrics(job, statuses, delivery):
+    for status, count in statuses.items():
+        cron_messages.set(count, job=job, status=status)
+    cron_telegram_retries.set(delivery.retries, job=job, kind="retry")
+    cron_telegram_retries.set(delivery.rate_limited, job=job, kind="rate_limited")
+
+# Награда за места в дейлике: место -> бонусов каждого вида
+PLACE_BONUSES = {1: 3, 2: 2, 3: 1}
+
+def json_object_func(session):
+    # В Postgres data — JSONB, в sqlite-фолбэке — обычный JSON
+    return func.jsonb_build_object if session.bind.dialect.name == 'postgresql' else func.json_object
+
+def text_arg(value):
+    # Аргументы jsonb_build_object нетипизированы, поэтому строки приводим явно
+    return cast(literal(value), Text)
+
+def finalize_challenge(session, challenge):
+    """
+    Подведение итогов испытания целиком на стороне базы, одной транзакцией:
+    места считаются RANK() (одинаковые очки — одно место, следующее пропускается),
+    бонусы и счетчики мест начисляются одним UPDATE ... FROM,
+    уведомления о победе — одним INSERT ... SELECT.
+    Маркер RESULTS_READY пишется в той же транзакции: если она откатится,
+    повторный запуск начнет все заново, а если прошла — итоги уже не задвоятся.
+    """
+    timings = []
+    started = stage_started = time.perf_counter()
+    def stage(name, rows):
+        nonlocal stage_started
+        now = time.perf_counter()
+        timings.append((name, now - stage_started, rows))
+        cron_stage_seconds.set(round(now - stage_started, 6), job="finalize", stage=name)
+        cron_stage_rows.set(rows, job="finalize", stage=name)
+        stage_started = now
+
+    # Блокируем строку испытания, чтобы параллельный запуск крона подождал нас
+    session.query(Challenge).filter_by(id=challenge.id).with_for_update().first()
+    marker = f"RESULTS_READY:{challenge.id}"
+    if session.query(Broadcast.id).filter(Broadcast.message == marker).first():
+        print(f"⚠️ Challenge #{challenge.id} results already processed. Skipping.")
+        session.rollback()
+        return
+    stage("lock", 1)
+
+    print(f"🏁 Finishing challenge #{challenge.id}")
+    game_date = (challenge.end_time - timedelta(days=1)).strftime("%d.%m.%Y") if challenge.end_time else \
+        (datetime.now(timezone.utc) - timedelta(days=1)).strftime("%d.%m.%Y")
+
+    ranked = select(
+        DailyScore.telegram_id,
+        DailyScore.score,
+        func.rank().over(order_by=DailyScore.score.desc()).label('rank'),
+    ).where(DailyScore.challenge_id == challenge.id).subquery('ranked')
+    winners = select(
+        ranked.c.telegram_id,
+        ranked.c.score,
+        ranked.c.rank,
+        case(*[(ranked.c.rank == place, bonus) for place, bonus in PLACE_BONUSES.items()], else_=0).label('bonus'),
+    ).where(ranked.c.rank <= max(PLACE_BONUSES)).subquery('winners')
+
+    participants = session.query(func.count(DailyScore.id)).filter(DailyScore.challenge_id == challenge.id).scalar()
+    stage("count", participants)
+
+    lb = Leaderboard.__table__
+    def place_counter(column, place):
+        return func.coalesce(column, 0) + case((winners.c.rank == place, 1), else_=0)
+    bonus_result = session.execute(
+        update(lb)
+        .where(lb.c.telegram_id == winners.c.telegram_id)
+        .values(
+            bonus_time=func.coalesce(lb.c.bonus_time, 0) + winners.c.bonus,
+            bonus_hint=func.coalesce(lb.c.bonus_hint, 0) + winners.c.bonus,
+            bonus_swap=func.coalesce(lb.c.bonus_swap, 0) + winners.c.bonus,
+            bonus_wildcard=func.coalesce(lb.c.bonus_wildcard, 0) + winners.c.bonus,
+            daily_1_place=place_counter(lb.c.daily_1_place, 1),
+            daily_2_place=place_counter(lb.c.daily_2_place, 2),
+            daily_3_place=place_counter(lb.c.daily_3_place, 3),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    stage("bonuses", bonus_result.rowcount)
+
+    # Салют в игре — только тем, у кого есть профиль (как и бонусы)
+    json_object = json_object_func(session)
+    notification_rows = select(
+        winners.c.telegram_id,
+        literal("daily_win"),
+        json_object(text_arg('rank'), winners.c.rank, text_arg('score'), winners.c.score,
+                    text_arg('bonus_amount'), winners.c.bonus, text_arg('date'), text_arg(game_date)),
+        func.now(),
+    ).select_from(winners.join(lb, lb.c.telegram_id == winners.c.telegram_id))
+    notif_result = session.execute(
+        insert(Notification.__table__).from_select(['telegram_id', 'type', 'data', 'created_at'], notification_rows)
+    )
+    stage("notifications", notif_result.rowcount)
+    if session.bind.dialect.name == 'postgresql':
+        # Сигнал воркерам API (LISTEN в notification_hub): Postgres доставит его при commit
+        session.execute(select(func.pg_notify(NOTIFY_CHANNEL, str(challenge.id))))
+
+    # Помечаем, что итоги подведены (создаем отложенную рассылку)
+    # Мы будем искать эту запись в 04:00
+    session.add(Broadcast(message=marker, status='pending_results'))
+    session.commit()
+    stage("commit", 1)
+
+    print(f"⏱ Challenge #{challenge.id} finalized in {time.perf_counter() - started:.3f}s ({participants} players)")
+    for name, seconds, rows in timings:
+        print(f"   {name:<14} {seconds * 1000:8.1f} ms  rows={rows}")
+
 def process_daily_update(session):
     print("🌅 Running DAILY UPDATE (00:00 UTC)...")
     
@@ -129,75 +338,81 @@ def process_daily_update(session):
     
     # 1. Завершаем старое испытание
     if last_challenge and (not last_challenge.end_time or last_challenge.end_time <= datetime.now(timezone.utc)):
-        # Проверка на идемпотентность: были ли уже подведены итоги?
-        existing_broadcast = session.query(Broadcast).filter(Broadcast.message == f"RESULTS_READY:{last_challenge.id}").first()
-        
-        if existing_broadcast:
-            print(f"⚠️ Challenge #{last_challenge.id} results already processed. Skipping.")
-        else:
-            print(f"🏁 Finishing challenge #{last_challenge.id}")
-            
-            scores = session.query(DailyScore).filter_by(challenge_id=last_challenge.id).order_by(DailyScore.score.desc()).all()
-            
-            if scores:
-                game_date = (last_challenge.end_time - timedelta(days=1)).strftime("%d.%m.%Y")
-                current_rank = 1
-                for i, s in enumerate(scores):
-                    if i > 0 and s.score < scores[i-1].score:
-                        current_rank = i + 1
-                    
-                    rank = current_rank
-                    bonus_amount = 3 if rank == 1 else 2 if rank == 2 else 1 if rank == 3 else 0
-                    
-                    user = session.query(Leaderboard).get(s.telegram_id)
-                    if user:
-                        # Начисляем бонусы
-                        if bonus_amount > 0:
-                            user.bonus_time = (user.bonus_time or 0) + bonus_amount
-                            user.bonus_hint = (user.bonus_hint or 0) + bonus_amount
-                            user.bonus_swap = (user.bonus_swap or 0) + bonus_amount
-                            user.bonus_wildcard = (user.bonus_wildcard or 0) + bonus_amount
-                            if rank == 1: user.daily_1_place += 1
-                            elif rank == 2: user.daily_2_place += 1
-                            elif rank == 3: user.daily_3_place += 1
-                            
-                            # Салют в игре
-                            notif = Notification(
-                                telegram_id=user.telegram_id,
-                                type="daily_win",
-                                data={"rank": rank, "score": s.score, "bonus_amount": bonus_amount, "date": game_date}
-                            )
-                            session.add(notif)
-            
-            # Помечаем, что итоги подведены (создаем отложенную рассылку)
-            # Мы будем искать эту запись в 04:00
-            session.add(Broadcast(message=f"RESULTS_READY:{last_challenge.id}", status='pending_results'))
-            session.commit()
+        finalize_challenge(session, last_challenge)
 
     # 2. Создаем новое
     if not last_challenge or (last_challenge.end_time and last_challenge.end_time <= datetime.now(timezone.utc)):
         print("🆕 Creating NEW challenge...")
-        new_letters = {
-            "10": generate_grid(10),
-            "8": generate_grid(8),
-            "6": generate_grid(6)
-        }
         next_deadline = (datetime.now(timezone.utc) + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
-        session.add(Challenge(letters=new_letters, end_time=next_deadline))
+        pool_entry = pop_pool_letters(session)
+        if pool_entry:
+            challenge = Challenge(letters=pool_entry.letters, end_time=next_deadline)
+            session.add(challenge)
+            session.flush()
+            pool_entry.challenge_id = challenge.id
+            pool_entry.used_at = datetime.now(timezone.utc)
+            print(f"🧺 Taken from pool: #{pool_entry.id}")
+        else:
+            print("⚠️ Challenge pool is empty, generating inline.")
+            session.add(Challenge(letters=generate_challenge_letters(), end_time=next_deadline))
         session.commit()
         print("✅ New challenge created.")
 
+# Сколько получателей читаем из базы за раз и как часто фиксируем прогресс
+DELIVERY_BATCH = int(os.environ.get('DELIVERY_BATCH', 500))
+DELIVERY_COMMIT_EVERY = int(os.environ.get('DELIVERY_COMMIT_EVERY', 100))
+
+def results_message(date_str, rank, score):
+    msg = f"🏁 <b>Итоги Дневного испытания ({date_str})</b>\n\nВы заняли <b>{rank}-е место</b> с результатом {score} очков!"
+    if rank <= 3:
+        msg += "\n\n🎉 ПОЗДРАВЛЯЕМ!\n🎁 Награда уже начислена!\n\n👏 Ждем вас в новом испытании!"
+    else:
+        msg += "\n\n💥 Попробуйте свои силы сегодня!\n👏 Ждем вас в новом испытании!"
+    return msg
+
+def iter_result_recipients(session, broadcast_id, challenge_id):
+    """
+    Участники испытания с местом (RANK(), как при подведении итогов),
+    которым эта рассылка еще не доставлялась. Читаем пачками по telegram_id.
+    """
+    ranked = select(
+        DailyScore.telegram_id,
+        DailyScore.score,
+        func.rank().over(order_by=DailyScore.score.desc()).label('rank'),
+    ).where(DailyScore.challenge_id == challenge_id).subquery('ranked')
+    query = select(ranked.c.telegram_id, ranked.c.score, ranked.c.rank)\
+        .outerjoin(Delivery, and_(Delivery.broadcast_id == broadcast_id, Delivery.telegram_id == ranked.c.telegram_id))\
+        .where(Delivery.telegram_id.is_(None))\
+        .order_by(ranked.c.telegram_id)\
+        .limit(DELIVERY_BATCH)
+    last_id = None
+    while True:
+        page = query if last_id is None else query.where(ranked.c.telegram_id > last_id)
+        rows = session.execute(page).all()
+        if not rows:
+            return
+        yield from rows
+        last_id = rows[-1].telegram_id
+
 def process_notifications(session):
     print("📢 Running NOTIFICATIONS (04:00 UTC)...")
+    Delivery.__table__.create(session.get_bind(), checkfirst=True)
     
-    # Ищем отложенные результаты
-    pending = session.query(Broadcast).filter_by(status='pending_results').first()
+    # Ищем отложенные результаты (или прерванную рассылку)
+    pending = session.query(Broadcast)\
+        .filter(Broadcast.status.in_(['pending_results', 'sending_results']))\
+        .order_by(Broadcast.id).first()
     if not pending:
         print("No pending results to broadcast.")
         return
 
     challenge_id = int(pending.message.split(':')[1])
-    print(f"Broadcasting results for challenge #{challenge_id}")
+    if pending.status == 'sending_results':
+        print(f"Resuming results broadcast for challenge #{challenge_id}")
+    else:
+        print(f"Broadcasting results for challenge #{challenge_id}")
+    pending.status = 'sending_results'
+    session.commit()
     
     # Получаем дату челленджа для заголовка
     challenge = session.query(Challenge).get(challenge_id)
@@ -207,48 +422,273 @@ def process_notifications(session):
     else:
         # Fallback на вчерашнюю дату
         date_str = (datetime.now(timezone.utc) - timedelta(days=1)).strftime("%d.%m.%Y")
-    
-    scores = session.query(DailyScore).filter_by(challenge_id=challenge_id).order_by(DailyScore.score.desc()).all()
-    
-    current_rank = 1
-    sent_count = 0
-    
-    for i, s in enumerate(scores):
-        if i > 0 and s.score < scores[i-1].score:
-            current_rank = i + 1
-        
-        rank = current_rank
-        msg = f"🏁 <b>Итоги Дневного испытания ({date_str})</b>\n\nВы заняли <b>{rank}-е место</b> с результатом {s.score} очков!"
-        if rank <= 3:
-            msg += "\n\n🎉 ПОЗДРАВЛЯЕМ!\n🎁 Награда уже начислена!\n\n👏 Ждем вас в новом испытании!"
-        else:
-            msg += "\n\n💥 Попробуйте свои силы сегодня!\n👏 Ждем вас в новом испытании!"
-        
-        send_tg(s.telegram_id, msg)
-        sent_count += 1
-        time.sleep(0.05)
-        
+
+    delivery = TelegramDelivery(BOT_TOKEN)
+    messages = ((r.telegram_id, results_message(date_str, r.rank, r.score))
+                for r in iter_result_recipients(session, pending.id, challenge_id))
+
+    started = time.perf_counter()
+    processed = 0
+    statuses = {}
+    for chat_id, status, error in delivery.deliver(messages):
+        session.add(Delivery(broadcast_id=pending.id, telegram_id=chat_id, status=status, error=error))
+        if error:
+            print(f"❌ TG delivery failed (chat_id={chat_id}): {error}")
+        processed += 1
+        statuses[status] = statuses.get(status, 0) + 1
+        if processed % DELIVERY_COMMIT_EVERY == 0:
+            session.commit()
+    session.commit()
+    elapsed = time.perf_counter() - started
+    record_delivery_metrics("notify", statuses, delivery)
+
+    # Итог по всем запускам этой рассылки, а не только по текущему
+    totals = dict(session.query(Delivery.status, func.count()).filter(Delivery.broadcast_id == pending.id).group_by(Delivery.status).all())
     pending.status = 'sent'
-    pending.sent_count = sent_count
+    pending.sent_count = totals.get(SENT, 0)
     pending.processed_at = datetime.now(timezone.utc)
     session.commit()
-    print(f"✅ Broadcast complete. Sent: {sent_count}")
+    rate = processed / elapsed if elapsed > 0 else 0
+    print(f"✅ Broadcast complete. Sent: {pending.sent_count}, failed: {sum(totals.values()) - pending.sent_count}. "
+          f"This run: {processed} in {elapsed:.1f}s ({rate:.1f} msg/s, 429s: {delivery.rate_limited}, retries: {delivery.retries})")
+
+# Как часто сохраняем прогресс рассылки от админа (число обработанных получателей)
+BROADCAST_PROGRESS_EVERY = int(os.environ.get('BROADCAST_PROGRESS_EVERY', 200))
+# Прогресс и отметка аренды не реже чем раз в столько секунд (ответы 429 могут надолго задержать отправку)
+BROADCAST_HEARTBEAT_EVERY = float(os.environ.get('BROADCAST_HEARTBEAT_EVERY', 30))
+# Рассылка sending без отметки дольше этого (минуты) считается брошенной, ее подхватывает следующий запуск
+BROADCAST_LEASE_MINUTES = float(os.environ.get('BROADCAST_LEASE_MINUTES', 10))
+
+def ensure_broadcast_columns(session):
+    # Миграция существующей базы: колонок аренды в старом init_db.sql не было
+    bind = session.get_bind()
+    existing = {c['name'] for c in inspect(bind).get_columns(Broadcast.__tablename__)}
+    with bind.begin() as conn:
+        for name in ('locked_by', 'heartbeat_at'):
+            if name not in existing:
+                column = Broadcast.__table__.c[name]
+                conn.execute(text(f"ALTER TABLE broadcasts ADD COLUMN {name} {column.type.compile(bind.dialect)}"))
+
+def renew_broadcast_lease(session, job, owner):
+    """
+    Коммитит прогресс рассылки вместе с отметкой аренды. Если аренду уже забрал
+    другой запуск (эта отметилась слишком давно), откатывает прогресс и возвращает False.
+    """
+    with session.no_autoflush:
+        renewed = session.execute(
+            update(Broadcast)
+            .where(Broadcast.id == job.id, Broadcast.locked_by == owner)
+            .values(heartbeat_at=datetime.now(timezone.utc)),
+            execution_options={"synchronize_session": False}).rowcount
+    if not renewed:
+        session.rollback()
+        return False
+    session.commit()
+    return True
+
+def iter_broadcast_recipients(engine, after_id=None):
+    """
+    Все игроки по возрастанию telegram_id. Читаем серверным курсором
+    на отдельном соединении: память не растет, а коммиты прогресса
+    в основной сессии курсор не закрывают.
+    """
+    query = select(Leaderboard.telegram_id).order_by(Leaderboard.telegram_id)
+    if after_id is not None:
+        query = query.where(Leaderboard.telegram_id > after_id)
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=1000).execute(query)
+        for (telegram_id,) in result:
+            yield telegram_id
+
+def run_broadcast_job(session, job, owner):
+    """(обработано, delivery, аренда все еще наша)"""
+    delivery = TelegramDelivery(BOT_TOKEN)
+    # Прогресс сохраняем как telegram_id, до которого включительно все обработаны.
+    # Сообщения завершаются не по порядку, поэтому двигаем отметку по очереди отправки
+    submitted = deque()
+    done = set()
+    def messages():
+        for telegram_id in iter_broadcast_recipients(session.get_bind(), job.last_telegram_id):
+            submitted.append(telegram_id)
+            yield telegram_id, job.message
+
+    processed = 0
+    heartbeat = time.monotonic()
+    results = delivery.deliver(messages())
+    for chat_id, status, error in results:
+        if status == SENT:
+            job.sent_count = (job.sent_count or 0) + 1
+        else:
+            job.failed_count = (job.failed_count or 0) + 1
+        done.add(chat_id)
+        while submitted and submitted[0] in done:
+            done.discard(submitted[0])
+            job.last_telegram_id = submitted.popleft()
+        processed += 1
+        if processed % BROADCAST_PROGRESS_EVERY == 0 or time.monotonic() - heartbeat >= BROADCAST_HEARTBEAT_EVERY:
+            if not renew_broadcast_lease(session, job, owner):
+                # Новых сообщений не берем, дожидаемся только тех, что уже в полете
+                results.close()
+                return processed, delivery, False
+            heartbeat = time.monotonic()
+    return processed, delivery, True
+
+def process_broadcast_jobs(session):
+    """
+    Рассылки от админа (/api/broadcast ставит их в очередь со статусом queued).
+    Рассылку в статусе sending шлет другой запуск, пока он отмечается в heartbeat_at.
+    Отметки нет дольше BROADCAST_LEASE_MINUTES — запуск упал: продолжаем с
+    last_telegram_id, повторно могут уйти только сообщения, которые были в полете.
+    """
+    print("📣 Running BROADCAST JOBS...")
+    ensure_broadcast_columns(session)
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    while True:
+        stale = datetime.now(timezone.utc) - timedelta(minutes=BROADCAST_LEASE_MINUTES)
+        job = session.query(Broadcast)\
+            .filter(or_(Broadcast.status == 'queued',
+                        and_(Broadcast.status == 'sending',
+                             or_(Broadcast.heartbeat_at.is_(None), Broadcast.heartbeat_at < stale))))\
+            .order_by(Broadcast.id)\
+            .with_for_update(skip_locked=True)\
+            .first()
+        if not job:
+            print("No queued broadcasts.")
+            return
+        if job.status == 'queued':
+            job.total_count = session.query(func.count(Leaderboard.telegram_id)).scalar()
+            job.sent_count = 0
+            job.failed_count = 0
+            job.started_at = datetime.now(timezone.utc)
+            print(f"Starting broadcast #{job.id} to {job.total_count} players")
+        else:
+            print(f"Resuming broadcast #{job.id} after telegram_id {job.last_telegram_id} (lease of {job.locked_by} expired)")
+        job.status = 'sending'
+        job.locked_by = owner
+        job.heartbeat_at = datetime.now(timezone.utc)
+        session.commit()
+
+        job_id = job.id
+        started = time.perf_counter()
+        sent_before, failed_before = job.sent_count or 0, job.failed_count or 0
+        processed, delivery, owned = run_broadcast_job(session, job, owner)
+        elapsed = time.perf_counter() - started
+        if owned:
+            record_delivery_metrics("broadcast", {SENT: job.sent_count - sent_before,
+                                                  FAILED: job.failed_count - failed_before}, delivery)
+            job.status = 'sent'
+            job.processed_at = datetime.now(timezone.utc)
+            owned = renew_broadcast_lease(session, job, owner)
+        if not owned:
+            print(f"⚠️ Broadcast #{job_id} was taken over by another run, stopping after {processed} messages")
+            continue
+        rate = processed / elapsed if elapsed > 0 else 0
+        print(f"✅ Broadcast #{job.id} complete. Sent: {job.sent_count}, failed: {job.failed_count}. "
+              f"This run: {processed} in {elapsed:.1f}s ({rate:.1f} msg/s, 429s: {delivery.rate_limited})")
+
+# Неразобранные уведомления старше NOTIFICATION_TTL_DAYS дней удаляются (0 — хранить вечно)
+NOTIFICATION_TTL_DAYS = int(os.environ.get('NOTIFICATION_TTL_DAYS', 30))
+# Удаляем пачками: каждая — короткая транзакция, таблица не блокируется надолго
+NOTIFICATION_CLEANUP_BATCH = int(os.environ.get('NOTIFICATION_CLEANUP_BATCH', 5000))
+NOTIFICATION_CLEANUP_PAUSE = float(os.environ.get('NOTIFICATION_CLEANUP_PAUSE', 0.1))
+
+def ensure_notification_indexes(session):
+    # Миграция существующей базы: в старом init_db.sql индексов на notifications не было
+    for index in Notification.__table__.indexes:
+        index.create(session.get_bind(), checkfirst=True)
+
+def cleanup_notifications(session, cutoff=None):
+    """Удаляет уведомления старше cutoff пачками по NOTIFICATION_CLEANUP_BATCH строк"""
+    if cutoff is None:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=NOTIFICATION_TTL_DAYS)
+    table = Notification.__table__
+    started = time.perf_counter()
+    total = batches = 0
+    while True:
+        batch = select(table.c.id).where(table.c.created_at < cutoff).order_by(table.c.id).limit(NOTIFICATION_CLEANUP_BATCH)
+        result = session.execute(delete(table).where(table.c.id.in_(batch.scalar_subquery())))
+        session.commit()
+        total += result.rowcount
+        batches += 1
+        if result.rowcount < NOTIFICATION_CLEANUP_BATCH:
+            break
+        time.sleep(NOTIFICATION_CLEANUP_PAUSE)
+    elapsed = time.perf_counter() - started
+    cron_stage_seconds.set(round(elapsed, 3), job="cleanup", stage="notifications")
+    cron_stage_rows.set(total, job="cleanup", stage="notifications")
+    return total, batches, elapsed
+
+def process_cleanup(session):
+    print("🧹 Running CLEANUP...")
+    ensure_notification_indexes(session)
+    if not NOTIFICATION_TTL_DAYS:
+        print("NOTIFICATION_TTL_DAYS=0, notifications are kept forever.")
+        return
+    total, batches, elapsed = cleanup_notifications(session)
+    print(f"✅ Deleted {total} notifications older than {NOTIFICATION_TTL_DAYS} days in {batches} batches ({elapsed:.1f}s)")
+
+def process_payments(session):
+    """
+    Сверка платежей звездами: дотягиваем новые транзакции бота и начисляем монеты
+    за те, что игроки не подтвердили сами (закрыли приложение до /api/payment/verify)
+    """
+    print("💳 Running PAYMENTS reconciliation...")
+    if not BOT_TOKEN:
+        print("BOT_TOKEN missing, skipping.")
+        return
+    delivery = TelegramDelivery(BOT_TOKEN)
+    bind = session.get_bind()
+    star_payments.ensure_tables(bind)
+    fetch_page = star_payments.star_page_fetcher(delivery.call)
+    started = time.perf_counter()
+    with bind.connect() as conn:
+        added = star_payments.sync_transactions(conn, fetch_page)
+        # Свежие платежи начисляет /api/payment/verify: иначе проверка из приложения
+        # не найдет платеж и клиент перезапишет начисленное старым балансом
+        credited = star_payments.credit_pending(conn, grace=star_payments.STAR_CREDIT_GRACE)
+    elapsed = time.perf_counter() - started
+    cron_stage_seconds.set(round(elapsed, 3), job="payments", stage="reconcile")
+    cron_stage_rows.set(added, job="payments", stage="fetched")
+    cron_stage_rows.set(len(credited), job="payments", stage="credited")
+    for telegram_id, tx_id, coins in credited:
+        print(f"💰 Credited {coins} coins to {telegram_id} (tx {tx_id})")
+        delivery.send(telegram_id, f"💰 <b>Покупка успешна!</b>\nНачислено: {coins} монет.")
+    print(f"✅ Payments: {added} new transactions, {len(credited)} credited ({elapsed:.1f}s)")
 
 def main():
     engine = create_engine(DATABASE_URL)
     Session = sessionmaker(bind=engine)
     session = Session()
 
-    if len(sys.argv) > 1:
-        mode = sys.argv[1]
-        if mode == 'update':
-            process_daily_update(session)
-        elif mode == 'notify':
-            process_notifications(session)
-        else:
-            print("Unknown mode. Use 'update' or 'notify'.")
-    else:
-        print("Please provide a mode: 'update' or 'notify'.")
+    jobs = {
+        'update': process_daily_update,
+        'notify': process_notifications,
+        'refill': process_pool_refill,
+        'broadcast': process_broadcast_jobs,
+        'cleanup': process_cleanup,
+        'payments': process_payments,
+    }
+    if len(sys.argv) < 2:
+        print("Please provide a mode: 'update', 'notify', 'refill', 'broadcast', 'cleanup' or 'payments'.")
+        return
+    mode = sys.argv[1]
+    if mode not in jobs:
+        print("Unknown mode. Use 'update', 'notify', 'refill', 'broadcast', 'cleanup' or 'payments'.")
+        return
+
+    started = time.perf_counter()
+    success = 0
+    try:
+        jobs[mode](session)
+        success = 1
+    finally:
+        cron_run_seconds.set(round(time.perf_counter() - started, 3), job=mode)
+        cron_run_success.set(success, job=mode)
+        cron_run_timestamp.set(int(time.time()), job=mode)
+        try:
+            write_textfile(os.path.join(METRICS_DIR, f"cron_{mode}.prom"), cron_metrics)
+        except OSError as e:
+            print(f"⚠️ Failed to write metrics: {e}")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
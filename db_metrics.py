@@ -0,0 +1,74 @@
+import os
+import time
+
+from sqlalchemy import event
+
+# Запрос, сделавший больше запросов к базе, попадает в лог (видно N+1)
+DB_QUERY_WARN = int(os.environ.get('DB_QUERY_WARN', 20))
+
+
+def engine_options(url):
+    """
+    Настройки пула из окружения. Пул у каждого воркера gunicorn свой:
+    всего соединений до workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+    """
+    options = {
+        # Проверка соединения перед выдачей из пула: после рестарта Postgres
+        # мертвые соединения тихо заменяются, а не падают в запросе
+        "pool_pre_ping": os.environ.get('DB_POOL_PRE_PING', '1') == '1',
+    }
+    if url.startswith("sqlite"):
+        return options
+    options.update({
+        "pool_size": int(os.environ.get('DB_POOL_SIZE', 5)),
+        "max_overflow": int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        "pool_timeout": float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        # Соединения старше DB_POOL_RECYCLE секунд пересоздаются
+        "pool_recycle": int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    })
+    statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+    if statement_timeout and url.startswith("postgresql"):
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout}"}
+    return options
+
+
+class QueryStats:
+    """Счетчик запросов к базе и суммарного времени (на один HTTP-запрос)"""
+    __slots__ = ('queries', 'seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+def instrument_engine(engine, current_stats):
+    """
+    Вешает на engine подсчет запросов. current_stats() возвращает QueryStats
+    текущего HTTP-запроса или None (фоновые потоки, cron) — тогда считаются
+    только общие итоги. Возвращает общий QueryStats процесса.
+    """
+    totals = QueryStats()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        elapsed = time.perf_counter() - started
+        totals.queries += 1
+        totals.seconds += elapsed
+        stats = current_stats()
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        # Запрос упал — снимаем его отметку времени, чтобы стек не рос
+        conn = exception_context.connection
+        if conn is not None and conn.info.get('query_started'):
+            conn.info['query_started'].pop()
+
+    return totals
@@ -0,0 +1,186 @@
+import os
+import sys
+import mmap
+import zlib
+import struct
+from bisect import bisect_left, bisect_right
+
+from word_engine import GAME_WORD_RE, MIN_WORD_LENGTH, normalize_game_word, letters_mask
+
+# Бинарный снимок словаря (words.bin рядом с words.json).
+#
+# Заголовок: магия, версия формата, число слов, число игровых слов,
+# размер и mtime words.json, из которого собран файл (по ним видно, что снимок устарел),
+# затем таблица секций (смещение, длина). Секции выровнены на 4 байта:
+#   ENTRY_OFFSETS  u32 x (n+1)  границы слов в ENTRY_WORDS
+#   ENTRY_WORDS    UTF-8 слова подряд, отсортированы по байтам (= по кодам символов)
+#   HASH_SLOTS     u32 x 2^k    хеш-таблица с открытой адресацией: crc32(слово) -> номер слова + 1
+#   DEF_OFFSETS    u32 x (n+1)  границы определений в DEFS (пустое — нет определения)
+#   DEFS           UTF-8 определения подряд, в порядке слов
+#   GAME_OFFSETS   u32 x (m+1)  границы игровых слов (ё -> е, только буквы поля)
+#   GAME_WORDS     UTF-8 игровые слова, отсортированы
+#   GAME_MASKS     u32 x m      маска букв каждого игрового слова (word_engine.letters_mask)
+#
+# Поиск слова — crc32 и одна-две пробы в HASH_SLOTS прямо в отображенном файле;
+# порядок слов при этом отсортированный (итерация, поиск по префиксу).
+# Файл открывается через mmap, и все процессы делят одни страницы кэша ОС.
+
+MAGIC = b"SLVDICT1"
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sIIIQQ')
+SECTIONS = ("entry_offsets", "entry_words", "hash_slots", "def_offsets", "defs", "game_offsets", "game_words", "game_masks")
+SECTION = struct.Struct('<QQ')
+
+
+def _u32_array(values):
+    return struct.pack(f'<{len(values)}I', *values)
+
+
+def _hash_slots(keys):
+    # Заполнение не больше половины: в среднем меньше двух проб на поиск
+    size = 1 << max(3, (2 * len(keys) - 1).bit_length())
+    slots = [0] * size
+    for i, key in enumerate(keys):
+        h = zlib.crc32(key) & (size - 1)
+        while slots[h]:
+            h = (h + 1) & (size - 1)
+        slots[h] = i + 1
+    return _u32_array(slots)
+
+
+def _blob(strings):
+    offsets = [0]
+    parts = []
+    size = 0
+    for s in strings:
+        data = s.encode('utf-8')
+        parts.append(data)
+        size += len(data)
+        offsets.append(size)
+    return _u32_array(offsets), b"".join(parts)
+
+
+def build_binary(entries, source=(0, 0)):
+    """
+    entries — пары (нормализованное слово, определение или None).
+    source — (размер, mtime_ns) исходного words.json. Возвращает bytes файла.
+    """
+    definitions = dict(entries)
+    words = sorted(definitions)
+    entry_offsets, entry_words = _blob(words)
+    hash_slots = _hash_slots([w.encode('utf-8') for w in words])
+    def_offsets, defs = _blob(definitions[w] or '' for w in words)
+
+    game = {}
+    for word in words:
+        game_word = normalize_game_word(word)
+        if len(game_word) >= MIN_WORD_LENGTH and GAME_WORD_RE.match(game_word):
+            game[game_word] = letters_mask(game_word)
+    game_words = sorted(game)
+    game_offsets, game_blob = _blob(game_words)
+    game_masks = _u32_array([game[w] for w in game_words])
+
+    sections = [entry_offsets, entry_words, hash_slots, def_offsets, defs, game_offsets, game_blob, game_masks]
+    position = HEADER.size + SECTION.size * len(sections)
+    table, body = [], []
+    for data in sections:
+        padding = -position % 4
+        body.append(b"\0" * padding)
+        position += padding
+        table.append(SECTION.pack(position, len(data)))
+        body.append(data)
+        position += len(data)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(words), len(game_words), source[0], source[1])
+    return header + b"".join(table) + b"".join(body)
+
+
+def write_binary(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    # rename атомарен: открытые mmap старого файла остаются рабочими
+    os.replace(tmp_path, path)
+
+
+class BinaryDictionary:
+    """
+    Словарь поверх буфера в формате build_binary: bytes или mmap файла (open()).
+    Строки не разбираются заранее: слово и определение декодируются при обращении.
+    """
+
+    def __init__(self, buffer):
+        if sys.byteorder != 'little':
+            raise ValueError("binary dictionary requires a little-endian host")
+        self._buffer = buffer
+        magic, version, self.count, self.game_count, size, mtime_ns = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("not a dictionary snapshot or unsupported version")
+        self.source = (size, mtime_ns)
+        view = memoryview(buffer)
+        parts = {}
+        for i, name in enumerate(SECTIONS):
+            offset, length = SECTION.unpack_from(buffer, HEADER.size + SECTION.size * i)
+            parts[name] = view[offset:offset + length]
+        self._entry_offsets = parts["entry_offsets"].cast('I')
+        self._entry_words = parts["entry_words"]
+        self._hash_slots = parts["hash_slots"].cast('I')
+        self._def_offsets = parts["def_offsets"].cast('I')
+        self._defs = parts["defs"]
+        self._game_offsets = parts["game_offsets"].cast('I')
+        self._game_words = parts["game_words"]
+        self._game_masks = parts["game_masks"].cast('I')
+
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self):
+        return self.count
+
+    def _word_bytes(self, i):
+        return self._entry_words[self._entry_offsets[i]:self._entry_offsets[i + 1]].tobytes()
+
+    def word(self, i):
+        return self._word_bytes(i).decode('utf-8')
+
+    def definition(self, i):
+        start, end = self._def_offsets[i], self._def_offsets[i + 1]
+        return str(self._defs[start:end], 'utf-8') if end > start else None
+
+    def find(self, word):
+        """Позиция слова или -1 (слово уже нормализовано)"""
+        key = word.encode('utf-8')
+        slots, offsets, blob = self._hash_slots, self._entry_offsets, self._entry_words
+        mask = len(slots) - 1
+        h = zlib.crc32(key) & mask
+        while True:
+            i = slots[h]
+            if not i:
+                return -1
+            if blob[offsets[i - 1]:offsets[i]] == key:
+                return i - 1
+            h = (h + 1) & mask
+
+    def get(self, word):
+        i = self.find(word)
+        return {"word": word, "definition": self.definition(i)} if i >= 0 else None
+
+    def prefix_range(self, prefix):
+        """Номера слов [lo, hi), начинающихся с prefix — двоичный поиск по отсортированным словам"""
+        key = prefix.encode('utf-8')
+        lo = bisect_left(range(self.count), key, key=self._word_bytes)
+        hi = bisect_right(range(self.count), key, lo=lo, key=lambda i: self._word_bytes(i)[:len(key)])
+        return lo, hi
+
+    def words(self):
+        for i in range(self.count):
+            yield self.word(i)
+
+    def game_items(self):
+        """(игровое слово, маска букв) — для индекса WordEngine без пересчета масок"""
+        offsets, blob, masks = self._game_offsets, self._game_words, self._game_masks
+        for i in range(self.game_count):
+            yield str(blob[offsets[i]:offsets[i + 1]], 'utf-8'), masks[i]
@@ -0,0 +1,364 @@
+import os
+import json
+import threading
+from itertools import islice
+
+from dictionary_binary import BinaryDictionary, build_binary, write_binary
+
+try:
+    import fcntl  # Межпроцессная блокировка (gunicorn воркеры). На Windows её нет.
+except ImportError:
+    fcntl = None
+
+# Сколько операций копим в журнале до принудительного сжатия
+COMPACT_THRESHOLD = int(os.environ.get('DICT_JOURNAL_THRESHOLD', 200))
+# Через сколько секунд тишины после последней правки журнал сливается в words.json
+COMPACT_DELAY = float(os.environ.get('DICT_COMPACT_DELAY', 30))
+
+
+def normalize_word(word):
+    """Ключ индекса: слово без пробелов по краям и в нижнем регистре"""
+    return (word or '').strip().lower()
+
+
+def binary_path_for(path):
+    """words.json -> words.bin"""
+    return os.path.splitext(path)[0] + ".bin"
+
+
+def read_entries(path):
+    """Пары (нормализованное слово, определение) из words.json"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for item in json.load(f):
+            # words_list.json — просто список строк без определений
+            if isinstance(item, str):
+                item = {"word": item}
+            word = normalize_word(item.get('word'))
+            if word:
+                yield word, item.get('definition')
+
+
+class _FileLock:
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        if fcntl:
+            self._fd = open(self.path, 'a')
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._fd:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            self._fd.close()
+            self._fd = None
+
+
+class DictionaryStore:
+    """
+    Словарь (words.json). Снимок читается из бинарного words.bin рядом с ним
+    (dictionary_binary), отображенного в память через mmap: воркеры gunicorn
+    делят одни страницы, а поиск — двоичный по отсортированным словам.
+    words.bin собирается из words.json, если его нет или он собран по другой
+    версии файла. Если words.json подменили на диске (другой воркер,
+    sync_dictionary.py и т.п.), это видно по mtime/inode/size — тогда словарь перечитывается.
+
+    Правки не переписывают words.json, а дописываются строкой в журнал
+    (words.journal, JSON Lines). Чтение = снимок + журнал. Журнал сливается
+    в снимок в фоне (после паузы или по порогу) через атомарную замену файла.
+    Правки из журнала живут в памяти процесса поверх снимка: {слово: запись или None}.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        base_dir = os.path.dirname(path)
+        self.list_path = os.path.join(base_dir, "words_list.json")
+        self.binary_path = binary_path_for(path)
+        self.journal_path = os.path.join(base_dir, "words.journal")
+        self.lock_path = os.path.join(base_dir, ".words.lock")
+        self._lock = threading.RLock()
+        self._base = None
+        self._overlay = {}
+        self._count = 0
+        self._signature = None
+        self._journal_inode = None
+        self._journal_offset = 0
+        self._journal_ops = 0
+        self._compact_timer = None
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.compactions = 0
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+    def _journal_stat(self):
+        try:
+            st = os.stat(self.journal_path)
+        except FileNotFoundError:
+            return None, 0
+        return st.st_ino, st.st_size
+
+    def _open_snapshot(self, signature):
+        """words.bin для текущего words.json: готовый или собранный заново"""
+        if signature is None:
+            return BinaryDictionary(build_binary(()))
+        source = (signature[2], signature[0])
+        try:
+            snapshot = BinaryDictionary.open(self.binary_path)
+            if snapshot.source == source:
+                return snapshot
+        except (OSError, ValueError):
+            pass
+        data = build_binary(read_entries(self.path), source)
+        try:
+            write_binary(self.binary_path, data)
+        except OSError:
+            # Папка только для чтения: снимок остается в памяти этого процесса
+            return BinaryDictionary(data)
+        return BinaryDictionary.open(self.binary_path)
+
+    def _open(self, signature):
+        self._base = self._open_snapshot(signature)
+        self._overlay = {}
+        self._count = len(self._base)
+        self._signature = signature
+        self._journal_inode, _ = self._journal_stat()
+        self._journal_offset = 0
+        self._journal_ops = 0
+
+    def _load(self, signature):
+        self._open(signature)
+        self._replay_journal()
+        self.version += 1
+        self.reloads += 1
+
+    def _replay_journal(self):
+        """Применяет к памяти хвост журнала, который мы еще не видели"""
+        applied = 0
+        if self._journal_inode is None:
+            return applied
+        with open(self.journal_path, 'rb') as f:
+            f.seek(self._journal_offset)
+            for line in f:
+                # Недописанная строка (падение посреди записи) — игнорируем хвост
+                if not line.endswith(b'\n'):
+                    break
+                self._journal_offset += len(line)
+                try:
+                    op = json.loads(line)
+                except ValueError:
+                    continue
+                self._apply(op)
+                self._journal_ops += 1
+                applied += 1
+        return applied
+
+    def _lookup(self, word):
+        if word in self._overlay:
+            return self._overlay[word]
+        return self._base.get(word)
+
+    def _apply(self, op):
+        word = normalize_word(op.get('word'))
+        entry = self._lookup(word)
+        if op.get('op') == 'delete':
+            if entry is not None:
+                self._overlay[word] = None
+                self._count -= 1
+        elif op.get('op') == 'update':
+            if entry is not None:
+                self._overlay[word] = dict(entry, definition=op.get('definition'))
+        elif word:
+            if entry is None:
+                self._count += 1
+            self._overlay[word] = {"word": word, "definition": op.get('definition')}
+
+    def _iter_words(self):
+        """Слова снимка (кроме удаленных), затем добавленные журналом"""
+        overlay = self._overlay
+        for word in self._base.words():
+            if overlay.get(word, True) is not None:
+                yield word
+        for word, entry in overlay.items():
+            if entry is not None and self._base.find(word) < 0:
+                yield word
+
+    def _ensure_fresh(self):
+        signature = self._stat_signature()
+        journal_inode, journal_size = self._journal_stat()
+        if (signature == self._signature and journal_inode == self._journal_inode
+                and journal_size == self._journal_offset and self.version):
+            return
+        with self._lock:
+            # Повторная проверка под локом: файл мог перечитать соседний поток
+            signature = self._stat_signature()
+            journal_inode, journal_size = self._journal_stat()
+            if signature != self._signature or journal_inode != self._journal_inode \
+                    or journal_size < self._journal_offset or not self.version:
+                self._load(signature)
+            elif journal_size > self._journal_offset and self._replay_journal():
+                self.version += 1
+
+    def load(self):
+        """Принудительная загрузка (вызывается при старте воркера)"""
+        with self._lock:
+            self._load(self._stat_signature())
+        return self
+
+    def refresh(self):
+        """Актуальная версия словаря (перечитывает файлы, если они изменились)"""
+        self._ensure_fresh()
+        return self.version
+
+    # --- ЧТЕНИЕ ---
+
+    def get(self, word):
+        self._ensure_fresh()
+        entry = self._lookup(normalize_word(word))
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def contains(self, word):
+        return self.get(word) is not None
+
+    def __len__(self):
+        self._ensure_fresh()
+        return self._count
+
+    def word_at(self, index):
+        """Слово по позиции в файле (для старого API удаления по id)"""
+        self._ensure_fresh()
+        with self._lock:
+            if 0 <= index < self._count:
+                return next(islice(self._iter_words(), index, None))
+        return None
+
+    @property
+    def pending_ops(self):
+        """Сколько правок лежит в журнале и еще не слито в words.json"""
+        self._ensure_fresh()
+        return self._journal_ops
+
+    def export(self):
+        """Версия и копия всех записей"""
+        self._ensure_fresh()
+        with self._lock:
+            return self.version, [self._lookup(w) for w in self._iter_words()]
+
+    def snapshot(self):
+        """
+        Версия, бинарный снимок и копия правок поверх него — для производных
+        индексов (WordEngine), чтобы не разворачивать весь словарь в dict
+        """
+        self._ensure_fresh()
+        with self._lock:
+            return self.version, self._base, dict(self._overlay)
+
+    # --- ЗАПИСЬ ---
+
+    def add(self, word, definition):
+        return self._mutate({"op": "add", "word": normalize_word(word), "definition": definition},
+                            lambda entry: entry is None)
+
+    def update(self, word, definition):
+        return self._mutate({"op": "update", "word": normalize_word(word), "definition": definition},
+                            lambda entry: entry is not None)
+
+    def delete(self, word):
+        return self._mutate({"op": "delete", "word": normalize_word(word)},
+                            lambda entry: entry is not None)
+
+    def _mutate(self, op, precondition):
+        with self._lock, _FileLock(self.lock_path):
+            # Под межпроцессным локом догоняем чужие правки, чтобы проверка была честной
+            self._ensure_fresh()
+            if not op['word'] or not precondition(self._lookup(op['word'])):
+                return False
+            self._append_journal(op)
+            self._apply(op)
+            self.version += 1
+            pending = self._journal_ops
+        self._schedule_compaction(force=pending >= COMPACT_THRESHOLD)
+        return True
+
+    def _append_journal(self, op):
+        line = (json.dumps(op, ensure_ascii=False) + "\n").encode('utf-8')
+        _, journal_size = self._journal_stat()
+        if journal_size > self._journal_offset:
+            # В конце журнала обрывок строки после падения: закрываем его,
+            # иначе новая запись склеится с ним и потеряется при чтении
+            line = b"\n" + line
+        with open(self.journal_path, 'ab') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        # Под локом никто кроме нас в журнал не пишет: его конец — наша позиция
+        self._journal_inode, self._journal_offset = self._journal_stat()
+        self._journal_ops += 1
+
+    # --- СЖАТИЕ ЖУРНАЛА ---
+
+    def _schedule_compaction(self, force=False):
+        with self._lock:
+            if self._compact_timer:
+                self._compact_timer.cancel()
+            self._compact_timer = threading.Timer(0 if force else COMPACT_DELAY, self.compact)
+            self._compact_timer.daemon = True
+            self._compact_timer.start()
+
+    def compact(self):
+        """Сливает журнал в words.json / words_list.json и обнуляет его"""
+        with self._lock, _FileLock(self.lock_path):
+            self._compact_timer = None
+            self._ensure_fresh()
+            if self._journal_inode is None:
+                return False
+            # Храним файл отсортированным по алфавиту, как и раньше
+            words = [self._lookup(w) for w in sorted(self._iter_words())]
+            write_snapshot(self.path, self.list_path, words, self.binary_path)
+            # Снимок уже на месте. Если упадем до этой строки — журнал просто
+            # применится к новому снимку повторно (операции идемпотентны).
+            os.remove(self.journal_path)
+            # Содержимое не изменилось, поэтому версия прежняя
+            self._open(self._stat_signature())
+            self.compactions += 1
+        return True
+
+
+def _atomic_write_json(path, data, **kwargs):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, **kwargs)
+        f.flush()
+        os.fsync(f.fileno())
+    # rename атомарен: читатель видит либо старый, либо новый файл целиком
+    os.replace(tmp_path, path)
+
+
+def write_snapshot(path, list_path, words, binary_path=None):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    # Полный словарь
+    _atomic_write_json(path, words, indent=2)
+
+    # Легкий словарь (только слова)
+    word_list = [w['word'] for w in words if 'word' in w]
+    _atomic_write_json(list_path, word_list)
+
+    # Бинарный снимок для воркеров, с подписью только что записанного words.json
+    if binary_path:
+        st = os.stat(path)
+        entries = ((normalize_word(w.get('word')), w.get('definition')) for w in words)
+        write_binary(binary_path, build_binary(((w, d) for w, d in entries if w), (st.st_size, st.st_mtime_ns)))
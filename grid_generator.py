@@ -0,0 +1,154 @@
+import os
+import json
+import random
+import threading
+
+from word_engine import LEVEL_MULTIPLIERS, letters_mask
+
+# --- ГЕНЕРАТОР БУКВ ---
+VOWELS_UNIQUE = "АЕИОУЮЯ"
+COMMON_CONSONANTS = "БВГДЗКЛМНПРСТ"
+RARE_LIST = "ЙЦФЧШЩЬЫЖЭ"
+
+RARE_MASK = letters_mask(RARE_LIST)
+LONG_WORD_LENGTH = 7
+
+# Сколько случайных полей пробуем на каждый уровень
+GRID_CANDIDATES = int(os.environ.get('GRID_CANDIDATES', 400))
+# Коридор сложности: допустимое число слов на поле по уровням.
+# Переопределяется через GRID_BANDS='{"10": [150, 600], "8": [50, 250], "6": [15, 80]}'
+DEFAULT_BANDS = {"10": [150, 600], "8": [50, 250], "6": [15, 80]}
+# Минимум длинных (редких) слов на поле
+DEFAULT_MIN_LONG = {"10": 10, "8": 3, "6": 1}
+
+
+def load_bands():
+    bands = dict(DEFAULT_BANDS)
+    raw = os.environ.get('GRID_BANDS')
+    if raw:
+        try:
+            bands.update({str(k): v for k, v in json.loads(raw).items()})
+        except ValueError:
+            print(f"⚠️ GRID_BANDS is not valid JSON, using defaults: {raw}")
+    return bands
+
+
+def generate_grid(level):
+    letters = []
+    target_vowels = 4 if level == 10 else 3 if level == 8 else 2
+    v_pool = list(VOWELS_UNIQUE)
+    random.shuffle(v_pool)
+    letters.extend(v_pool[:target_vowels])
+
+    allow_rare = random.random() < 0.3
+    cons_pool = list(COMMON_CONSONANTS + RARE_LIST)
+    random.shuffle(cons_pool)
+
+    rare_count = 0
+    for c in cons_pool:
+        if len(letters) >= level: break
+        if c in RARE_LIST:
+            if allow_rare and rare_count < 1:
+                letters.append(c)
+                rare_count += 1
+        else:
+            letters.append(c)
+
+    if len(letters) < level:
+        backup = list(COMMON_CONSONANTS)
+        random.shuffle(backup)
+        letters.extend(backup[:level - len(letters)])
+
+    random.shuffle(letters)
+    return letters
+
+
+class GridEvaluator:
+    """
+    Оценка поля по словарю без прохода по словам.
+    Слова WordEngine уже сгруппированы по маске букв; здесь для каждой маски
+    один раз считаются агрегаты (число слов, длинных слов, сумма длин),
+    и оценка поля — это сумма агрегатов по подмаскам поля (до 1023 для 10 букв).
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._source = None
+        self._stats = {}
+
+    def _ensure_stats(self):
+        buckets = self.engine.buckets()
+        if buckets is self._source:
+            return self._stats
+        with self._lock:
+            if buckets is not self._source:
+                stats = {}
+                for mask, words in buckets.items():
+                    stats[mask] = (
+                        len(words),
+                        sum(1 for w in words if len(w) >= LONG_WORD_LENGTH),
+                        sum(len(w) for w in words),
+                    )
+                self._stats, self._source = stats, buckets
+        return self._stats
+
+    def evaluate(self, letters, level=None):
+        stats = self._ensure_stats()
+        level = str(level or len(letters))
+        grid_mask = letters_mask(letters) or 0
+        count = long_words = rare_words = letters_sum = 0
+        sub = grid_mask
+        while sub:
+            s = stats.get(sub)
+            if s:
+                count += s[0]
+                long_words += s[1]
+                letters_sum += s[2]
+                if sub & RARE_MASK:
+                    rare_words += s[0]
+            sub = (sub - 1) & grid_mask
+        return {
+            "count": count,
+            "longWords": long_words,
+            "rareWords": rare_words,
+            "maxScore": int(round(letters_sum * 10 * LEVEL_MULTIPLIERS.get(level, 1))),
+        }
+
+
+def _band_distance(stats, band, min_long):
+    """Насколько поле вне коридора (0 — внутри)"""
+    low, high = band
+    distance = max(0, low - stats["count"], stats["count"] - high)
+    return distance + max(0, min_long - stats["longWords"])
+
+
+def generate_quality_grid(evaluator, level, candidates=None, band=None, min_long=None):
+    """
+    Перебирает случайные поля и возвращает (буквы, статистика) одного из тех,
+    что попали в коридор сложности. Среди подходящих выбор случайный, с весом
+    за длинные слова и слова с редкой буквой. Если в коридор не попал никто —
+    берется ближайшее к нему поле.
+    """
+    key = str(level)
+    band = band or load_bands().get(key, DEFAULT_BANDS.get(key, [0, 10 ** 9]))
+    min_long = DEFAULT_MIN_LONG.get(key, 0) if min_long is None else min_long
+    fitting, weights = [], []
+    closest, closest_distance = None, None
+    seen = set()
+    for _ in range(candidates or GRID_CANDIDATES):
+        letters = generate_grid(level)
+        mask = letters_mask(letters)
+        if mask in seen:
+            continue
+        seen.add(mask)
+        stats = evaluator.evaluate(letters, level)
+        distance = _band_distance(stats, band, min_long)
+        if distance == 0:
+            fitting.append((letters, stats))
+            weights.append(1 + stats["longWords"] + 2 * stats["rareWords"])
+        elif closest_distance is None or distance < closest_distance:
+            closest, closest_distance = (letters, stats), distance
+    if fitting:
+        return random.choices(fitting, weights=weights)[0]
+    return closest
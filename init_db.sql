@@ -57,6 +57,17 @@ CREATE TABLE IF NOT EXISTS challenges (
     created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
 );
 
+-- Пул заранее сгенерированных испытаний (cron_daily.py refill)
+CREATE TABLE IF NOT EXISTS challenge_pool (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    letters JSONB NOT NULL,
+    stats JSONB,
+    solutions JSONB,
+    challenge_id BIGINT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    used_at TIMESTAMP WITH TIME ZONE
+);
+
 -- Отзывы
 CREATE TABLE IF NOT EXISTS feedback (
     id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
@@ -83,10 +94,68 @@ CREATE TABLE IF NOT EXISTS broadcasts (
     message TEXT NOT NULL,
     status TEXT DEFAULT 'pending',
     sent_count BIGINT DEFAULT 0,
+    failed_count BIGINT DEFAULT 0,
+    total_count BIGINT,
+    last_telegram_id BIGINT,
+    started_at TIMESTAMP WITH TIME ZONE,
     processed_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()),
+    locked_by TEXT,
+    heartbeat_at TIMESTAMP WITH TIME ZONE
+);
+
+-- Миграция существующей базы: прогресс рассылки (cron_daily.py broadcast)
+ALTER TABLE broadcasts ADD COLUMN IF NOT EXISTS failed_count BIGINT DEFAULT 0;
+ALTER TABLE broadcasts ADD COLUMN IF NOT EXISTS total_count BIGINT;
+ALTER TABLE broadcasts ADD COLUMN IF NOT EXISTS last_telegram_id BIGINT;
+ALTER TABLE broadcasts ADD COLUMN IF NOT EXISTS started_at TIMESTAMP WITH TIME ZONE;
+-- Аренда рассылки: кто ее шлет и когда последний раз отметился
+ALTER TABLE broadcasts ADD COLUMN IF NOT EXISTS locked_by TEXT;
+ALTER TABLE broadcasts ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP WITH TIME ZONE;
+
+-- Доставка рассылок по получателям (cron_daily.py notify продолжает с места остановки)
+CREATE TABLE IF NOT EXISTS deliveries (
+    broadcast_id BIGINT NOT NULL,
+    telegram_id BIGINT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    PRIMARY KEY (broadcast_id, telegram_id)
+);
+
+-- Начисленные платежи звездами: id транзакции Telegram — ключ, по нему начисление идет ровно один раз
+CREATE TABLE IF NOT EXISTS payments (
+    id TEXT PRIMARY KEY,
+    telegram_id BIGINT NOT NULL,
+    amount INTEGER NOT NULL,
+    pack_id INTEGER,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now())
 );
 
+-- Транзакции звезд бота (копия getStarTransactions, cron_daily.py payments)
+CREATE TABLE IF NOT EXISTS star_transactions (
+    id TEXT PRIMARY KEY,
+    partner_id BIGINT,
+    amount INTEGER NOT NULL,
+    invoice_payload TEXT,
+    date BIGINT NOT NULL,
+    data JSONB,
+    fetched_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+-- Докуда скачаны транзакции звезд (offset для getStarTransactions)
+CREATE TABLE IF NOT EXISTS star_sync_state (
+    name TEXT PRIMARY KEY,
+    next_offset BIGINT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE
+);
+
 -- Индексы для скорости (их могло не быть в дампе колонок, но они нужны)
 CREATE INDEX IF NOT EXISTS idx_leaderboard_score ON leaderboard (score DESC);
 CREATE INDEX IF NOT EXISTS idx_daily_scores_challenge ON daily_scores (challenge_id, score DESC);
+CREATE INDEX IF NOT EXISTS idx_challenge_pool_available ON challenge_pool (id) WHERE challenge_id IS NULL;
+CREATE INDEX IF NOT EXISTS idx_challenge_pool_challenge ON challenge_pool (challenge_id);
+-- Уведомления игрока и очистка старых (cron_daily.py cleanup создает их и в существующей базе)
+CREATE INDEX IF NOT EXISTS idx_notifications_user ON notifications (telegram_id, id);
+CREATE INDEX IF NOT EXISTS idx_notifications_created ON notifications (created_at);
+CREATE INDEX IF NOT EXISTS idx_star_transactions_partner ON star_transactions (partner_id, date);
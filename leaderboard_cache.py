@@ -0,0 +1,114 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+# Сколько секунд живет страница рейтинга в кэше
+LEADERBOARD_CACHE_TTL = float(os.environ.get('LEADERBOARD_CACHE_TTL', 5))
+# Сколько страниц держим в кэше: курсор приходит от клиента, без предела память растет
+LEADERBOARD_CACHE_SIZE = int(os.environ.get('LEADERBOARD_CACHE_SIZE', 1000))
+
+
+class CachedPage:
+    __slots__ = ('payload', 'etag', 'last_modified', 'expires_at', 'floor', 'ceiling', 'ids')
+
+    def __init__(self, payload, floor, ceiling, ids, ttl):
+        self.payload = payload
+        body = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        self.etag = hashlib.sha1(body.encode('utf-8')).hexdigest()
+        # HTTP-даты с точностью до секунды
+        self.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        self.expires_at = time.monotonic() + ttl
+        self.floor = floor          # минимальные очки на странице (None — страница неполная)
+        self.ceiling = ceiling      # курсор страницы (None — первая страница)
+        self.ids = ids              # telegram_id игроков на странице
+
+
+class LeaderboardCache:
+    """
+    Кэш страниц рейтинга по ключу (board, scope, cursor, limit).
+    board — 'global' или 'daily', scope — id испытания для дневного рейтинга,
+    cursor — разобранный курсор (parse_cursor), limit — уже ограниченный.
+    Не больше max_size страниц: при переполнении сначала выбрасываются
+    просроченные, затем давно не запрошенные (LRU).
+    Страница сбрасывается раньше TTL, если чьи-то очки попали в ее окно
+    или изменились очки игрока, который на ней есть.
+    Кэш локален для процесса: другие воркеры gunicorn увидят изменение по TTL.
+    """
+
+    def __init__(self, ttl=LEADERBOARD_CACHE_TTL, max_size=LEADERBOARD_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._pages = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, board, scope, cursor, limit):
+        key = (board, scope, cursor, limit)
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None and page.expires_at < time.monotonic():
+                del self._pages[key]
+                page = None
+            if page is None:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(key)
+            self.hits += 1
+            return page
+
+    def put(self, board, scope, cursor, limit, payload, floor, ceiling, ids):
+        page = CachedPage(payload, floor, ceiling, ids, self.ttl)
+        key = (board, scope, cursor, limit)
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            if len(self._pages) > self.max_size:
+                now = time.monotonic()
+                expired = [k for k, p in self._pages.items() if p.expires_at < now]
+                for k in expired:
+                    del self._pages[k]
+                while len(self._pages) > self.max_size:
+                    self._pages.popitem(last=False)
+                    self.evictions += 1
+        return page
+
+    def __len__(self):
+        return len(self._pages)
+
+    def notify_score(self, board, scope, telegram_id, score):
+        """Вызывается после сохранения очков игрока"""
+        score = score or 0
+        with self._lock:
+            stale = []
+            for key, page in self._pages.items():
+                if key[0] != board or key[1] != scope:
+                    continue
+                enters_window = (page.floor is None or score >= page.floor) and \
+                    (page.ceiling is None or score <= page.ceiling)
+                if enters_window or telegram_id in page.ids:
+                    stale.append(key)
+            for key in stale:
+                del self._pages[key]
+            self.invalidations += len(stale)
+
+
+def parse_cursor(raw):
+    """'<score>:<telegram_id>' -> (score, telegram_id) или None"""
+    if not raw:
+        return None
+    try:
+        score, telegram_id = raw.split(':', 1)
+        return int(score), int(telegram_id)
+    except ValueError:
+        return None
+
+
+def make_cursor(score, telegram_id):
+    return f"{score}:{telegram_id}"
@@ -0,0 +1,264 @@
+import os
+import time
+import atexit
+import threading
+
+# Границы корзин гистограмм по умолчанию (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(pairs):
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    Значения задаются через inc/set/observe или считаются при сборе:
+    callback() возвращает [(dict меток, значение)] — так отдаются счетчики,
+    которые уже ведут сами объекты (кэши, пул соединений).
+    """
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labelnames=(), const_labels=None, callback=None):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.const_labels = tuple((const_labels or {}).items())
+        self.callback = callback
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, '')) for n in self.labelnames)
+
+    def samples(self):
+        """[(суффикс имени, значения меток, доп. метки, значение)]"""
+        if self.callback is not None:
+            return [("", self._key(labels), (), value) for labels, value in self.callback()]
+        with self._lock:
+            return [("", key, (), value) for key, value in sorted(self._values.items())]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            labels = self.const_labels + tuple(zip(self.labelnames, key)) + extra
+            lines.append(f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), const_labels=None, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames, const_labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        result = []
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                result.append(("_bucket", key, (("le", _format_value(float(bound))),), cumulative))
+            result.append(("_bucket", key, (("le", "+Inf"),), count))
+            result.append(("_sum", key, (), total))
+            result.append(("_count", key, (), count))
+        return result
+
+
+class Registry:
+    """
+    Набор метрик и вывод в текстовом формате Prometheus (без prometheus_client).
+    const_labels добавляются ко всем сериям (например, pid воркера gunicorn).
+    """
+
+    def __init__(self, const_labels=None):
+        self.const_labels = dict(const_labels or {})
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=(), callback=None):
+        return self.register(Counter(name, help_text, labelnames, self.const_labels, callback))
+
+    def gauge(self, name, help_text, labelnames=(), callback=None):
+        return self.register(Gauge(name, help_text, labelnames, self.const_labels, callback))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, labelnames, self.const_labels, buckets))
+
+    def render(self):
+        return "\n".join(m.render() for m in self._metrics) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def write_textfile(path, registry):
+    """Файл для textfile-коллектора: пишется целиком через rename, чтобы читатель не увидел половину"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(registry.render())
+    os.replace(tmp_path, path)
+
+
+def read_textfiles(directory, prefix="", max_age=None):
+    """
+    Тексты всех <prefix>*.prom из папки. Файлы старше max_age секунд
+    (процесс, который их писал, уже завершился) пропускаются и удаляются.
+    """
+    if not os.path.isdir(directory):
+        return []
+    parts = []
+    now = time.time()
+    for name in sorted(os.listdir(directory)):
+        if name.startswith(prefix) and name.endswith('.prom'):
+            path = os.path.join(directory, name)
+            try:
+                if max_age is not None and now - os.path.getmtime(path) > max_age:
+                    os.remove(path)
+                    continue
+                with open(path, 'r', encoding='utf-8') as f:
+                    parts.append(f.read())
+            except OSError:
+                continue
+    return parts
+
+
+def merge_expositions(texts):
+    """
+    Несколько текстов в формате Prometheus -> один. # HELP и # TYPE семейства
+    можно объявить только один раз, поэтому серии одного семейства из разных
+    текстов собираются под одним заголовком; одинаковая серия — из последнего текста.
+    """
+    families = {}
+
+    def family_of(name):
+        if name not in families:
+            families[name] = {"HELP": None, "TYPE": None, "samples": {}}
+        return families[name]
+
+    for text in texts:
+        current, current_name = None, None
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('#'):
+                parts = line.split(None, 3)
+                if len(parts) >= 3 and parts[1] in ("HELP", "TYPE"):
+                    current_name, current = parts[2], family_of(parts[2])
+                    if current[parts[1]] is None:
+                        current[parts[1]] = line
+                continue
+            series = line.rsplit(' ', 1)[0]
+            name = series.split('{', 1)[0]
+            # Серии гистограммы (_bucket, _sum, _count) — в семействе своего # TYPE
+            if current is None or not name.startswith(current_name):
+                current_name, current = name, family_of(name)
+            current["samples"][series] = line
+
+    lines = []
+    for family in families.values():
+        lines.extend(family[k] for k in ("HELP", "TYPE") if family[k])
+        lines.extend(family["samples"].values())
+    return "\n".join(lines) + "\n"
+
+
+class ProcessMetrics:
+    """
+    Метрики процессов, обслуживающих один адрес (воркеры gunicorn): каждый процесс
+    раз в interval секунд пишет свой реестр в <directory>/<prefix>_<pid>.prom,
+    а render() в любом из них отдает свежие файлы всех процессов, слитые в один ответ.
+    Без этого сбор видел бы только счетчики воркера, который ответил на запрос.
+    context — фабрика контекста, в котором считаются callback-метрики (app.app_context).
+    """
+
+    def __init__(self, registry, directory, prefix="api", interval=5, context=None):
+        self.registry = registry
+        self.context = context
+        self.directory = directory
+        self.prefix = prefix
+        self.interval = interval
+        self.path = os.path.join(directory, f"{prefix}_{os.getpid()}.prom")
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self._remove)
+        return self
+
+    def _write(self):
+        if self.context is None:
+            write_textfile(self.path, self.registry)
+        else:
+            with self.context():
+                write_textfile(self.path, self.registry)
+
+    def _run(self):
+        while True:
+            try:
+                self._write()
+            except Exception:
+                pass  # Файл обновится в следующий раз; сбор пропустит его, только если он устареет
+            time.sleep(self.interval)
+
+    def _remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def render(self):
+        # Свой файл пишем перед чтением: в ответе текущие значения этого процесса
+        self._write()
+        return merge_expositions(read_textfiles(self.directory, f"{self.prefix}_", max_age=self.interval * 3))
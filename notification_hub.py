@@ -0,0 +1,183 @@
+import os
+import time
+import select
+import logging
+import threading
+
+log = logging.getLogger("slovodel.notifications")
+
+# Канал Postgres LISTEN/NOTIFY: cron_daily.py шлет в него сигнал после вставки уведомлений
+NOTIFY_CHANNEL = os.environ.get('NOTIFY_CHANNEL', 'slovodel_notifications')
+# Как часто воркер сам проверяет новые уведомления (секунды). С LISTEN это
+# страховка на случай потерянного сигнала, без него (sqlite) — основной способ
+NOTIFY_SWEEP_INTERVAL = float(os.environ.get('NOTIFY_SWEEP_INTERVAL', 2))
+NOTIFY_LISTEN_SWEEP_INTERVAL = float(os.environ.get('NOTIFY_LISTEN_SWEEP_INTERVAL', 60))
+# Сколько клиентов воркера могут одновременно ждать (long-poll); остальным сразу пустой ответ
+NOTIFY_MAX_WAITERS = int(os.environ.get('NOTIFY_MAX_WAITERS', 24))
+
+
+class NotificationHub:
+    """
+    Кто из игроков ждет уведомлений, без запроса к базе на каждый опрос.
+    Хаб помнит множество telegram_id, у которых в таблице есть уведомления,
+    и будит клиентов, ждущих в wait(). Новые строки он находит сам:
+    load_since(after_id) -> [(id, telegram_id)] одним запросом на весь воркер
+    (по сигналу LISTEN/NOTIFY или по таймеру), а не по запросу на клиента.
+    connect — функция, возвращающая соединение psycopg2 для LISTEN (None — только таймер).
+
+    Хаб живет в памяти процесса: у каждого воркера gunicorn свой.
+    """
+
+    def __init__(self, load_since, connect=None, max_waiters=NOTIFY_MAX_WAITERS):
+        self.load_since = load_since
+        self.connect = connect
+        self.sweep_interval = NOTIFY_LISTEN_SWEEP_INTERVAL if connect else NOTIFY_SWEEP_INTERVAL
+        self.max_waiters = max_waiters
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._pending = set()
+        self._versions = {}
+        self._waiters = {}
+        self._waiting = 0
+        self._last_id = None
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.sweeps = 0
+        self.skipped = 0
+        self.woken = 0
+
+    def start(self):
+        """Первый снимок и фоновый поток; зовется лениво, уже после fork воркера"""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            try:
+                self._sweep()
+            except Exception as e:
+                # Повторит фоновый поток; пока база недоступна, ответ — «уведомлений нет»
+                log.error("notification sweep failed", extra={"error": str(e)})
+            self._thread = threading.Thread(target=self._run, name="notification-hub", daemon=True)
+            self._thread.start()
+            if self.connect is not None:
+                start_pg_listener(self, self.connect)
+
+    def has_any(self, telegram_id):
+        """Есть ли у игрока уведомления — по памяти, без запроса к базе"""
+        self.start()
+        if telegram_id in self._pending:
+            return True
+        self.skipped += 1
+        return False
+
+    def version(self, telegram_id):
+        return self._versions.get(telegram_id, 0)
+
+    def clear(self, telegram_id, version):
+        """
+        Запрос к базе не нашел уведомлений — снимаем отметку. Если за это время
+        пришло новое (версия сменилась), отметка остается.
+        """
+        with self._lock:
+            if self._versions.get(telegram_id, 0) == version:
+                self._pending.discard(telegram_id)
+
+    def mark(self, telegram_ids):
+        """У игроков появились уведомления: отмечаем и будим их ожидающие запросы"""
+        with self._lock:
+            for telegram_id in telegram_ids:
+                self._pending.add(telegram_id)
+                self._versions[telegram_id] = self._versions.get(telegram_id, 0) + 1
+                for event in self._waiters.get(telegram_id, ()):
+                    event.set()
+                    self.woken += 1
+
+    def wait(self, telegram_id, timeout):
+        """Ждет уведомлений игрока до timeout секунд. True — они появились"""
+        self.start()
+        event = threading.Event()
+        with self._lock:
+            if telegram_id in self._pending:
+                return True
+            if self._waiting >= self.max_waiters:
+                return False
+            self._waiting += 1
+            self._waiters.setdefault(telegram_id, set()).add(event)
+        try:
+            return event.wait(timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+                events = self._waiters.get(telegram_id)
+                events.discard(event)
+                if not events:
+                    del self._waiters[telegram_id]
+
+    def poke(self):
+        """Сигнал извне (NOTIFY): проверить новые строки сейчас, не дожидаясь таймера"""
+        self._wakeup.set()
+
+    def _sweep(self):
+        rows = self.load_since(self._last_id)
+        self.sweeps += 1
+        if rows:
+            self._last_id = max(self._last_id or 0, max(row_id for row_id, _ in rows))
+            self.mark({telegram_id for _, telegram_id in rows})
+        elif self._last_id is None:
+            self._last_id = 0
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.sweep_interval)
+            self._wakeup.clear()
+            try:
+                self._sweep()
+            except Exception as e:
+                log.error("notification sweep failed", extra={"error": str(e)})
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "waiting": self._waiting,
+            "sweeps": self.sweeps,
+            "skipped": self.skipped,
+            "woken": self.woken,
+        }
+
+
+def start_pg_listener(hub, connect, channel=NOTIFY_CHANNEL):
+    """
+    Поток с LISTEN на отдельном соединении Postgres: на каждый NOTIFY хаб
+    сразу проверяет новые строки. connect() возвращает соединение psycopg2.
+    """
+    def listen():
+        while True:
+            conn = None
+            try:
+                conn = connect()
+                conn.autocommit = True
+                conn.cursor().execute(f'LISTEN "{channel}"')
+                log.info("listening for notifications", extra={"channel": channel})
+                # После переподключения сигналы могли потеряться — проверяем сразу
+                hub.poke()
+                while True:
+                    if select.select([conn], [], [], 60) == ([], [], []):
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        conn.notifies.clear()
+                        hub.poke()
+            except Exception as e:
+                log.error("notification listener failed", extra={"error": str(e)})
+                time.sleep(5)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    thread = threading.Thread(target=listen, name="notification-listener", daemon=True)
+    thread.start()
+    return thread
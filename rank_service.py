@@ -0,0 +1,64 @@
+import os
+import time
+import threading
+from bisect import bisect_left, bisect_right, insort
+
+# Как часто перечитываем снимок очков из базы (секунды)
+RANK_SNAPSHOT_TTL = float(os.environ.get('RANK_SNAPSHOT_TTL', 30))
+
+
+class RankSnapshot:
+    """
+    Снимок DENSE_RANK по очкам: отсортированный массив различных значений score.
+    Место игрока = число различных очков выше его + 1, считается через bisect
+    за O(log n) без запроса COUNT(DISTINCT ...) на каждый вызов.
+    loader — функция, возвращающая различные значения очков (в любом порядке).
+    """
+
+    def __init__(self, loader, ttl=RANK_SNAPSHOT_TTL):
+        self.loader = loader
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._scores = []
+        self._loaded_at = None
+        self.refreshes = 0
+
+    def _is_fresh(self):
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    def _ensure_fresh(self):
+        if self._is_fresh():
+            return self._scores
+        # Обновляет один поток, остальные пока отвечают по старому снимку
+        if self._lock.acquire(blocking=self._loaded_at is None):
+            try:
+                if not self._is_fresh():
+                    self._scores = sorted({s or 0 for s in self.loader()})
+                    self._loaded_at = time.monotonic()
+                    self.refreshes += 1
+            finally:
+                self._lock.release()
+        return self._scores
+
+    def add_score(self, score):
+        """
+        Новое значение очков сразу попадает в снимок этого воркера, без перечитывания.
+        Прежние очки игрока остаются в снимке до обновления по ttl.
+        """
+        score = score or 0
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            i = bisect_left(self._scores, score)
+            if i == len(self._scores) or self._scores[i] != score:
+                insort(self._scores, score)
+
+    def rank_of(self, score):
+        scores = self._ensure_fresh()
+        return len(scores) - bisect_right(scores, score or 0) + 1
+
+    def ranks_of(self, scores_by_id):
+        """{id: score} -> {id: место}"""
+        scores = self._ensure_fresh()
+        total = len(scores)
+        return {key: total - bisect_right(scores, score or 0) + 1 for key, score in scores_by_id.items()}
@@ -0,0 +1,135 @@
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import random
+import atexit
+import logging
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, request, has_request_context
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+# Запросы медленнее этого (мс) и ответы с ошибкой пишутся в лог всегда, без сэмплирования
+LOG_SLOW_MS = float(os.environ.get('LOG_SLOW_MS', 500))
+# Какую долю запросов к частым эндпоинтам пишем в access-лог (ключ — маршрут Flask).
+# Переопределяется через LOG_SAMPLE_RATES='{"/api/leaderboard": 0.05}'
+DEFAULT_SAMPLE_RATES = {
+    "/api/leaderboard": 0.1,
+    "/api/daily/leaderboard": 0.1,
+    "/api/rank": 0.1,
+    "/api/rank/<int:telegram_id>": 0.1,
+    "/api/rank/batch": 0.1,
+    "/api/daily/check": 0.1,
+    "/api/user": 0.1,
+    "/api/health": 0.01,
+}
+
+# Стандартные поля LogRecord: все остальное — наши поля из extra={...}
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith('_') and value is not None:
+                entry[key] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Добавляет к записям, сделанным внутри запроса, его id и пользователя"""
+
+    def filter(self, record):
+        if has_request_context():
+            if not hasattr(record, 'request_id'):
+                record.request_id = g.get('request_id')
+            if not hasattr(record, 'user_id'):
+                record.user_id = g.get('user_id')
+        return True
+
+
+def load_sample_rates():
+    rates = dict(DEFAULT_SAMPLE_RATES)
+    raw = os.environ.get('LOG_SAMPLE_RATES')
+    if raw:
+        try:
+            rates.update(json.loads(raw))
+        except ValueError:
+            pass
+    return rates
+
+
+def setup_logging(name="slovodel"):
+    """
+    Логгер приложения. Запрос только кладет запись в очередь,
+    JSON собирается и пишется в stdout отдельным потоком (QueueListener).
+    """
+    global _listener
+    logger = logging.getLogger(name)
+    if _listener is not None:
+        return logger
+    records = queue.SimpleQueue()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+    _listener = QueueListener(records, stream)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    handler = QueueHandler(records)
+    handler.addFilter(RequestContextFilter())
+    logger.addHandler(handler)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+    return logger
+
+
+def init_request_logging(app, logger):
+    """Access-лог: id запроса, маршрут, статус, время ответа, пользователь и время в базе"""
+    sample_rates = load_sample_rates()
+
+    @app.before_request
+    def start_request_log():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex[:16]
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def write_request_log(response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        latency_ms = (time.perf_counter() - started) * 1000
+        response.headers['X-Request-ID'] = g.request_id
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+
+        rate = 1.0
+        if response.status_code < 400 and latency_ms < LOG_SLOW_MS:
+            rate = sample_rates.get(route, 1.0)
+            if rate < 1.0 and random.random() >= rate:
+                return response
+
+        stats = g.get('db_stats')
+        logger.info("request", extra={
+            "method": request.method,
+            "route": route,
+            "path": request.path,
+            "status": response.status_code,
+            "latency_ms": round(latency_ms, 1),
+            "db_queries": stats.queries if stats else 0,
+            "db_ms": round(stats.seconds * 1000, 1) if stats else 0.0,
+            "sample_rate": rate if rate < 1.0 else None,
+        })
+        return response
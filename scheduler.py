@@ -1,7 +1,10 @@
 import os
+import time
+import threading
 import subprocess
 import logging
 from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
@@ -17,6 +20,44 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+from metrics import Registry, CONTENT_TYPE, read_textfiles, merge_expositions
+
+# Порт HTTP с метриками (0 — не поднимать). Отдает метрики планировщика
+# и файлы *.prom, которые cron_daily.py пишет в METRICS_DIR
+METRICS_PORT = int(os.environ.get('METRICS_PORT', 9101))
+METRICS_DIR = os.environ.get('METRICS_DIR', 'metrics')
+
+scheduler_metrics = Registry()
+task_runs = scheduler_metrics.counter(
+    "slovodel_scheduler_task_runs_total", "Scheduled task runs by result", ("task", "result"))
+task_duration = scheduler_metrics.histogram(
+    "slovodel_scheduler_task_duration_seconds", "Scheduled task duration", ("task",),
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600))
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_response(404)
+            self.end_headers()
+            return
+        # В каждом cron_<mode>.prom свои # HELP/# TYPE тех же семейств: сливаем по семействам
+        body = merge_expositions([scheduler_metrics.render()] + read_textfiles(METRICS_DIR, "cron_")).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Опрос метрик не засоряет лог планировщика
+
+def start_metrics_server():
+    if not METRICS_PORT:
+        return
+    server = ThreadingHTTPServer(("0.0.0.0", METRICS_PORT), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"📊 Metrics on :{METRICS_PORT}/metrics")
+
 def run_script(script_name, *args):
     """
     Запускает внешний Python-скрипт как отдельный процесс.
@@ -24,6 +65,9 @@ def run_script(script_name, *args):
     """
     command = ["python", script_name] + list(args)
     logger.info(f"🚀 Starting task: {' '.join(command)}")
+    task = " ".join([script_name] + list(args))
+    started = time.perf_counter()
+    result_label = "error"
     
     try:
         # capture_output=True позволяет перехватить вывод скрипта, чтобы записать его в лог планировщика
@@ -33,11 +77,13 @@ def run_script(script_name, *args):
             capture_output=True, 
             text=True
         )
+        result_label = "success"
         logger.info(f"✅ Task finished: {script_name}")
         if result.stdout:
             logger.info(f"[Output] {result.stdout.strip()}")
             
     except subprocess.CalledProcessError as e:
+        result_label = "failed"
         logger.error(f"❌ Task FAILED: {script_name}. Exit code: {e.returncode}")
         if e.stdout:
             logger.error(f"[Stdout] {e.stdout.strip()}")
@@ -47,12 +93,20 @@ def run_script(script_name, *args):
     except Exception as e:
         logger.error(f"🔥 Unexpected error running {script_name}: {e}")
 
+    finally:
+        task_runs.inc(task=task, result=result_label)
+        task_duration.observe(time.perf_counter() - started, task=task)
+
 def run_startup_checks():
     """
     Проверяет и выполняет пропущенные задачи при запуске контейнера.
     """
     logger.info("🕵️ Running startup checks for missed tasks...")
     
+    # 0. Пул готовых испытаний: чтобы обновление ниже взяло испытание из него
+    logger.info("Checking challenge pool...")
+    run_script("cron_daily.py", "refill")
+    
     # 1. Проверка обновления испытания (безопасно запускать всегда, внутри есть проверка актуальности)
     # Если испытание просрочено - оно обновится. Если нет - ничего не произойдет.
     logger.info("Checking daily challenge status...")
@@ -76,6 +130,7 @@ def run_startup_checks():
 
 def main():
     logger.info("⏳ Scheduler service starting (Timezone: Europe/Moscow)...")
+    start_metrics_server()
     
     # Выполняем проверку пропущенных задач перед запуском планировщика
     run_startup_checks()
@@ -101,7 +156,48 @@ def main():
         name="daily_notify"
     )
 
-    # --- 3. Мониторинг турниров (Пример на будущее) ---
+    # --- 3. Пополнение пула испытаний ---
+    # Генерация с проверкой по словарю идет заранее, а не в момент смены дня
+    scheduler.add_job(
+        run_script,
+        IntervalTrigger(hours=1),
+        args=["cron_daily.py", "refill"],
+        name="challenge_pool_refill"
+    )
+
+    # --- 4. Рассылки от админа ---
+    # /api/broadcast только ставит рассылку в очередь, отправляет ее эта задача.
+    # Следующий запуск не стартует, пока идет предыдущий (max_instances=1)
+    scheduler.add_job(
+        run_script,
+        IntervalTrigger(minutes=1),
+        args=["cron_daily.py", "broadcast"],
+        name="broadcast_jobs",
+        max_instances=1,
+        coalesce=True
+    )
+
+    # --- 5. Очистка старых уведомлений ---
+    # 08:00 по Москве — после рассылки итогов, в тихие часы
+    scheduler.add_job(
+        run_script,
+        CronTrigger(hour=8, minute=0),
+        args=["cron_daily.py", "cleanup"],
+        name="notifications_cleanup"
+    )
+
+    # --- 6. Сверка платежей звездами ---
+    # Начисляет монеты за оплаты, которые клиент не успел подтвердить сам
+    scheduler.add_job(
+        run_script,
+        IntervalTrigger(minutes=1),
+        args=["cron_daily.py", "payments"],
+        name="payments_reconcile",
+        max_instances=1,
+        coalesce=True
+    )
+
+    # --- 7. Мониторинг турниров (Пример на будущее) ---
     # Запуск каждую минуту для проверки
     # scheduler.add_job(
     #     run_script,
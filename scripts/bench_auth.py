@@ -0,0 +1,105 @@
+import os
+import sys
+import json
+import time
+import hmac
+import hashlib
+import tempfile
+import contextlib
+from urllib.parse import urlencode, parse_qsl
+
+# Замер проверки авторизации (auth_required) на запросах к API.
+# Запуск: python scripts/bench_auth.py [число запросов]
+#
+# Сравнивает три режима:
+#   legacy    — как было: ключ HMAC выводится и initData разбирается на каждый запрос
+#   no cache  — ключи посчитаны при старте, но каждый запрос проверяется заново
+#   cache     — быстрый путь: повторный заголовок берется из AuthCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BOT_TOKEN = "123456:bench-token"
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+ENDPOINT = "/api/daily/check"  # Без challengeId сразу отвечает null — в замере только авторизация
+
+
+def make_init_data(user_id):
+    fields = {
+        "auth_date": str(int(time.time())),
+        "query_id": "AAHdF6IQAAAAAN0XohDhrOrc",
+        "user": json.dumps({"id": user_id, "first_name": "Тест", "last_name": "Игрок"}, ensure_ascii=False),
+    }
+    data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    secret_key = hmac.new(b"WebAppData", BOT_TOKEN.encode(), hashlib.sha256).digest()
+    fields["hash"] = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    return urlencode(fields)
+
+
+def legacy_validate_init_data(init_data):
+    # Копия старой validate_init_data из server_api.py
+    try:
+        parsed_data = dict(parse_qsl(init_data))
+        if 'hash' not in parsed_data: return None
+        received_hash = parsed_data.pop('hash')
+        data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(parsed_data.items()))
+        secret_key = hmac.new(b"WebAppData", BOT_TOKEN.encode(), hashlib.sha256).digest()
+        calculated_hash = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+        if calculated_hash == received_hash:
+            return json.loads(parsed_data.get('user', '{}'))
+        return None
+    except: return None
+
+
+def run(client, headers):
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        started = time.perf_counter()
+        for _ in range(REQUESTS):
+            res = client.get(ENDPOINT, headers=headers)
+        elapsed = time.perf_counter() - started
+    assert res.status_code == 200, res.status_code
+    return REQUESTS / elapsed
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix="bench_auth_")
+    os.chdir(workdir)  # server_api при импорте создает public/words_list.json в текущей папке
+    os.environ['BOT_TOKEN'] = BOT_TOKEN
+    os.environ['SECRET_KEY'] = "bench-secret-key-bench-secret-key"
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    for var in ('POSTGRES_USER', 'POSTGRES_PASSWORD', 'POSTGRES_DB'):
+        os.environ.pop(var, None)
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        import server_api
+    import jwt
+
+    client = server_api.app.test_client()
+    init_data = {"Authorization": make_init_data(42)}
+    bearer = {"Authorization": "Bearer " + jwt.encode({"user_id": 42, "username": "Тест"}, server_api.SECRET_KEY, algorithm="HS256")}
+
+    print(f"🔐 {REQUESTS} requests to {ENDPOINT}\n")
+    results = []
+
+    # Старое поведение: подменяем проверку initData копией прежней функции
+    server_api.auth_cache.maxsize = 0
+    fast_check = server_api.check_init_data
+    server_api.check_init_data = lambda data: (legacy_validate_init_data(data), None)
+    results.append(("initData", "legacy", run(client, init_data)))
+    server_api.check_init_data = fast_check
+    results.append(("initData", "no cache", run(client, init_data)))
+    results.append(("JWT", "no cache", run(client, bearer)))
+
+    server_api.auth_cache.maxsize = 10000
+    results.append(("initData", "cache", run(client, init_data)))
+    results.append(("JWT", "cache", run(client, bearer)))
+
+    baseline = {}
+    for kind, mode, rps in results:
+        baseline.setdefault(kind, rps)
+        print(f"   {kind:<9} {mode:<9} {rps:9.0f} req/s  x{rps / baseline[kind]:.2f}")
+    print(f"\n   cache hits: {server_api.auth_cache.hits}, misses: {server_api.auth_cache.misses}")
+
+
+if __name__ == "__main__":
+    main()
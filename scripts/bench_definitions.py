@@ -0,0 +1,69 @@
+import os
+import sys
+import json
+import time
+import tempfile
+
+# Замер генератора определений без сети, на mock-бэкенде с задержкой ответа:
+#   serial   — как раньше: по слову на запрос, по одному запросу за раз
+#   pool     — пул воркеров, по слову на запрос
+#   batched  — пул воркеров и пачки слов в одном запросе
+# и запись прогресса: перезапись всего JSON каждые 10 слов (как раньше) против журнала JSONL.
+# Запуск: python scripts/bench_definitions.py [слов] [задержка, s]
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from definition_generator import MockBackend, generate  # noqa: E402
+
+WORDS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+LATENCY = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+# Последовательный режим медленный: замеряется на части слов и пересчитывается
+SERIAL_WORDS = 100
+CHECKPOINT_WORDS = 10000
+
+
+def run(workdir, name, words, workers, batch_size):
+    input_file = os.path.join(workdir, f"{name}.txt")
+    with open(input_file, 'w', encoding='utf-8') as f:
+        f.write("\n".join(f"слово{i}" for i in range(words)))
+    backend = MockBackend(batch_size=batch_size, latency=LATENCY)
+    started = time.perf_counter()
+    generate(backend, input_file, os.path.join(workdir, f"{name}.json"), workers=workers, verbose=False)
+    return words / (time.perf_counter() - started), backend.requests
+
+
+def bench_checkpoints(workdir):
+    items = [{"word": f"слово{i}", "definition": f"Определение слова слово{i}", "source": "mock"}
+             for i in range(CHECKPOINT_WORDS)]
+    path = os.path.join(workdir, "rewrite.json")
+    started = time.perf_counter()
+    for i in range(10, len(items) + 1, 10):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(items[:i], f, ensure_ascii=False, indent=2)
+    rewrite = time.perf_counter() - started
+
+    path = os.path.join(workdir, "append.jsonl")
+    started = time.perf_counter()
+    with open(path, 'a', encoding='utf-8') as f:
+        for i in range(0, len(items), 10):
+            f.write("".join(json.dumps(item, ensure_ascii=False) + "\n" for item in items[i:i + 10]))
+            f.flush()
+    append = time.perf_counter() - started
+    return rewrite, append
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix="bench_definitions_")
+    print(f"📚 {WORDS} слов, задержка ответа {LATENCY * 1000:.0f} ms\n")
+    rows = [("serial", SERIAL_WORDS, 1, 1), ("pool", WORDS, 8, 1), ("batched", WORDS, 8, 20)]
+    print(f"   {'mode':<8} {'workers':>7} {'batch':>5} {'words/s':>9} {'requests':>9} {'eta 40k':>9}")
+    for name, words, workers, batch_size in rows:
+        rate, requests = run(workdir, name, words, workers, batch_size)
+        print(f"   {name:<8} {workers:7d} {batch_size:5d} {rate:9.1f} {requests:9d} {40000 / rate / 60:7.1f} m")
+
+    rewrite, append = bench_checkpoints(workdir)
+    print(f"\n💾 Прогресс {CHECKPOINT_WORDS} слов по 10: перезапись JSON {rewrite:.1f} s, журнал JSONL {append:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
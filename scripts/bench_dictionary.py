@@ -0,0 +1,168 @@
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import subprocess
+
+# Замер старта воркера и памяти словаря: как было (words.json разбирается
+# в dict в каждом процессе) и бинарный снимок words.bin через mmap.
+# Запуск: python scripts/bench_dictionary.py [words.json] [воркеров]
+# Без words.json словарь собирается из data/words_list.json с синтетическими определениями.
+#
+# Каждый режим запускает N процессов-«воркеров» одновременно (как gunicorn -w N):
+#   load     — время загрузки словаря и индекса WordEngine
+#   rss      — прирост RSS процесса после загрузки и запросов
+#   private  — частная память всех воркеров (Private_* из /proc/<pid>/smaps_rollup)
+#   pss      — память с учетом общих страниц (Pss): страницы words.bin делятся между воркерами
+#   cold/warm — поиск случайного слова в индексе (dict или words.bin): первый и повторный проход
+# Память берется из /proc, поэтому замер — только для Linux.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+LOOKUPS = 20000
+
+
+def memory():
+    """(RSS, Private, Pss) процесса в килобайтах"""
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1])
+    private = values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    return values.get('Rss', 0), private, values.get('Pss', 0)
+
+
+def legacy_load(path):
+    # Копия старого DictionaryStore._load и WordEngine._build_masks
+    from dictionary_store import normalize_word
+    from word_engine import GAME_WORD_RE, MIN_WORD_LENGTH, normalize_game_word, letters_mask
+
+    entries = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for item in json.load(f):
+            if isinstance(item, str):
+                item = {"word": item}
+            word = normalize_word(item.get('word'))
+            if word:
+                entries[word] = item
+    masks = {}
+    for entry in entries.values():
+        word = normalize_game_word(entry.get('word'))
+        if len(word) < MIN_WORD_LENGTH or not GAME_WORD_RE.match(word):
+            continue
+        masks[word] = letters_mask(word)
+    return entries.get, masks
+
+
+def binary_load(path):
+    from dictionary_store import DictionaryStore
+    from word_engine import WordEngine
+
+    store = DictionaryStore(path).load()
+    engine = WordEngine(store)
+    engine.buckets()
+    # Как и в старом режиме, замеряется сам индекс; проверка свежести файлов в get() не менялась
+    _, snapshot, _ = store.snapshot()
+    return snapshot.get, engine
+
+
+def child(mode, path):
+    import dictionary_store  # noqa: F401 — импорт модулей не входит в замер
+    import word_engine  # noqa: F401
+    with open(os.path.join(ROOT, 'data', 'words_list.json'), 'r', encoding='utf-8') as f:
+        sample = json.load(f)
+    rng = random.Random(1)
+    words = [rng.choice(sample) for _ in range(LOOKUPS)]
+    del sample
+
+    before = memory()
+    started = time.perf_counter()
+    get, index = (legacy_load if mode == 'json' else binary_load)(path)
+    load = time.perf_counter() - started
+
+    # Первый проход — с подкачкой страниц, второй — по уже прочитанным
+    lookups = []
+    for _ in range(2):
+        started = time.perf_counter()
+        found = sum(1 for w in words if get(w) is not None)
+        lookups.append((time.perf_counter() - started) / LOOKUPS)
+
+    # Ждем, пока загрузятся все воркеры: Pss считается при общих страницах
+    print("ready", flush=True)
+    sys.stdin.readline()
+    after = memory()
+    print(json.dumps({"load": load, "cold": lookups[0], "warm": lookups[1], "found": found,
+                      "rss": after[0] - before[0], "private": after[1] - before[1], "pss": after[2] - before[2]}), flush=True)
+
+
+def run(mode, path, workers):
+    procs = [subprocess.Popen([sys.executable, os.path.abspath(__file__), '--child', mode, path],
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, cwd=ROOT)
+             for _ in range(workers)]
+    for proc in procs:
+        assert proc.stdout.readline().strip() == "ready"
+    results = []
+    for proc in procs:
+        proc.stdin.write("\n")
+        proc.stdin.flush()
+        results.append(json.loads(proc.stdout.readline()))
+        proc.wait()
+    return results
+
+
+def make_dictionary(workdir):
+    with open(os.path.join(ROOT, 'data', 'words_list.json'), 'r', encoding='utf-8') as f:
+        words = json.load(f)
+    rng = random.Random(42)
+    filler = "толковое определение слова для замера памяти словаря".split()
+    entries = [{"word": w, "definition": " ".join(rng.choice(filler) for _ in range(rng.randrange(6, 30)))}
+               for w in words]
+    path = os.path.join(workdir, 'words.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def main():
+    from dictionary_store import binary_path_for
+    from dictionary_binary import BinaryDictionary
+    from build_dictionary_binary import build
+
+    if len(sys.argv) > 1:
+        path = os.path.abspath(sys.argv[1])
+    else:
+        path = make_dictionary(tempfile.mkdtemp(prefix="bench_dictionary_"))
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    binary_path = binary_path_for(path)
+
+    started = time.perf_counter()
+    build(path, binary_path)
+    build_time = time.perf_counter() - started
+    count = len(BinaryDictionary.open(binary_path))
+    print(f"📚 {count} words, json {os.path.getsize(path) / 1024 / 1024:.1f} MB, "
+          f"words.bin {os.path.getsize(binary_path) / 1024 / 1024:.1f} MB (build {build_time:.2f} s), {workers} workers\n")
+
+    print(f"   {'mode':<6} {'load':>9} {'rss/worker':>11} {'private':>9} {'pss':>9} {'cold':>9} {'warm':>9}")
+    for mode in ('json', 'mmap'):
+        results = run(mode, path, workers)
+        load = sum(r['load'] for r in results) / len(results)
+        rss = sum(r['rss'] for r in results) / len(results)
+        private = sum(r['private'] for r in results)
+        pss = sum(r['pss'] for r in results)
+        cold = sum(r['cold'] for r in results) / len(results)
+        warm = sum(r['warm'] for r in results) / len(results)
+        print(f"   {mode:<6} {load * 1000:7.0f} ms {rss / 1024:8.1f} MB {private / 1024:6.1f} MB {pss / 1024:6.1f} MB "
+              f"{cold * 1e6:6.2f} µs {warm * 1e6:6.2f} µs")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        child(sys.argv[2], sys.argv[3])
+    else:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        main()
@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+import random
+import tempfile
+import contextlib
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, delete, bindparam
+from sqlalchemy.orm import Session
+
+# Замер таблицы notifications на большом объеме: поиск уведомлений игрока
+# без индекса и с индексами, подтверждение пачкой и очистка по возрасту.
+# Запуск: python scripts/bench_notifications.py [строк] [игроков]
+# По умолчанию sqlite во временной папке; BENCH_DATABASE_URL=postgresql://... — своя база
+# (таблица notifications в ней будет пересоздана!)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+PLAYERS = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+LOOKUPS = 2000
+LOOKUPS_NO_INDEX = 100  # Без индекса каждый поиск — полный проход таблицы
+INSERT_CHUNK = 20000
+
+
+def fill(conn, table):
+    now = datetime.now(timezone.utc)
+    rng = random.Random(42)
+    for start in range(0, ROWS, INSERT_CHUNK):
+        # id задаем сами: в sqlite BIGINT PRIMARY KEY не автоинкрементный
+        conn.execute(table.insert(), [{
+            "id": row_id + 1,
+            "telegram_id": rng.randrange(PLAYERS),
+            "type": "daily_win",
+            "data": {"rank": 1, "score": 100},
+            # Возраст от 0 до 60 дней: примерно половина старше TTL по умолчанию
+            "created_at": now - timedelta(seconds=rng.randrange(60 * 86400)),
+        } for row_id in range(start, min(start + INSERT_CHUNK, ROWS))])
+        conn.commit()
+
+
+def time_lookups(conn, table, count):
+    # Тот же запрос, что в /api/notifications
+    rng = random.Random(7)
+    query = select(table.c.id, table.c.type, table.c.data).where(table.c.telegram_id == bindparam('player'))
+    started = time.perf_counter()
+    for _ in range(count):
+        conn.execute(query, {"player": rng.randrange(PLAYERS)}).all()
+    return (time.perf_counter() - started) / count
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix="bench_notifications_")
+    os.chdir(workdir)  # server_api при импорте создает public/words_list.json в текущей папке
+    os.environ['DATABASE_URL'] = os.environ.get('BENCH_DATABASE_URL') or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    for var in ('POSTGRES_USER', 'POSTGRES_PASSWORD', 'POSTGRES_DB'):
+        os.environ.pop(var, None)
+    os.environ.setdefault('NOTIFICATION_CLEANUP_PAUSE', '0')
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        import server_api
+        import cron_daily
+
+    table = server_api.Notification.__table__
+    with server_api.app.app_context():
+        engine = server_api.db.engine
+    table.drop(engine, checkfirst=True)
+    table.create(engine)
+    for index in table.indexes:
+        index.drop(engine)
+
+    print(f"🔔 {ROWS} notifications for {PLAYERS} players ({engine.dialect.name})\n")
+    with engine.connect() as conn:
+        started = time.perf_counter()
+        fill(conn, table)
+        print(f"   fill                {time.perf_counter() - started:8.1f} s")
+
+        no_index = time_lookups(conn, table, LOOKUPS_NO_INDEX)
+        print(f"   lookup, no index    {no_index * 1000:8.3f} ms")
+
+        started = time.perf_counter()
+        for index in table.indexes:
+            index.create(conn)
+        conn.commit()
+        print(f"   create indexes      {time.perf_counter() - started:8.1f} s")
+
+        with_index = time_lookups(conn, table, LOOKUPS)
+        print(f"   lookup, indexed     {with_index * 1000:8.3f} ms  x{no_index / with_index:.0f}")
+
+    # Подтверждение пачкой: как /api/notifications/ack
+    with engine.connect() as conn:
+        rng = random.Random(11)
+        players = [rng.randrange(PLAYERS) for _ in range(200)]
+        started = time.perf_counter()
+        for player in players:
+            ids = [row.id for row in conn.execute(select(table.c.id).where(table.c.telegram_id == player))]
+            conn.execute(delete(table).where(table.c.telegram_id == player, table.c.id.in_(ids)))
+            conn.commit()
+        print(f"   ack (per player)    {(time.perf_counter() - started) / len(players) * 1000:8.3f} ms")
+
+    # Очистка по возрасту (cron_daily.py cleanup): пачками, каждая своей транзакцией
+    with Session(engine) as session:
+        total, batches, elapsed = cron_daily.cleanup_notifications(session)
+    print(f"   cleanup             {elapsed:8.1f} s  ({total} rows, {batches} batches of {cron_daily.NOTIFICATION_CLEANUP_BATCH}, "
+          f"{total / elapsed if elapsed else 0:.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
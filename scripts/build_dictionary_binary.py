@@ -0,0 +1,41 @@
+import os
+import sys
+import time
+
+# Сборка бинарного снимка словаря (words.bin) из words.json.
+# Запуск: python scripts/build_dictionary_binary.py [words.json] [words.bin]
+# Сервер собирает снимок и сам, если его нет или он устарел, но тогда
+# это делает первый воркер при старте; после выгрузки словаря лучше собрать заранее.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dictionary_store import binary_path_for, read_entries  # noqa: E402
+from dictionary_binary import BinaryDictionary, build_binary, write_binary  # noqa: E402
+
+
+def build(json_path, binary_path=None):
+    binary_path = binary_path or binary_path_for(json_path)
+    st = os.stat(json_path)
+    write_binary(binary_path, build_binary(read_entries(json_path), (st.st_size, st.st_mtime_ns)))
+    return binary_path
+
+
+def main():
+    json_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join("public", "words.json")
+    binary_path = sys.argv[2] if len(sys.argv) > 2 else None
+    if not os.path.exists(json_path):
+        print(f"❌ {json_path} not found")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    binary_path = build(json_path, binary_path)
+    elapsed = time.perf_counter() - started
+    snapshot = BinaryDictionary.open(binary_path)
+    print(f"✅ {binary_path}: {len(snapshot)} words, {snapshot.game_count} game words, "
+          f"{os.path.getsize(binary_path) / 1024 / 1024:.1f} MB (json {os.path.getsize(json_path) / 1024 / 1024:.1f} MB) "
+          f"in {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,446 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Общий генератор определений через LLM: generate_definitions_ai.py,
+# generate_definitions_gemini.py и generate_definitions_yandex.py — его обертки.
+#
+# Слова группируются в пачки (одна пачка — один запрос, если бэкенд умеет
+# несколько слов в одном промпте) и отправляются пулом асинхронных воркеров;
+# частоту запросов держит ограничитель своего бэкенда.
+# Готовые определения дописываются в журнал <выход>.jsonl после каждой пачки,
+# после падения генерация продолжается по журналу, без перечитывания выхода.
+# В конце журнал выгружается в обычный JSON [{"word", "definition", "source"}],
+# который читает definition_merge.py.
+# Запуск: python scripts/definition_generator.py --backend mock|yandex|gemini [--input missing.txt] [--output ...]
+
+WORKERS = int(os.environ.get('DEFINITION_WORKERS', 8))
+# Попыток на пачку; между ними пауза растет вдвое
+RETRIES = 3
+RETRY_DELAY = 1.0
+
+SYSTEM_PROMPT = "Ты - толковый словарь. Дай краткое, сухое определение слову. Максимум 1 предложение. Без вводных фраз типа 'Это...'."
+BATCH_PROMPT = """Ты - словарь. Дай краткие определения для следующих слов в формате JSON:
+{{ "слово": "определение", "слово2": "определение2" }}
+
+Определения должны быть:
+1. На русском языке.
+2. Краткими (1 предложение).
+3. Без слов "это", "является".
+
+Слова: {words}"""
+
+def load_env():
+    """Простейшая загрузка .env файла, если он есть"""
+    if os.path.exists(".env"):
+        with open(".env", "r") as f:
+            for line in f:
+                if "=" in line:
+                    key, value = line.strip().split("=", 1)
+                    os.environ[key] = value.strip('"').strip("'")
+
+def parse_json_answer(text):
+    """{слово: определение} из ответа модели (иногда он обернут в ```json)"""
+    if "```" in text:
+        text = text.split("```")[1]
+        if text.startswith("json"):
+            text = text[4:]
+    data = json.loads(text.strip())
+    return {str(word).strip().lower(): str(definition).strip() for word, definition in data.items()}
+
+# --- ОГРАНИЧИТЕЛЬ ---
+
+class RateLimiter:
+    """Не больше rate запросов в секунду (ведро на burst запросов); rate=0 — без ограничения"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+# --- БЭКЕНДЫ ---
+
+class Backend:
+    """
+    Бэкенд генерации. batch_size — слов в одном запросе, rate — запросов в секунду.
+    Бэкенд реализует generate(words) -> {слово: определение} (async) или
+    request(words) (синхронный HTTP-клиент — вызывается в пуле потоков).
+    Слова, которых нет в ответе, остаются несделанными до следующего запуска.
+    """
+
+    name = "backend"
+    source = "ai"
+    batch_size = 1
+    rate = 0
+
+    def setup(self):
+        """Проверка настроек перед запуском: False — генерация невозможна"""
+        return True
+
+    async def generate(self, words):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.request, words)
+
+    def request(self, words):
+        raise NotImplementedError
+
+class MockBackend(Backend):
+    """Локальный бэкенд для замеров без сети: отвечает через latency секунд"""
+
+    name = "mock"
+    source = "mock"
+
+    def __init__(self, batch_size=20, rate=0, latency=0.2, failure_rate=0.0, seed=1):
+        self.batch_size = batch_size
+        self.rate = rate
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self.requests = 0
+
+    async def generate(self, words):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        if self._rng.random() < self.failure_rate:
+            raise RuntimeError("mock failure")
+        return {word: f"Определение слова {word}" for word in words}
+
+class YandexBackend(Backend):
+    """YandexGPT: одно слово — короткий промпт, несколько — промпт с ответом в JSON"""
+
+    name = "yandex"
+    source = "yandex_gpt"
+    URL = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
+
+    def __init__(self, model="yandexgpt-lite", system_prompt=SYSTEM_PROMPT, user_prompt="Слово: {word}",
+                 max_tokens=50, batch_size=1, rate=None):
+        self.model = model
+        self.system_prompt = system_prompt
+        self.user_prompt = user_prompt
+        self.max_tokens = max_tokens
+        self.batch_size = batch_size
+        # Лимит около 10 RPS, но лучше перестраховаться
+        self.rate = float(os.environ.get('YANDEX_RPS', 5)) if rate is None else rate
+        self._local = threading.local()
+
+    def setup(self):
+        load_env()
+        self.folder_id = os.getenv("YANDEX_FOLDER_ID", "")
+        self.api_key = os.getenv("YANDEX_API_KEY", "")
+        if not self.folder_id or not self.api_key:
+            print("❌ ОШИБКА: Не заданы YANDEX_FOLDER_ID или YANDEX_API_KEY.")
+            print("Получите их в консоли Yandex Cloud (или в .env).")
+            return False
+        return True
+
+    def _session(self):
+        import requests
+        # Своя сессия на поток: соединения переиспользуются, а не открываются на каждое слово
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+            self._local.session.headers.update({
+                "Content-Type": "application/json",
+                "Authorization": f"Api-Key {self.api_key}",
+                "x-folder-id": self.folder_id,
+            })
+        return self._local.session
+
+    def request(self, words):
+        single = len(words) == 1
+        prompt = {
+            "modelUri": f"gpt://{self.folder_id}/{self.model}",
+            "completionOptions": {
+                "stream": False,
+                "temperature": 0.3, # Поменьше креатива, больше фактов
+                "maxTokens": str(self.max_tokens if single else self.max_tokens * len(words))
+            },
+            "messages": [
+                {"role": "system", "text": self.system_prompt},
+                {"role": "user", "text": self.user_prompt.format(word=words[0]) if single
+                                 else BATCH_PROMPT.format(words=", ".join(words))}
+            ]
+        }
+        response = self._session().post(self.URL, json=prompt, timeout=60)
+        response.raise_for_status()
+        text = response.json()['result']['alternatives'][0]['message']['text'].strip()
+        if not single:
+            return {word: self.clean(d) for word, d in parse_json_answer(text).items()}
+        return {words[0]: self.clean(text)}
+
+    @staticmethod
+    def clean(definition):
+        # Очистка от лишних символов
+        definition = definition.strip().strip('"').strip("'").replace(" - это", "").strip()
+        if definition.endswith('.'): definition = definition[:-1]
+        return definition
+
+class GeminiBackend(Backend):
+    """Gemini (google-generativeai): пачки по 20 слов в одном промпте"""
+
+    name = "gemini"
+    source = "gemini_ai"
+
+    def __init__(self, model="models/gemini-1.5-flash", batch_size=20, rate=None):
+        self.model_name = model
+        self.batch_size = batch_size
+        self.rate = float(os.environ.get('GEMINI_RPS', 1)) if rate is None else rate
+
+    def setup(self):
+        load_env()
+        api_key = os.getenv("GOOGLE_API_KEY", "")
+        if not api_key:
+            print("❌ ОШИБКА: Не задан GOOGLE_API_KEY.")
+            return False
+        try:
+            import google.generativeai as genai
+        except ImportError:
+            print("❌ Не установлен пакет google-generativeai (pip install google-generativeai)")
+            return False
+        genai.configure(api_key=api_key)
+
+        # ПРОВЕРКА ДОСТУПНЫХ МОДЕЛЕЙ
+        print("Проверка доступных моделей...")
+        available_models = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
+        if self.model_name not in available_models:
+            print(f"⚠️ Модель {self.model_name} не найдена.")
+            # Пробуем найти любую версию flash или pro
+            flash_models = [m for m in available_models if 'flash' in m]
+            self.model_name = flash_models[0] if flash_models else 'models/gemini-pro'
+            print(f"🔄 Использую альтернативу: {self.model_name}")
+        self.model = genai.GenerativeModel(self.model_name)
+        return True
+
+    def request(self, words):
+        response = self.model.generate_content(BATCH_PROMPT.format(words=", ".join(words)))
+        return parse_json_answer(response.text)
+
+BACKENDS = {"mock": MockBackend, "yandex": YandexBackend, "gemini": GeminiBackend}
+
+# --- ЖУРНАЛ ---
+
+class Checkpoint:
+    """Журнал готовых определений: по строке JSON на слово, только дописывается"""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        self._file = None
+
+    def load(self):
+        """{слово: запись} из журнала; недописанная при падении строка отрезается"""
+        done = self.done = {}
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, 'rb+') as f:
+            valid = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    break
+                done[item['word']] = item
+                valid += len(line)
+            f.truncate(valid)
+        return done
+
+    def append(self, items):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write("".join(json.dumps(item, ensure_ascii=False) + "\n" for item in items))
+        self._file.flush()
+        for item in items:
+            self.done[item['word']] = item
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def read_words(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [word for word in (line.strip().lower() for line in f) if word]
+
+def read_done_words(path):
+    """Слова из чужого JSON-выхода, которые не нужно генерировать заново"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return {item['word'].lower() for item in json.load(f)}
+    except (OSError, ValueError, KeyError, TypeError):
+        return set()
+
+def export(done, output_file):
+    """Журнал -> обычный JSON-выход одной записью"""
+    tmp_path = f"{output_file}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(list(done.values()), f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, output_file)
+
+# --- ГЕНЕРАЦИЯ ---
+
+class Progress:
+    def __init__(self, total, verbose=True):
+        self.total = total
+        self.verbose = verbose
+        self.done = 0
+        self.failed_batches = 0
+        self.started = time.perf_counter()
+
+    def add(self, items):
+        self.done += len(items)
+        if self.verbose:
+            for item in items:
+                print(f"✅ {item['word']}: {item['definition']}")
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.done / elapsed if elapsed else 0
+        print(f"\n📊 Готово {self.done} из {self.total} за {elapsed:.1f} s ({rate:.1f} слов/с), "
+              f"пачек с ошибкой: {self.failed_batches}")
+
+async def _generate_batch(backend, limiter, batch):
+    delay = RETRY_DELAY
+    for attempt in range(RETRIES):
+        await limiter.acquire()
+        try:
+            return await backend.generate(batch)
+        except Exception as e:
+            if attempt == RETRIES - 1:
+                print(f"⚠️ Пачка {batch[0]}…: {e}")
+                return None
+            await asyncio.sleep(delay)
+            delay *= 2
+
+async def _worker(queue, backend, limiter, checkpoint, progress):
+    while True:
+        batch = await queue.get()
+        try:
+            answer = await _generate_batch(backend, limiter, batch)
+            if answer is None:
+                progress.failed_batches += 1
+                continue
+            wanted = set(batch)
+            items = [{"word": word, "definition": definition, "source": backend.source}
+                     for word, definition in answer.items() if word in wanted and definition]
+            if items:
+                checkpoint.append(items)
+                progress.add(items)
+        finally:
+            queue.task_done()
+
+async def _run(backend, words, checkpoint, workers, verbose):
+    limiter = RateLimiter(backend.rate)
+    progress = Progress(len(words), verbose)
+    loop = asyncio.get_running_loop()
+    # Синхронные HTTP-клиенты работают в потоках: потоков столько же, сколько воркеров
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=workers))
+
+    queue = asyncio.Queue()
+    for i in range(0, len(words), backend.batch_size):
+        queue.put_nowait(words[i:i + backend.batch_size])
+    tasks = [asyncio.create_task(_worker(queue, backend, limiter, checkpoint, progress)) for _ in range(workers)]
+    try:
+        await queue.join()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return progress
+
+def generate(backend, input_file, output_file, workers=WORKERS, limit=None, skip_files=(), verbose=True):
+    """
+    Генерирует определения слов из input_file, которых еще нет в журнале
+    (и в skip_files), и выгружает журнал в output_file. Возвращает {слово: запись}.
+    """
+    if not backend.setup():
+        return None
+    if not os.path.exists(input_file):
+        print(f"❌ Файл {input_file} не найден.")
+        return None
+
+    checkpoint = Checkpoint(os.path.splitext(output_file)[0] + ".jsonl")
+    done = checkpoint.load()
+    if not done and os.path.exists(output_file):
+        # Выход от старых версий скрипта, без журнала
+        try:
+            with open(output_file, 'r', encoding='utf-8') as f:
+                legacy = [item for item in json.load(f) if item.get('word') and item.get('definition')]
+        except (OSError, ValueError):
+            legacy = []
+        # Переносим в журнал один раз, дальше продолжаем по нему
+        checkpoint.append(legacy)
+        done = checkpoint.done
+
+    skip = set(done)
+    for path in skip_files:
+        skip |= read_done_words(path)
+    words = list(dict.fromkeys(w for w in read_words(input_file) if w not in skip))
+    if limit:
+        words = words[:limit]
+    print(f"📚 Уже готово: {len(done)}, к генерации: {len(words)} "
+          f"({backend.name}, пачки по {backend.batch_size}, воркеров: {workers}, "
+          f"{f'{backend.rate:g} запр/с' if backend.rate else 'без лимита'})")
+
+    try:
+        progress = asyncio.run(_run(backend, words, checkpoint, workers, verbose))
+        progress.report()
+    except KeyboardInterrupt:
+        print("\n⛔ Прервано: готовое сохранено в журнале, следующий запуск продолжит")
+    finally:
+        checkpoint.close()
+
+    done = checkpoint.done
+    export(done, output_file)
+    print(f"💾 Сохранено {len(done)} определений в {output_file}")
+    return done
+
+def make_backend(name, batch_size=None, rate=None, latency=None):
+    kwargs = {}
+    if batch_size:
+        kwargs['batch_size'] = batch_size
+    if rate is not None:
+        kwargs['rate'] = rate
+    if latency is not None and name == "mock":
+        kwargs['latency'] = latency
+    return BACKENDS[name](**kwargs)
+
+def parse_args(description, input_file, output_file, backend="mock"):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=backend)
+    parser.add_argument("--latency", type=float, default=None, help="Задержка ответа mock, s")
+    parser.add_argument("--input", default=input_file, help=f"Список слов (по умолчанию {input_file})")
+    parser.add_argument("--output", default=output_file, help=f"Выходной JSON (по умолчанию {output_file})")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Одновременных запросов")
+    parser.add_argument("--batch", type=int, default=None, help="Слов в одном запросе")
+    parser.add_argument("--rps", type=float, default=None, help="Запросов в секунду (0 — без лимита)")
+    parser.add_argument("--limit", type=int, default=None, help="Не больше стольких слов за запуск")
+    parser.add_argument("--quiet", action="store_true", help="Не печатать каждое определение")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    sys.stdout.reconfigure(encoding='utf-8')
+    args = parse_args("Генерация определений через LLM", "missing.txt", "mock_definitions.json")
+    generate(make_backend(args.backend, args.batch, args.rps, args.latency), args.input, args.output,
+             workers=args.workers, limit=args.limit, verbose=not args.quiet)
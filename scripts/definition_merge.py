@@ -0,0 +1,467 @@
+import os
+import re
+import json
+import time
+import pickle
+import hashlib
+import argparse
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+# Общий движок сборки определений: build_dictionary.py, merge_definitions.py
+# и audit_and_fix.py — его обертки с разными цепочками источников и выходами.
+#
+# За один запуск каждый источник читается один раз (Ожегов — построчно),
+# для каждого игрового слова берется определение первого источника цепочки,
+# у которого оно есть, и за один проход пишутся все нужные выходы.
+# Запуск: python scripts/definition_merge.py [--chain gemini,yandex,ai,ozhegov,autofix] [--full] [--jobs N]
+
+# Входные файлы
+WORDS_FILE = os.path.join("public", "words.txt")
+OZHEGOV_FILE = "ozhegov.txt"
+# Определения от ИИ: [{"word", "definition"}]
+AI_SOURCES = {
+    "gemini": "gemini_definitions.json",
+    "yandex": "yandex_definitions.json",
+    "ai": "ai_definitions.json",
+}
+SOURCES = tuple(AI_SOURCES) + ("ozhegov", "autofix")
+DEFAULT_CHAIN = ("gemini", "yandex", "ai", "ozhegov", "autofix")
+AUTOFIX_SOURCE = "autofix_plural"
+
+# Выходные файлы
+OUTPUT_WORDS = os.path.join("public", "words.json")
+OUTPUT_LIST = os.path.join("public", "words_list.json")
+OUTPUT_MISSING = "final_missing.txt"
+OUTPUT_FIXES = "fixes.json"
+CACHE_FILE = ".definition_merge_cache.pkl"
+
+# Меньше стольких слов на пересборку — без пула процессов (его запуск дороже)
+PARALLEL_MIN_WORDS = 2000
+CHUNK_SIZE = 500
+
+# --- ЧИСТКА И ССЫЛКИ ---
+
+# Правила чистки (скомпилированы один раз, а не на каждое определение)
+BRACKETS_RE = re.compile(r'\[.*?\]')
+# Пометки в круглых скобках типа (<= слово) или (см. слово)
+ARROW_NOTE_RE = re.compile(r'\(\s*[<>=]+\s*[^)]+\)')
+NOISE = [
+    'Lib', 'Spec', 'Obs', 'Colloq', 'Poet', 'Non-st', 'Pejor', 'Arch', 'Dial',
+    r'N\d+', 'Maxime', 'Iron', 'Jest', 'Deprec', 'Poet', 'стар', 'разг', 'прост', 'книжн'
+]
+NOISE_RE = re.compile(r'\b(' + '|'.join(NOISE) + r')\b[.,]?', re.IGNORECASE)
+ARROWS_RE = re.compile(r'[<>=]{1,2}\s+')
+SPACES_RE = re.compile(r'\s+')
+# Определение целиком — ссылка: '== слово', '= слово', '<= слово', можно с номером омонима
+REFERENCE_RE = re.compile(r'^(?:[<>=]{1,2})\s*([а-яё-]+)(?:\s+(\d+))?$', re.IGNORECASE)
+
+def clean_definition(text):
+    if not text:
+        return ""
+
+    # 1. Убираем содержимое в квадратных скобках [любой текст]
+    text = BRACKETS_RE.sub('', text)
+
+    # 2. Убираем пометки-ссылки в круглых скобках
+    text = ARROW_NOTE_RE.sub('', text)
+
+    # 3. Убираем спец-теги и пометки
+    text = NOISE_RE.sub('', text)
+
+    # 4. Если в начале осталось что-то вроде "<= слово", это значит ссылка не разрешилась
+    # Убираем эти символы из текста, если они остались внутри
+    text = ARROWS_RE.sub('', text)
+
+    # 5. Убираем лишние пробелы и знаки препинания в конце/начале
+    text = SPACES_RE.sub(' ', text).strip()
+    text = text.strip('., ')
+
+    return text
+
+_IN_PROGRESS = object()
+
+class ReferenceResolver:
+    """
+    Разрешает ссылки вида '== слово', '= слово', '<= слово'.
+    Результат для каждой цели ссылки (слово, номер омонима) запоминается:
+    на одно слово Ожегова ссылаются многие. Вместе с текстом возвращаются
+    слова Ожегова, которые пришлось посмотреть, — от них зависит результат.
+    """
+
+    def __init__(self, ozhegov_defs):
+        self.ozhegov_defs = ozhegov_defs
+        self._memo = {}
+
+    def resolve(self, text):
+        match = REFERENCE_RE.match(text.strip()) if text else None
+        if not match:
+            return text, ()
+
+        key = (match.group(1).lower(), match.group(2))
+        result = self._memo.get(key)
+        if result is _IN_PROGRESS:
+            # Ссылки по кругу: оставляем ссылку как есть
+            return text, (key[0],)
+        if result is not None:
+            return result
+
+        self._memo[key] = _IN_PROGRESS
+        ref_word, ref_id = key
+        defs = self.ozhegov_defs.get(ref_word)
+        if defs is None:
+            result = (text, (ref_word,))
+        else:
+            # Если не нашли по ID или ID не указан, берем первое
+            definition = next((d for hid, d in defs if hid == ref_id), defs[0][1]) if ref_id else defs[0][1]
+            resolved, deps = self.resolve(definition)
+            result = (resolved, (ref_word,) + deps)
+        self._memo[key] = result
+        return result
+
+# --- СЛОВОФОРМЫ ---
+
+# Правила словоформ по приоритету: (окончание игрового слова, окончание формы в Ожегове).
+# "?" — любая последняя буква. Чаще всего в Ожегове слово есть во множественном числе.
+VARIANT_RULES = (
+    ("а", "ы"),   # бутса -> бутсы
+    ("я", "и"),   # вишня -> вишни
+    ("ь", "и"),   # дверь -> двери
+    ("ы", ""),    # столы -> стол
+    ("и", ""),
+    ("", "ы"),    # стол -> столы
+    ("", "и"),
+    ("?", "ы"),
+    ("?", "и"),
+    ("?", "а"),
+    ("?", "ь"),
+)
+
+class VariantIndex:
+    """
+    Индекс словоформ Ожегова: основа -> окончания, с которыми она есть в словаре
+    (для окончаний из правил). Форма слова ищется по основе, а не перебором словаря.
+    """
+
+    def __init__(self, rules=VARIANT_RULES):
+        self.rules = rules
+        self.endings = sorted({ending for _, ending in rules}, key=len, reverse=True)
+        self._stems = {}
+
+    def add(self, headword):
+        for ending in self.endings:
+            if headword.endswith(ending):
+                self._stems.setdefault(headword[:len(headword) - len(ending)], set()).add(ending)
+
+    def _candidates(self, word):
+        seen = {word}
+        for source, ending in self.rules:
+            if source == "?":
+                stem = word[:-1]
+            elif word.endswith(source):
+                stem = word[:len(word) - len(source)]
+            else:
+                continue
+            form = stem + ending
+            if stem and form not in seen:
+                seen.add(form)
+                yield form, stem, ending
+
+    def lookup(self, word):
+        """(первая форма слова, которая есть в словаре, или None; все просмотренные формы)"""
+        probed = []
+        for form, stem, ending in self._candidates(word):
+            probed.append(form)
+            if ending in self._stems.get(stem, ()):
+                return form, probed
+        return None, probed
+
+# --- ИСТОЧНИКИ ---
+
+def iter_game_words(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            word = line.strip().lower()
+            if word:
+                yield word
+
+def iter_ozhegov(path):
+    """(слово, номер омонима, определение) — построчно, без загрузки файла целиком"""
+    with open(path, 'r', encoding='utf-8') as f:
+        f.readline() # Header
+        for line in f:
+            parts = line.split('|')
+            if len(parts) >= 6:
+                word = parts[0].strip().lower()
+                definition = parts[5].strip()
+                if word and definition and len(definition) > 1:
+                    yield word, parts[1].strip(), definition
+
+def load_ai(path, game_words):
+    """Определения ИИ только для игровых слов: остальное сразу отбрасывается"""
+    defs = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for item in json.load(f):
+            word = (item.get('word') or '').strip().lower()
+            if word in game_words and item.get('definition'):
+                defs[word] = item['definition']
+    return defs
+
+class Sources:
+    """Все источники цепочки, прочитанные по одному разу"""
+
+    def __init__(self, chain, game_words, ai, ozhegov, variants):
+        self.chain = chain
+        self.game_words = game_words
+        self.ai = ai
+        self.ozhegov = ozhegov
+        self.variants = variants
+
+    @classmethod
+    def load(cls, chain, timer):
+        with timer.stage("words.txt"):
+            game_words = sorted(set(iter_game_words(WORDS_FILE)))
+        print(f"📚 Игровых слов: {len(game_words)}")
+
+        wanted = set(game_words)
+        ai = {}
+        for name in chain:
+            if name in AI_SOURCES and os.path.exists(AI_SOURCES[name]):
+                with timer.stage(AI_SOURCES[name]):
+                    ai[name] = load_ai(AI_SOURCES[name], wanted)
+                print(f"🤖 {name}: {len(ai[name])} определений")
+
+        ozhegov, variants = {}, VariantIndex()
+        if ("ozhegov" in chain or "autofix" in chain) and os.path.exists(OZHEGOV_FILE):
+            with timer.stage("ozhegov"):
+                # Словарь нужен весь: ссылки '= слово' ведут куда угодно
+                for word, homonym_id, definition in iter_ozhegov(OZHEGOV_FILE):
+                    if word not in ozhegov:
+                        variants.add(word)
+                    ozhegov.setdefault(word, []).append((homonym_id, definition))
+            print(f"📖 Словарь Ожегова: {len(ozhegov)} слов (с вариантами)")
+        return cls(chain, game_words, ai, ozhegov, variants)
+
+    def ai_values(self, word):
+        return tuple(self.ai[name].get(word) for name in self.chain if name in self.ai)
+
+    def input_hash(self, word, deps):
+        """Хеш всего, от чего зависит определение слова (правила сверяются для всего кэша сразу)"""
+        payload = (self.ai_values(word), [self.ozhegov.get(d) for d in deps])
+        return hashlib.blake2b(repr(payload).encode('utf-8'), digest_size=12).hexdigest()
+
+def resolve_word(word, sources, resolver, clean):
+    """(определение или None, источник, слова Ожегова, от которых зависит результат)"""
+    deps = []
+    for name in sources.chain:
+        if name in AI_SOURCES:
+            definition = sources.ai.get(name, {}).get(word)
+            if definition:
+                return (clean_definition(definition) if clean else definition), name, deps
+        elif name == "ozhegov":
+            deps.append(word)
+            defs = sources.ozhegov.get(word)
+            if defs:
+                # Берем первое определение (обычно основное значение)
+                text, refs = resolver.resolve(defs[0][1])
+                return (clean_definition(text) if clean else text), name, deps + list(refs)
+        elif name == "autofix":
+            form, probed = sources.variants.lookup(word)
+            deps.extend(probed)
+            if form:
+                text, refs = resolver.resolve(sources.ozhegov[form][0][1])
+                text = f"({form.upper()}) {text}"
+                return (clean_definition(text) if clean else text), AUTOFIX_SOURCE, deps + list(refs)
+    return None, None, deps
+
+# --- ПУЛ ПРОЦЕССОВ ---
+
+_worker = None
+
+def _init_worker(sources, clean):
+    global _worker
+    _worker = (sources, ReferenceResolver(sources.ozhegov), clean)
+
+def _resolve_chunk(words):
+    sources, resolver, clean = _worker
+    return [(word,) + resolve_word(word, sources, resolver, clean) for word in words]
+
+def resolve_words(words, sources, clean, jobs):
+    """[(слово, определение, источник, зависимости)] — в пуле процессов, если слов много"""
+    if jobs <= 1 or len(words) < PARALLEL_MIN_WORDS:
+        _init_worker(sources, clean)
+        return _resolve_chunk(words)
+    chunks = [words[i:i + CHUNK_SIZE] for i in range(0, len(words), CHUNK_SIZE)]
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(sources, clean)) as pool:
+        return [entry for chunk in pool.map(_resolve_chunk, chunks) for entry in chunk]
+
+# --- ЗАМЕР ЭТАПОВ ---
+
+class StageTimer:
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - started))
+
+    def report(self):
+        print("\n⏱️ Этапы сборки:")
+        for name, elapsed in self.stages:
+            print(f"   {name:<26} {elapsed:7.2f} s")
+        print(f"   {'всего':<26} {sum(e for _, e in self.stages):7.2f} s")
+
+# --- КЭШ ---
+
+def rules_fingerprint(chain, clean):
+    # Правила сборки — код движка и настройки цепочки: поменялись — кэш недействителен
+    with open(os.path.abspath(__file__), 'rb') as f:
+        code = f.read()
+    return hashlib.sha1(code + repr((tuple(chain), clean)).encode('utf-8')).hexdigest()
+
+def file_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+def load_cache(path, rules):
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        # Файл локальный и читается только этим скриптом, поэтому pickle (в разы быстрее JSON)
+        with open(path, 'rb') as f:
+            cache = pickle.load(f)
+    except (pickle.UnpicklingError, EOFError, ValueError):
+        return {}
+    return cache if cache.get('rules') == rules else {}
+
+def save_cache(path, cache):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+# --- ВЫХОДЫ ---
+
+def _write_json(path, data, **kwargs):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, **kwargs)
+
+def write_outputs(entries, game_words, outputs):
+    """
+    outputs — {вид: путь}: words (words.json), list (words_list.json),
+    dictionary ({слово: определение}), missing (слова без определения), fixes (автоисправления)
+    """
+    found = [(w, entries[w]) for w in game_words if entries[w]['definition'] is not None]
+    missing = [w for w in game_words if entries[w]['definition'] is None]
+
+    if outputs.get('words'):
+        _write_json(outputs['words'], [{"word": w, "definition": e['definition']} for w, e in found], indent=2)
+    if outputs.get('list'):
+        _write_json(outputs['list'], [w for w, _ in found])
+    if outputs.get('dictionary'):
+        _write_json(outputs['dictionary'], {w: e['definition'] for w, e in found}, indent=2)
+    fixes = [{"word": w, "definition": e['definition'], "source": e['source']}
+             for w, e in found if e['source'] == AUTOFIX_SOURCE]
+    if outputs.get('fixes') and fixes:
+        _write_json(outputs['fixes'], fixes, indent=2)
+    if outputs.get('missing') and missing:
+        with open(outputs['missing'], 'w', encoding='utf-8') as f:
+            f.write("\n".join(missing))
+    return found, missing, fixes
+
+# --- СБОРКА ---
+
+def merge(chain=DEFAULT_CHAIN, outputs=None, clean=True, cache_file=CACHE_FILE, full=False, jobs=None):
+    """
+    Собирает определения всех игровых слов по цепочке источников chain
+    (имена из SOURCES, по убыванию приоритета) и пишет выходы outputs.
+    clean — чистить определения от помет и ссылок (clean_definition).
+    cache_file — кэш инкрементальной сборки (None — без кэша): пересобираются
+    только слова, у которых изменились входные данные.
+    Возвращает (найдено, без определения, автоисправлено) или None, если нечего делать.
+    """
+    unknown = [name for name in chain if name not in SOURCES]
+    if unknown:
+        raise ValueError(f"unknown sources: {', '.join(unknown)}")
+    outputs = outputs or {}
+    timer = StageTimer()
+    jobs = jobs or os.cpu_count() or 1
+
+    if not os.path.exists(WORDS_FILE):
+        print(f"❌ Нет файла {WORDS_FILE}")
+        return None
+
+    rules = rules_fingerprint(chain, clean)
+    input_files = [WORDS_FILE, OZHEGOV_FILE] + [AI_SOURCES[name] for name in chain if name in AI_SOURCES]
+    inputs = {path: file_signature(path) for path in input_files}
+    inputs['outputs'] = sorted(outputs.items())
+    cache = {} if full else load_cache(cache_file, rules)
+    if cache.get('inputs') == inputs and all(os.path.exists(p) for p in outputs.values() if p):
+        print("✅ Входные файлы не менялись — всё уже собрано (--full, чтобы пересобрать)")
+        return None
+
+    sources = Sources.load(chain, timer)
+
+    # Что из кэша еще годится: входные данные слова не изменились
+    entries = {}
+    with timer.stage("проверка кэша"):
+        cached = cache.get('entries', {})
+        todo = []
+        for word in sources.game_words:
+            entry = cached.get(word)
+            if entry and sources.input_hash(word, entry['deps']) == entry['hash']:
+                entries[word] = entry
+            else:
+                todo.append(word)
+    if cache_file:
+        print(f"♻️ Из кэша: {len(entries)}, пересобрать: {len(todo)}")
+
+    # Пересобираем изменившееся
+    parallel = len(todo) >= PARALLEL_MIN_WORDS and jobs > 1
+    with timer.stage(f"сборка ({jobs} проц.)" if parallel else "сборка"):
+        for word, definition, source, deps in resolve_words(todo, sources, clean, jobs):
+            entries[word] = {"definition": definition, "source": source, "deps": deps,
+                             "hash": sources.input_hash(word, deps)}
+
+    with timer.stage("запись"):
+        result = write_outputs(entries, sources.game_words, outputs)
+        if cache_file:
+            save_cache(cache_file, {"rules": rules, "inputs": inputs, "entries": entries})
+
+    found, missing, fixes = result
+    by_source = {}
+    for _, entry in found:
+        by_source[entry['source']] = by_source.get(entry['source'], 0) + 1
+    print(f"\n✅ Определено: {len(found)} слов ({', '.join(f'{s}: {n}' for s, n in by_source.items())})")
+    print(f"⚠️ Без определения: {len(missing)} слов")
+    for kind, path in outputs.items():
+        if path and os.path.exists(path):
+            print(f"💾 {kind}: {path}")
+    timer.report()
+    return result
+
+def parse_args(description, default_chain):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--chain", default=",".join(default_chain),
+                        help=f"Источники по приоритету через запятую: {', '.join(SOURCES)}")
+    parser.add_argument("--full", action="store_true", help="Пересобрать все слова, не глядя в кэш")
+    parser.add_argument("--jobs", type=int, default=None, help="Процессов для сборки (по умолчанию — все ядра)")
+    args = parser.parse_args()
+    args.chain = tuple(name.strip() for name in args.chain.split(",") if name.strip())
+    unknown = [name for name in args.chain if name not in SOURCES]
+    if unknown:
+        parser.error(f"неизвестные источники: {', '.join(unknown)}")
+    return args
+
+if __name__ == "__main__":
+    args = parse_args("Сборка словаря из всех источников", DEFAULT_CHAIN)
+    merge(args.chain, {"words": OUTPUT_WORDS, "list": OUTPUT_LIST, "missing": OUTPUT_MISSING, "fixes": OUTPUT_FIXES},
+          full=args.full, jobs=args.jobs)
@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Локальная заглушка Telegram Bot API для проверки рассылок.
+#
+# Сервер:  python scripts/fake_bot_api.py --port 8081
+#          TELEGRAM_API_URL=http://localhost:8081 python cron_daily.py notify
+# Замер:   python scripts/fake_bot_api.py --bench 2000
+#
+# Как и настоящий Telegram, отвечает 429 с retry_after, если бот шлет
+# больше --rate сообщений в секунду или чаще раза в секунду в один чат.
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeBotState:
+    def __init__(self, rate, chat_interval, latency, fail_rate, blocked_every):
+        self.rate = rate
+        self.chat_interval = chat_interval
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.blocked_every = blocked_every
+        self.lock = threading.Lock()
+        self.window = deque()
+        self.last_by_chat = {}
+        self.stats = {"ok": 0, "429": 0, "403": 0, "500": 0}
+
+    def handle(self, chat_id):
+        """Возвращает (HTTP-код, тело ответа)"""
+        if self.latency:
+            time.sleep(self.latency)
+        now = time.monotonic()
+        with self.lock:
+            while self.window and now - self.window[0] > 1:
+                self.window.popleft()
+            last = self.last_by_chat.get(chat_id)
+            if len(self.window) >= self.rate or (last is not None and now - last < self.chat_interval):
+                self.stats["429"] += 1
+                return 429, {"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                             "parameters": {"retry_after": 1}}
+            self.window.append(now)
+            self.last_by_chat[chat_id] = now
+            if self.blocked_every and int(chat_id) % self.blocked_every == 0:
+                self.stats["403"] += 1
+                return 403, {"ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user"}
+            if random.random() < self.fail_rate:
+                self.stats["500"] += 1
+                return 500, {"ok": False, "error_code": 500, "description": "Internal Server Error"}
+            self.stats["ok"] += 1
+            return 200, {"ok": True, "result": {"message_id": self.stats["ok"], "chat": {"id": chat_id}}}
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, как у api.telegram.org
+
+        def _reply(self, code, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return self._reply(400, {"ok": False, "error_code": 400, "description": "Bad Request"})
+            if not self.path.endswith("/sendMessage") or "chat_id" not in payload:
+                return self._reply(400, {"ok": False, "error_code": 400, "description": "Bad Request: chat not found"})
+            self._reply(*state.handle(payload["chat_id"]))
+
+        def do_GET(self):
+            # /stats — сколько ответов какого типа отдали
+            self._reply(200, state.stats)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def run_bench(server, count, workers, rate):
+    from tg_delivery import TelegramDelivery, SENT
+
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    delivery = TelegramDelivery("123:fake", api_url=url, workers=workers, global_rate=rate)
+    messages = ((chat_id, f"Сообщение {chat_id}") for chat_id in range(1, count + 1))
+    started = time.perf_counter()
+    sent = failed = 0
+    for _, status, _ in delivery.deliver(messages):
+        if status == SENT:
+            sent += 1
+        else:
+            failed += 1
+    elapsed = time.perf_counter() - started
+    print(f"📨 {count} messages in {elapsed:.1f}s ({count / elapsed:.1f} msg/s)")
+    print(f"   sent: {sent}, failed: {failed}, 429s: {delivery.rate_limited}, retries: {delivery.retries}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--rate", type=float, default=30, help="Сообщений в секунду на бота до 429")
+    parser.add_argument("--chat-interval", type=float, default=1.0, help="Минимальный интервал в один чат, сек")
+    parser.add_argument("--latency", type=float, default=0.05, help="Задержка ответа, сек")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Доля ответов 500")
+    parser.add_argument("--blocked-every", type=int, default=0, help="Каждый N-й chat_id заблокировал бота (403)")
+    parser.add_argument("--bench", type=int, default=0, help="Отправить N сообщений через tg_delivery и выйти")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--send-rate", type=float, default=25, help="Лимит отправителя в режиме --bench")
+    args = parser.parse_args()
+
+    state = FakeBotState(args.rate, args.chat_interval, args.latency, args.fail_rate, args.blocked_every)
+    server = ThreadingHTTPServer(("127.0.0.1", 0 if args.bench else args.port), make_handler(state))
+    server.daemon_threads = True
+
+    if args.bench:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        run_bench(server, args.bench, args.workers, args.send_rate)
+        print(f"   server: {state.stats}")
+        server.shutdown()
+        return
+
+    print(f"🤖 Fake Bot API on http://127.0.0.1:{args.port} (rate {args.rate}/s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{state.stats}")
+
+
+if __name__ == "__main__":
+    main()
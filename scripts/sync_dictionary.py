@@ -1,8 +1,12 @@
 import os
 import json
+import sys
 import time
 from supabase import create_client, Client
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from build_dictionary_binary import build as build_binary_snapshot
+
 # Конфигурация
 URL = os.environ.get("SUPABASE_URL")
 KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY") # Use Service Role Key to bypass RLS if needed, or Anon key
@@ -58,6 +62,9 @@ def main():
     with open(WORDS_JSON, 'w', encoding='utf-8') as f:
         json.dump(output_data, f, ensure_ascii=False, indent=2)
 
+    # Бинарный снимок для сервера, чтобы воркеры не собирали его при старте
+    print(f"💾 Building {build_binary_snapshot(WORDS_JSON)}...")
+
     print("🎉 Done! public/words.json is now in sync with Supabase.")
 
 if __name__ == "__main__":
@@ -1,18 +1,35 @@
 import os
-print("✅ LOADED UPDATED SERVER_API V2")
 import json
+import time
 import hashlib
 import hmac
 import jwt
 from urllib.parse import parse_qsl
 from functools import wraps
-from datetime import datetime, timedelta
-from flask import Flask, request, jsonify, g
+from datetime import datetime, timedelta, timezone
+from flask import Flask, request, jsonify, g, has_request_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
+from sqlalchemy import or_, and_
 
 import requests
 
+from dictionary_store import DictionaryStore, write_snapshot
+from word_engine import WordEngine
+from word_search import WordSearch, SEARCH_MODES, SEARCH_PAGE_SIZE
+from rank_service import RankSnapshot
+from leaderboard_cache import LeaderboardCache, parse_cursor, make_cursor
+from auth_cache import AuthCache
+from write_behind import WriteBehindBuffer
+from db_metrics import engine_options, instrument_engine, QueryStats, DB_QUERY_WARN
+from request_log import setup_logging, init_request_logging
+from metrics import Registry, ProcessMetrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from notification_hub import NotificationHub
+from star_payments import STAR_PACKS, SingleFlight, ensure_tables as ensure_star_tables, \
+    star_page_fetcher, sync_transactions, credit_pending, recent_credits
+
+log = setup_logging()
+
 app = Flask(__name__)
 # Самая простая и разрешающая настройка CORS
 CORS(app)
@@ -23,6 +40,7 @@ def add_cors_headers(response):
     response.headers["Access-Control-Allow-Origin"] = "*"
     response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
     response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
+    response.headers["Access-Control-Expose-Headers"] = "ETag, Last-Modified, X-DB-Queries, Server-Timing, X-Request-ID"
     return response
 
 # Конфигурация
@@ -42,95 +60,193 @@ def get_db_url():
 
 app.config['SQLALCHEMY_DATABASE_URI'] = get_db_url()
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 BOT_TOKEN = os.environ.get('BOT_TOKEN')
 SECRET_KEY = os.environ.get('SECRET_KEY', 'super-secret-key') # Для JWT
 YANDEX_FOLDER_ID = os.environ.get('YANDEX_FOLDER_ID')
 YANDEX_API_KEY = os.environ.get('YANDEX_API_KEY')
 YANDEX_URL = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
 ADMIN_IDS = [int(x) for x in os.environ.get('VITE_ADMIN_IDS', '').split(',') if x.strip()]
+# Без списка слов (levelWords) очки дейлика от клиента не принимаются
+DAILY_REQUIRE_WORDS = os.environ.get('DAILY_REQUIRE_WORDS', '0') == '1'
+# Сколько слов может собрать один джокер (он активен 15 секунд)
+WILDCARD_WORDS_PER_USE = int(os.environ.get('WILDCARD_WORDS_PER_USE', 5))
 
 db = SQLAlchemy(app)
 
-# Логирование запросов для отладки
-@app.before_request
-def log_request():
-    print(f"📡 Request: {request.method} {request.path}")
+def current_query_stats():
+    # Считаем запросы только внутри HTTP-запроса (не в фоновых потоках)
+    if not has_request_context():
+        return None
+    if 'db_stats' not in g:
+        g.db_stats = QueryStats()
+    return g.db_stats
+
+with app.app_context():
+    db_totals = instrument_engine(db.engine, current_query_stats)
+
+@app.after_request
+def add_db_timing(response):
+    stats = g.get('db_stats')
+    if stats:
+        db_ms = stats.seconds * 1000
+        response.headers['X-DB-Queries'] = str(stats.queries)
+        response.headers['Server-Timing'] = f'db;dur={db_ms:.1f};desc="{stats.queries} queries"'
+        if stats.queries > DB_QUERY_WARN:
+            log.warning("too many DB queries", extra={"path": request.path, "db_queries": stats.queries, "db_ms": round(db_ms, 1)})
+    return response
+
+# Логирование запросов (JSON, через очередь — запись в stdout идет не в потоке запроса)
+init_request_logging(app, log)
+
+# --- МЕТРИКИ (/api/metrics, формат Prometheus) ---
+# Метрики живут в памяти процесса: у каждого воркера gunicorn свои, поэтому
+# у всех серий есть метка pid, а суммировать по воркерам нужно в запросе (sum by).
+# Каждый воркер пишет свои метрики в API_METRICS_DIR, /api/metrics отдает файлы всех воркеров
+API_METRICS_DIR = os.environ.get('API_METRICS_DIR', os.path.join('metrics', 'api'))
+API_METRICS_INTERVAL = float(os.environ.get('API_METRICS_INTERVAL', 5))
+# Если задан, /api/metrics требует заголовок Authorization: Bearer <METRICS_TOKEN>
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+metrics_registry = Registry({"pid": os.getpid()})
+worker_metrics = ProcessMetrics(metrics_registry, API_METRICS_DIR, interval=API_METRICS_INTERVAL,
+                                context=app.app_context)
+http_requests_total = metrics_registry.counter(
+    "slovodel_http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+http_request_duration = metrics_registry.histogram(
+    "slovodel_http_request_duration_seconds", "HTTP request latency by route", ("route",))
+telegram_requests_total = metrics_registry.counter(
+    "slovodel_telegram_api_requests_total", "Telegram Bot API calls by method and outcome", ("method", "outcome"))
+telegram_request_duration = metrics_registry.histogram(
+    "slovodel_telegram_api_request_duration_seconds", "Telegram Bot API call latency", ("method",))
+
+@app.after_request
+def record_http_metrics(response):
+    # g.request_started ставит request_log в before_request
+    started = g.get('request_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+        http_requests_total.inc(method=request.method, route=route, status=response.status_code)
+        http_request_duration.observe(time.perf_counter() - started, route=route)
+    return response
+
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org')
+TELEGRAM_TIMEOUT = float(os.environ.get('TG_TIMEOUT', 10))
+
+def call_telegram(api_method, http_method='post', **kwargs):
+    """Вызов Bot API с подсчетом в метриках. Возвращает разобранный JSON ответа"""
+    url = f"{TELEGRAM_API_URL}/bot{BOT_TOKEN}/{api_method}"
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        res = requests.request(http_method, url, timeout=TELEGRAM_TIMEOUT, **kwargs)
+        result = res.json()
+        outcome = "ok" if result.get('ok') else f"http_{res.status_code}"
+        return result
+    finally:
+        telegram_requests_total.inc(method=api_method, outcome=outcome)
+        telegram_request_duration.observe(time.perf_counter() - started, method=api_method)
 
 def send_telegram_message(chat_id, text):
     if not BOT_TOKEN: 
-        print("⚠️ BOT_TOKEN missing, skipping TG message.")
+        log.warning("BOT_TOKEN missing, skipping TG message")
         return
         
     try:
-        url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-        res = requests.post(url, json={"chat_id": chat_id, "text": text, "parse_mode": "HTML"})
-        result = res.json()
+        result = call_telegram("sendMessage", json={"chat_id": chat_id, "text": text, "parse_mode": "HTML"})
         if not result.get('ok'):
-            print(f"❌ TG API Error: {result}")
+            log.error("TG API error", extra={"chat_id": chat_id, "tg_result": result})
     except Exception as e:
-        print(f"❌ Failed to send TG message: {e}")
+        log.error("failed to send TG message", extra={"chat_id": chat_id, "error": str(e)})
 
 # --- ВАЛИДАЦИЯ TELEGRAM ---
 
-def validate_init_data(init_data):
-    """Валидация для Telegram Mini App (initData)"""
-    if not BOT_TOKEN: return None
+# Секретные ключи зависят только от токена бота — считаем один раз при старте
+WEBAPP_SECRET_KEY = hmac.new(b"WebAppData", BOT_TOKEN.encode(), hashlib.sha256).digest() if BOT_TOKEN else None
+LOGIN_SECRET_KEY = hashlib.sha256(BOT_TOKEN.encode()).digest() if BOT_TOKEN else None
+# Сколько секунд initData считается действительной после auth_date (0 — без ограничения)
+AUTH_MAX_AGE = int(os.environ.get('AUTH_MAX_AGE', 86400))
+
+auth_cache = AuthCache()
+
+def check_init_data(init_data):
+    """initData -> (данные пользователя, когда истекает) или (None, None)"""
+    if not WEBAPP_SECRET_KEY: return None, None
     try:
         parsed_data = dict(parse_qsl(init_data))
-        if 'hash' not in parsed_data: return None
+        if 'hash' not in parsed_data: return None, None
         received_hash = parsed_data.pop('hash')
         data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(parsed_data.items()))
-        secret_key = hmac.new(b"WebAppData", BOT_TOKEN.encode(), hashlib.sha256).digest()
-        calculated_hash = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
-        if calculated_hash == received_hash:
-            return json.loads(parsed_data.get('user', '{}'))
-        return None
-    except: return None
+        calculated_hash = hmac.new(WEBAPP_SECRET_KEY, data_check_string.encode(), hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(calculated_hash, received_hash):
+            return None, None
+        expires_at = None
+        if AUTH_MAX_AGE:
+            expires_at = int(parsed_data.get('auth_date', 0)) + AUTH_MAX_AGE
+            if expires_at <= time.time():
+                return None, None
+        return json.loads(parsed_data.get('user', '{}')), expires_at
+    except: return None, None
+
+def validate_init_data(init_data):
+    """Валидация для Telegram Mini App (initData)"""
+    return check_init_data(init_data)[0]
 
 def validate_login_widget(data):
     """Валидация для Telegram Login Widget (браузер)"""
-    if not BOT_TOKEN: return None
+    if not LOGIN_SECRET_KEY: return None
     try:
         check_hash = data.pop('hash')
         # Сборка строки: key=value\nkey=value...
         data_check_string = "\n".join(f"{k}={v}" for k, v in sorted(data.items()))
         # Секретный ключ для виджета - это SHA256 от токена бота
-        secret_key = hashlib.sha256(BOT_TOKEN.encode()).digest()
-        calculated_hash = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
-        if calculated_hash == check_hash:
+        calculated_hash = hmac.new(LOGIN_SECRET_KEY, data_check_string.encode(), hashlib.sha256).hexdigest()
+        if hmac.compare_digest(calculated_hash, check_hash):
             return data # Возвращает данные пользователя
         return None
     except: return None
 
+def resolve_auth_header(auth_header):
+    """Заголовок Authorization -> ((user_id, username), когда истекает) или (None, None)"""
+    # 1. Пробуем как JWT (Браузер)
+    if auth_header.startswith('Bearer '):
+        token = auth_header.split(" ")[1]
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+            # В JWT мы уже сохранили имя при логине
+            return (payload['user_id'], payload['username']), payload.get('exp')
+        except:
+            return None, None
+
+    # 2. Пробуем как initData (Mini App)
+    user_data, expires_at = check_init_data(auth_header)
+    if user_data:
+        user_id = user_data.get('id')
+        # Собираем имя из компонентов
+        f_name = user_data.get('first_name', '')
+        l_name = user_data.get('last_name', '')
+        username = f"{f_name} {l_name}".strip() or user_data.get('username') or f"Игрок {user_id}"
+        return (user_id, username), expires_at
+    return None, None
+
 def auth_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         auth_header = request.headers.get('Authorization')
         if not auth_header:
             return jsonify({"error": "Unauthorized"}), 401
-        # 1. Пробуем как JWT (Браузер)
-        if auth_header.startswith('Bearer '):
-            token = auth_header.split(" ")[1]
-            try:
-                payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-                g.user_id = payload['user_id']
-                # В JWT мы уже сохранили имя при логине
-                g.username = payload['username']
-                return f(*args, **kwargs)
-            except:
-                return jsonify({"error": "Invalid Token"}), 403
-
-        # 2. Пробуем как initData (Mini App)
-        user_data = validate_init_data(auth_header)
-        if user_data:
-            g.user_id = user_data.get('id')
-            # Собираем имя из компонентов
-            f_name = user_data.get('first_name', '')
-            l_name = user_data.get('last_name', '')
-            g.username = f"{f_name} {l_name}".strip() or user_data.get('username') or f"Игрок {g.user_id}"
-            return f(*args, **kwargs)
 
-        return jsonify({"error": "Forbidden"}), 403
+        key = AuthCache.key(auth_header)
+        identity = auth_cache.get(key)
+        if identity is None:
+            identity, expires_at = resolve_auth_header(auth_header)
+            if identity is None:
+                if auth_header.startswith('Bearer '):
+                    return jsonify({"error": "Invalid Token"}), 403
+                return jsonify({"error": "Forbidden"}), 403
+            auth_cache.put(key, identity, expires_at)
+
+        g.user_id, g.username = identity
+        return f(*args, **kwargs)
     return decorated_function
 
 # --- МОДЕЛИ (Оставляем как есть) ---
@@ -182,6 +298,32 @@ class Challenge(db.Model):
     end_time = db.Column(db.DateTime(timezone=True))
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow)
 
+class Broadcast(db.Model):
+    __tablename__ = 'broadcasts'
+    id = db.Column(db.BigInteger, primary_key=True)
+    message = db.Column(db.Text, nullable=False)
+    status = db.Column(db.Text, default='pending')
+    sent_count = db.Column(db.BigInteger, default=0)
+    failed_count = db.Column(db.BigInteger, default=0)
+    total_count = db.Column(db.BigInteger)
+    last_telegram_id = db.Column(db.BigInteger)
+    started_at = db.Column(db.DateTime(timezone=True))
+    processed_at = db.Column(db.DateTime(timezone=True))
+    created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow)
+    # Аренда рассылки в cron_daily.py broadcast
+    locked_by = db.Column(db.Text)
+    heartbeat_at = db.Column(db.DateTime(timezone=True))
+
+class ChallengePool(db.Model):
+    __tablename__ = 'challenge_pool'
+    id = db.Column(db.BigInteger, primary_key=True)
+    letters = db.Column(db.JSON, nullable=False)
+    stats = db.Column(db.JSON)
+    solutions = db.Column(db.JSON)
+    challenge_id = db.Column(db.BigInteger)
+    created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow)
+    used_at = db.Column(db.DateTime(timezone=True))
+
 class Feedback(db.Model):
     __tablename__ = 'feedback'
     id = db.Column(db.BigInteger, primary_key=True)
@@ -199,6 +341,10 @@ class Notification(db.Model):
     type = db.Column(db.Text, nullable=False)
     data = db.Column(db.JSON)
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow)
+    __table_args__ = (
+        db.Index('idx_notifications_user', 'telegram_id', 'id'),
+        db.Index('idx_notifications_created', 'created_at'),
+    )
 
 class Payment(db.Model):
     __tablename__ = 'payments'
@@ -208,37 +354,35 @@ class Payment(db.Model):
     pack_id = db.Column(db.Integer)
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow)
 
+# Словарь держим в памяти процесса: читается один раз при старте воркера
+# и перечитывается только если words.json изменился на диске
+words_store = DictionaryStore(os.path.join("public", "words.json"))
+
 def get_words_local():
-    path = os.path.join("public", "words.json")
-    if os.path.exists(path):
-        with open(path, 'r', encoding='utf-8') as f: return json.load(f)
-    return []
+    _, words = words_store.export()
+    return words
 
 def save_words_local(words):
-    path = os.path.join("public", "words.json")
-    path_list = os.path.join("public", "words_list.json")
-    
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    
-    # Полный словарь
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(words, f, ensure_ascii=False, indent=2)
-        
-    # Легкий словарь (только слова)
-    word_list = [w['word'] for w in words if 'word' in w]
-    with open(path_list, 'w', encoding='utf-8') as f:
-        json.dump(word_list, f, ensure_ascii=False)
+    write_snapshot(words_store.path, words_store.list_path, words, words_store.binary_path)
 
 def ensure_words_list():
-    path_list = os.path.join("public", "words_list.json")
-    if not os.path.exists(path_list):
-        print("⚠️ words_list.json not found. Generating from words.json...")
-        words = get_words_local()
-        save_words_local(words)
-        print("✅ words_list.json generated.")
+    words_store.load()
+    # Журнал правок, оставшийся от прошлого запуска, сразу сливаем в words.json
+    if words_store.pending_ops:
+        words_store.compact()
+    if not os.path.exists(words_store.list_path):
+        log.warning("words_list.json not found, generating from words.json")
+        save_words_local(get_words_local())
+        log.info("words_list.json generated")
 
 # Запускаем проверку при старте модуля
 ensure_words_list()
+log.info("server_api loaded", extra={"pid": os.getpid(), "words": len(words_store)})
+
+# Проверка слов дейлика (индекс масок строится лениво при первом запросе)
+word_engine = WordEngine(words_store)
+# Поиск для админки (индексы строятся лениво при первом поиске в режиме)
+word_search = WordSearch(words_store)
 
 # ... (helpers)
 
@@ -248,15 +392,7 @@ def create_invoice():
     data = request.json
     pack_id = data.get('packId')
     
-    packs = {
-        1: {"amount": 100, "price": 50, "label": "Горсть словокоинов"},
-        2: {"amount": 250, "price": 100, "label": "Мешочек словокоинов"},
-        3: {"amount": 500, "price": 200, "label": "Сундук словокоинов"},
-        4: {"amount": 1000, "price": 350, "label": "Сокровищница"},
-        5: {"amount": 1500, "price": 500, "label": "Гора золота"},
-    }
-    
-    item = packs.get(pack_id)
+    item = STAR_PACKS.get(pack_id)
     if not item: return jsonify({"error": "Invalid pack"}), 400
 
     title = item['label']
@@ -265,7 +401,6 @@ def create_invoice():
     currency = "XTR"
     prices = [{"label": title, "amount": item['price']}] 
 
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/createInvoiceLink"
     params = {
         "title": title,
         "description": description,
@@ -276,105 +411,54 @@ def create_invoice():
     }
     
     try:
-        res = requests.post(url, json=params)
-        result = res.json()
+        result = call_telegram("createInvoiceLink", json=params)
         if result.get('ok'):
             return jsonify({"invoiceLink": result['result']})
         else:
-            print(f"TG Invoice Error: {result}")
+            log.error("TG invoice error", extra={"tg_result": result})
             return jsonify({"error": "TG Error"}), 500
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Транзакции звезд копятся в star_transactions (cron_daily.py payments и проверка ниже
+# дотягивают их по offset), поэтому проверка оплаты — поиск по индексу, а не скан getStarTransactions
+fetch_star_page = star_page_fetcher(lambda api_method, params: call_telegram(api_method, 'get', params=params))
+star_sync = SingleFlight()
+
 @app.route('/api/payment/verify', methods=['POST'])
 @auth_required
 def verify_payment():
-    # Проверяем последние транзакции звезд
-    url = f"https://api.telegram.org/bot{BOT_TOKEN}/getStarTransactions"
     try:
-        res = requests.get(url, params={"limit": 20}) # Берем последние 20
-        result = res.json()
-        
-        if not result.get('ok'):
-            return jsonify({"success": False, "error": "TG API Error"}), 500
-            
-        transactions = result['result']['transactions']
-        
-        # Ищем транзакцию от нашего юзера, которая еще не сохранена в БД
-        for tx in transactions:
-            if tx.get('source_update_type') != 'message': # Мы ищем платежи? Нет, source может быть разным
-                pass
-            
-            # Проверяем получателя (это должен быть мы, но getStarTransactions возвращает наши входящие/исходящие)
-            # Входящая транзакция имеет receiver = null (если это мы) или partner?
-            # В документации: partner_id - user id. 
-            
-            partner_id = tx.get('partner_id') # Кто платил? (deprecated? use partner.id)
-            if not partner_id:
-                 partner = tx.get('partner')
-                 if partner: partner_id = partner.get('id')
-
-            if partner_id != g.user_id:
-                continue
-                
-            tx_id = tx['id']
-            amount = tx['amount'] # Количество звезд
-            date = tx['date']
-            
-            # Проверяем, не слишком ли старая (например, 1 час)
-            if datetime.now().timestamp() - date > 3600:
-                continue
-
-            # Проверяем, есть ли уже в БД
-            if Payment.query.get(tx_id):
-                continue
-                
-            # Нашли новую транзакцию от юзера!
-            # Определяем пак по сумме (ненадежно, если цены одинаковые, но для MVP пойдет)
-            # Или надеяться, что invoice payload где-то есть? В getStarTransactions payload инвойса НЕТ.
-            # Поэтому матчим по цене.
-            
-            packs = {
-                50: {"id": 1, "coins": 100},
-                100: {"id": 2, "coins": 250},
-                200: {"id": 3, "coins": 500},
-                350: {"id": 4, "coins": 1000},
-                500: {"id": 5, "coins": 1500},
-            }
-            
-            pack = packs.get(amount)
-            if not pack:
-                continue # Неизвестная сумма
-                
-            # Начисляем!
-            user = Leaderboard.query.get(g.user_id)
-            user.coins += pack['coins']
-            
-            payment = Payment(
-                id=tx_id,
-                telegram_id=g.user_id,
-                amount=amount,
-                pack_id=pack['id']
-            )
-            db.session.add(payment)
-            db.session.commit()
-            
-            send_telegram_message(g.user_id, f"💰 <b>Покупка успешна!</b>\nНачислено: {pack['coins']} монет.")
-            
-            return jsonify({"success": True, "coins": user.coins, "added": pack['coins']})
-            
-        return jsonify({"success": False, "error": "Transaction not found"}), 404
-        
+        ensure_star_tables(db.engine)
+        with db.engine.connect() as conn:
+            credited = credit_pending(conn, g.user_id)
+            if not credited:
+                # Платеж только что прошел и еще не скачан: один поход в Telegram на воркер,
+                # параллельные проверки ждут его и ищут снова
+                star_sync.run(lambda: sync_transactions(conn, fetch_star_page))
+                credited = credit_pending(conn, g.user_id)
+            # Платеж уже начислен (cron или повторная проверка): отвечаем так же, с текущим балансом
+            already = [] if credited else recent_credits(conn, g.user_id)
     except Exception as e:
-        print(f"Verify Error: {e}")
+        log.error("payment verify error", extra={"error": str(e)})
         return jsonify({"success": False, "error": str(e)}), 500
 
+    if not credited and not already:
+        return jsonify({"success": False, "error": "Transaction not found"}), 404
+
+    added = sum(coins for _, _, coins in credited or already)
+    coins = db.session.query(Leaderboard.coins).filter_by(telegram_id=g.user_id).scalar()
+    if credited:
+        log.info("payment credited", extra={"transactions": [tx_id for _, tx_id, _ in credited], "added": added})
+        send_telegram_message(g.user_id, f"💰 <b>Покупка успешна!</b>\nНачислено: {added} монет.")
+    return jsonify({"success": True, "coins": coins, "added": added, "alreadyCredited": not credited})
+
 def generate_yandex_definition(word):
     folder_id = os.environ.get("YANDEX_FOLDER_ID", "")
     api_key = os.environ.get("YANDEX_API_KEY", "")
     
     if not folder_id or not api_key:
-        print("Yandex credentials not found")
+        log.warning("Yandex credentials not found")
         return None
 
     prompt = {
@@ -407,20 +491,37 @@ def generate_yandex_definition(word):
         result = response.json()
         return result['result']['alternatives'][0]['message']['text'].strip().strip('"').strip("'")
     except Exception as e:
-        print(f"Ошибка генерации определения для '{word}': {e}")
+        log.error("definition generation failed", extra={"word": word, "error": str(e)})
         return None
 
 @app.route('/api/words/search', methods=['GET'])
 def search_word_api():
     query = request.args.get('q', '').strip().lower()
-    if not query: return jsonify(None)
-    
-    words = get_words_local()
-    # Ищем точное совпадение
-    found = next((w for w in words if w['word'] == query), None)
-    if found:
-        return jsonify(found)
-    return jsonify(None)
+    mode = request.args.get('mode')
+    if mode is None:
+        if not query: return jsonify(None)
+
+        # Ищем точное совпадение
+        return jsonify(words_store.get(query))
+    return search_words_page(query, mode)
+
+@auth_required
+def search_words_page(query, mode):
+    """?mode=prefix|fuzzy|substring — страница результатов, только для админки"""
+    if g.user_id not in ADMIN_IDS:
+        return jsonify({"error": "Forbidden"}), 403
+    if mode not in SEARCH_MODES:
+        return jsonify({"error": "Unknown mode"}), 400
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', SEARCH_PAGE_SIZE))
+        distance = int(request.args.get('distance', 1))
+    except ValueError:
+        return jsonify({"error": "Invalid paging"}), 400
+    try:
+        return jsonify(word_search.search(query, mode, offset, limit, distance))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
 @app.route('/api/words/add', methods=['POST'])
 def add_word_api():
@@ -428,17 +529,15 @@ def add_word_api():
     word = data.get('word', '').strip().lower()
     if not word: return jsonify({"success": False}), 400
     
-    words = get_words_local()
-    if any(w['word'] == word for w in words): return jsonify({"success": False, "error": "Exists"}), 400
+    if words_store.contains(word): return jsonify({"success": False, "error": "Exists"}), 400
     
     definition = data.get('definition')
     if not definition:
         definition = generate_yandex_definition(word) or "Определение добавлено вручную."
         
-    words.append({"word": word, "definition": definition})
-    # Сортируем по алфавиту для порядка
-    words.sort(key=lambda x: x['word'])
-    save_words_local(words)
+    # Пока ходили за определением, слово мог добавить другой запрос
+    if not words_store.add(word, definition):
+        return jsonify({"success": False, "error": "Exists"}), 400
     return jsonify({"success": True, "word": word, "definition": definition})
 
 @app.route('/api/feedback/reply', methods=['POST'])
@@ -466,13 +565,8 @@ def update_word_api():
     word = data.get('word', '').strip().lower()
     new_def = data.get('definition')
     
-    words = get_words_local()
-    # Ищем индекс слова
-    for i, w in enumerate(words):
-        if w['word'] == word:
-            words[i]['definition'] = new_def
-            save_words_local(words)
-            return jsonify({"success": True})
+    if words_store.update(word, new_def):
+        return jsonify({"success": True})
             
     return jsonify({"success": False, "error": "Not found"}), 404
 
@@ -482,22 +576,14 @@ def delete_word_api():
     # Принимаем либо id (для совместимости), либо слово
     target_word = data.get('word')
     
-    words = get_words_local()
-    
-    initial_len = len(words)
-    if target_word:
-        words = [w for w in words if w['word'] != target_word.strip().lower()]
-    else:
+    if not target_word:
         # Старый метод по ID (лучше избегать)
         target_id = data.get('id')
         if target_id is not None:
              # Это ненадежно без постоянных ID, но оставим как fallback
-             real_index = len(words) - 1 - target_id
-             if 0 <= real_index < len(words):
-                 words.pop(real_index)
+             target_word = words_store.word_at(len(words_store) - 1 - target_id)
 
-    if len(words) < initial_len:
-        save_words_local(words)
+    if target_word and words_store.delete(target_word):
         return jsonify({"success": True})
     return jsonify({"success": False}), 404
 
@@ -505,6 +591,82 @@ def delete_word_api():
 def health():
     return jsonify({"status": "ok"})
 
+@app.route('/api/admin/stats', methods=['GET'])
+@auth_required
+def admin_stats():
+    # Счетчики кэшей и сохранений профиля (у каждого воркера gunicorn свои)
+    if g.user_id not in ADMIN_IDS:
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify({
+        "pid": os.getpid(),
+        "userWrites": dict(user_write_stats, buffer=user_writes.stats(), savedWrites=saved_user_writes()),
+        "authCache": {"hits": auth_cache.hits, "misses": auth_cache.misses},
+        "leaderboardCache": {"hits": leaderboard_cache.hits, "misses": leaderboard_cache.misses,
+                             "invalidations": leaderboard_cache.invalidations,
+                             "evictions": leaderboard_cache.evictions, "pages": len(leaderboard_cache)},
+        "rankSnapshot": {"refreshes": rank_snapshot.refreshes},
+        "notifications": notification_hub.stats(),
+        "starSyncs": star_sync.runs,
+        "dictionary": {"hits": words_store.hits, "misses": words_store.misses,
+                       "reloads": words_store.reloads, "compactions": words_store.compactions},
+        "wordSearch": word_search.stats(),
+    })
+
+def pool_stats():
+    pool = db.engine.pool
+    # У пула sqlite (SingletonThreadPool/NullPool) этих счетчиков нет
+    if not hasattr(pool, 'checkedout'):
+        return []
+    return [({"state": "checked_out"}, pool.checkedout()), ({"state": "idle"}, pool.checkedin()),
+            ({"state": "overflow"}, max(pool.overflow(), 0)), ({"state": "size"}, pool.size())]
+
+def cache_stats():
+    return [({"cache": "dictionary", "result": "hit"}, words_store.hits),
+            ({"cache": "dictionary", "result": "miss"}, words_store.misses),
+            ({"cache": "auth", "result": "hit"}, auth_cache.hits),
+            ({"cache": "auth", "result": "miss"}, auth_cache.misses),
+            ({"cache": "leaderboard", "result": "hit"}, leaderboard_cache.hits),
+            ({"cache": "leaderboard", "result": "miss"}, leaderboard_cache.misses)]
+
+metrics_registry.gauge("slovodel_db_pool_connections", "SQLAlchemy pool connections by state",
+                       ("state",), callback=pool_stats)
+metrics_registry.counter("slovodel_db_queries_total", "SQL statements executed",
+                         callback=lambda: [({}, db_totals.queries)])
+metrics_registry.counter("slovodel_db_query_seconds_total", "Time spent in SQL statements",
+                         callback=lambda: [({}, round(db_totals.seconds, 6))])
+metrics_registry.counter("slovodel_cache_requests_total", "In-process cache lookups by result",
+                         ("cache", "result"), callback=cache_stats)
+metrics_registry.counter("slovodel_cache_invalidations_total", "Leaderboard cache pages invalidated",
+                         callback=lambda: [({}, leaderboard_cache.invalidations)])
+metrics_registry.counter("slovodel_dictionary_reloads_total", "Dictionary reloads from disk",
+                         callback=lambda: [({}, words_store.reloads)])
+metrics_registry.gauge("slovodel_dictionary_words", "Words in the loaded dictionary",
+                       callback=lambda: [({}, len(words_store))])
+metrics_registry.counter("slovodel_rank_snapshot_refreshes_total", "Rank snapshot rebuilds",
+                         callback=lambda: [({}, rank_snapshot.refreshes)])
+metrics_registry.counter("slovodel_user_writes_total", "Profile saves by result",
+                         ("event",), callback=lambda: [({"event": k}, v) for k, v in user_write_stats.items()])
+metrics_registry.counter("slovodel_user_writes_buffer_total", "Write-behind profile buffer counters",
+                         ("event",), callback=lambda: [({"event": k}, v) for k, v in user_writes.stats().items() if k not in ("pending", "savedWrites")])
+metrics_registry.gauge("slovodel_user_writes_pending", "Profiles waiting in the write-behind buffer",
+                       callback=lambda: [({}, user_writes.stats()["pending"])])
+metrics_registry.counter("slovodel_user_writes_saved_total", "Profile saves that needed no DB write of their own",
+                         callback=lambda: [({}, saved_user_writes())])
+metrics_registry.gauge("slovodel_notification_waiters", "Clients waiting in /api/notifications long-poll",
+                       callback=lambda: [({}, notification_hub.stats()["waiting"])])
+metrics_registry.counter("slovodel_notification_polls_skipped_total", "Notification polls answered without a DB query",
+                         callback=lambda: [({}, notification_hub.skipped)])
+metrics_registry.counter("slovodel_notification_sweeps_total", "Worker-wide checks for new notifications",
+                         callback=lambda: [({}, notification_hub.sweeps)])
+worker_metrics.start()
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    # Снаружи закрыто в nginx (location = /api/metrics), внутри сети — токен, если задан
+    if METRICS_TOKEN and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {METRICS_TOKEN}'):
+        return jsonify({"error": "Unauthorized"}), 401
+    return worker_metrics.render(), 200, {"Content-Type": METRICS_CONTENT_TYPE}
+
 # Авторизация через виджет (браузер)
 @app.route('/api/auth/login', methods=['POST'])
 def login():
@@ -520,6 +682,7 @@ def login():
     full_name = f"{f_name} {l_name}".strip() or user_data.get('username') or f"Игрок {user_id}"
     
     # Создаем юзера если нет
+    user_writes.flush(user_id)
     user = Leaderboard.query.get(user_id)
     if not user:
         user = Leaderboard(telegram_id=user_id, username=full_name, avatar_url=user_data.get('photo_url'))
@@ -544,54 +707,134 @@ def login():
 @app.route('/api/user/me')
 @auth_required
 def get_my_user():
+    user_writes.flush(g.user_id)
     user = Leaderboard.query.get(g.user_id)
     if user: return jsonify(user.to_dict())
     return jsonify(None), 404
 
 @app.route('/api/user/<int:telegram_id>')
 def get_user_public(telegram_id):
+    user_writes.flush(telegram_id)
     user = Leaderboard.query.get(telegram_id)
     if user: return jsonify(user.to_dict())
     return jsonify(None), 404
 
+# Поля профиля из POST /api/user: ключ запроса -> колонка leaderboard
+USER_FIELDS = {
+    'avatarUrl': 'avatar_url',
+    'score': 'score',
+    'highScore': 'high_score',
+    'coins': 'coins',
+    'streak': 'streak',
+    'totalWords': 'total_words',
+    'daysPlayed': 'days_played',
+    'rareWords': 'rare_words',
+    'marathonHighScore': 'marathon_high_score',
+}
+BONUS_FIELDS = {'time': 'bonus_time', 'hint': 'bonus_hint', 'swap': 'bonus_swap', 'wildcard': 'bonus_wildcard'}
+# Монеты и бонусы пишутся сразу: их же меняют оплата, награды и cron в других
+# процессах, и запоздалый снимок из буфера затер бы начисленное
+MONEY_COLUMNS = {'coins'} | set(BONUS_FIELDS.values())
+
+# Счетчики сохранений профиля: writes — был UPDATE/INSERT сразу, unchanged — писать было нечего,
+# deferred — правки без денег ушли в буфер user_writes
+user_write_stats = {"saves": 0, "writes": 0, "unchanged": 0, "deferred": 0, "errors": 0}
+
+def write_user_changes(telegram_id, changes):
+    """UPDATE только по колонкам, которые реально изменились (или ничего). True — запись была"""
+    user = Leaderboard.query.get(telegram_id)
+    if not user:
+        db.session.add(Leaderboard(telegram_id=telegram_id, **changes))
+        db.session.commit()
+        leaderboard_cache.notify_score('global', None, telegram_id, changes.get('score'))
+        rank_snapshot.add_score(changes.get('score'))
+        return True
+    diff = {column: value for column, value in changes.items() if getattr(user, column) != value}
+    if not diff:
+        return False
+    Leaderboard.query.filter_by(telegram_id=telegram_id).update(diff, synchronize_session=False)
+    db.session.commit()
+    if 'score' in diff:
+        leaderboard_cache.notify_score('global', None, telegram_id, diff['score'])
+        # Игрок сразу после раунда видит свое новое место, а не ждет RANK_SNAPSHOT_TTL
+        rank_snapshot.add_score(diff['score'])
+    return True
+
+def flush_user_changes(telegram_id, changes):
+    # Запись из буфера идет вне запроса (фоновый поток, atexit) или внутри чужого
+    with app.app_context():
+        try:
+            return write_user_changes(telegram_id, changes)
+        except Exception:
+            db.session.rollback()
+            raise
+
+# Клиент сохраняет профиль после каждого раунда: очки, слова и статистика за
+# USER_WRITE_DELAY секунд сливаются в одну запись. Перед чтением профиля буфер
+# пользователя сбрасывается (буфер у каждого воркера свой)
+user_writes = WriteBehindBuffer(flush_user_changes, name="user-writes")
+
+def saved_user_writes():
+    # Без буфера каждое сохранение было бы записью: пустые сохранения + слитые в буфере
+    return user_write_stats["unchanged"] + user_writes.stats()["savedWrites"]
+
+def save_user_changes(telegram_id, changes):
+    """
+    Изменились монеты или бонусы (или игрока еще нет) — пишем сразу, вместе с
+    тем, что копилось в буфере, одной записью. Иначе правки уходят в буфер.
+    None — отложено, True/False — как у write_user_changes.
+    """
+    user = Leaderboard.query.get(telegram_id)
+    if user and all(getattr(user, column) == value for column, value in changes.items() if column in MONEY_COLUMNS):
+        user_writes.submit(telegram_id, {c: v for c, v in changes.items() if c not in MONEY_COLUMNS})
+        return None
+    pending = user_writes.take(telegram_id) or {}
+    pending.update(changes)
+    try:
+        return write_user_changes(telegram_id, pending)
+    except Exception:
+        # Отложенные правки не теряем: возвращаем в буфер
+        db.session.rollback()
+        user_writes.submit(telegram_id, {c: v for c, v in pending.items() if c not in MONEY_COLUMNS})
+        raise
+
 @app.route('/api/user', methods=['POST'])
 @auth_required
 def save_user():
     data = request.json
     telegram_id = g.user_id # БЕРЕМ ИЗ ТОКЕНА!
     
-    user = Leaderboard.query.get(telegram_id)
-    if not user:
-        user = Leaderboard(
-            telegram_id=telegram_id, 
-            username=g.username
-        )
-        db.session.add(user)
-    
-    user.username = g.username
-    user.avatar_url = data.get('avatarUrl', user.avatar_url)
-    user.score = data.get('score', user.score)
-    user.high_score = data.get('highScore', user.high_score)
-    user.coins = data.get('coins', user.coins)
+    changes = {'username': g.username}
+    for key, column in USER_FIELDS.items():
+        if key in data:
+            changes[column] = data[key]
     
     bonuses = data.get('bonuses', {})
     if bonuses:
-        user.bonus_time = bonuses.get('time', user.bonus_time)
-        user.bonus_hint = bonuses.get('hint', user.bonus_hint)
-        user.bonus_swap = bonuses.get('swap', user.bonus_swap)
-        user.bonus_wildcard = bonuses.get('wildcard', user.bonus_wildcard)
-        
-    user.streak = data.get('streak', user.streak)
-    user.total_words = data.get('totalWords', user.total_words)
-    user.days_played = data.get('daysPlayed', user.days_played)
-    user.rare_words = data.get('rareWords', user.rare_words)
-    user.marathon_high_score = data.get('marathonHighScore', user.marathon_high_score)
+        for key, column in BONUS_FIELDS.items():
+            if key in bonuses:
+                changes[column] = bonuses[key]
     
-    db.session.commit()
+    user_write_stats["saves"] += 1
+    try:
+        written = save_user_changes(telegram_id, changes)
+    except Exception as e:
+        db.session.rollback()
+        user_write_stats["errors"] += 1
+        log.error("user save error", extra={"error": str(e)})
+        return jsonify({"success": False, "error": "Save failed"}), 500
+    user_write_stats["deferred" if written is None else "writes" if written else "unchanged"] += 1
     return jsonify({"success": True})
 
 
-from sqlalchemy import func
+def load_distinct_scores():
+    return [row[0] for row in db.session.query(Leaderboard.score).distinct()]
+
+# Снимок различных очков для DENSE_RANK (обновляется раз в RANK_SNAPSHOT_TTL секунд)
+rank_snapshot = RankSnapshot(load_distinct_scores)
+
+# Больше id за один запрос не принимаем
+RANK_BATCH_LIMIT = 500
 
 @app.route('/api/rank')
 @auth_required
@@ -600,14 +843,64 @@ def get_my_rank():
 
 @app.route('/api/rank/<int:telegram_id>')
 def get_user_rank_public(telegram_id):
-    user = Leaderboard.query.get(telegram_id)
-    if not user: return jsonify({"rank": 0})
+    user_writes.flush(telegram_id)
+    score = db.session.query(Leaderboard.score).filter_by(telegram_id=telegram_id).scalar()
+    if score is None and not db.session.query(Leaderboard.telegram_id).filter_by(telegram_id=telegram_id).first():
+        return jsonify({"rank": 0})
     
     # Dense Rank
-    higher_scores_count = db.session.query(func.count(func.distinct(Leaderboard.score))).filter(Leaderboard.score > user.score).scalar()
-    rank = higher_scores_count + 1
-    
-    return jsonify({"rank": rank})
+    return jsonify({"rank": rank_snapshot.rank_of(score)})
+
+@app.route('/api/rank/batch', methods=['GET', 'POST'])
+def get_ranks_batch():
+    # ?ids=1,2,3 или {"ids": [1, 2, 3]}
+    if request.method == 'POST':
+        raw_ids = (request.json or {}).get('ids') or []
+    else:
+        raw_ids = request.args.get('ids', '').split(',')
+    try:
+        ids = list({int(x) for x in raw_ids if str(x).strip()})
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid ids"}), 400
+    if len(ids) > RANK_BATCH_LIMIT:
+        return jsonify({"error": f"Too many ids (max {RANK_BATCH_LIMIT})"}), 400
+
+    rows = db.session.query(Leaderboard.telegram_id, Leaderboard.score).filter(Leaderboard.telegram_id.in_(ids)).all() if ids else []
+    ranks = rank_snapshot.ranks_of({tid: score for tid, score in rows})
+    # Несуществующим игрокам, как и в /api/rank/<id>, отдаем 0
+    return jsonify({"ranks": {str(tid): ranks.get(tid, 0) for tid in ids}})
+
+def score_daily_levels(entry, challenge_id, data):
+    """
+    Очки дейлика считаем сами по присланным словам (levelWords: {"10": [...]}).
+    Для уровней без слов оставляем уже сохраненный результат, а очки
+    от клиента принимаем только от старых клиентов (если не DAILY_REQUIRE_WORDS).
+    """
+    client_scores = data.get('levelScores') or {}
+    level_words = data.get('levelWords') or {}
+    stored_scores = dict(entry.level_scores or {})
+
+    if not level_words and not DAILY_REQUIRE_WORDS:
+        return data.get('score', 0), client_scores
+
+    level_scores = {}
+    for level, value in client_scores.items():
+        level_scores[level] = stored_scores.get(level, 0 if DAILY_REQUIRE_WORDS else value)
+    for level, value in stored_scores.items():
+        level_scores.setdefault(level, value)
+
+    challenge = Challenge.query.get(challenge_id)
+    if challenge and level_words:
+        # Бонусы дейлика выдаются по 1 шт., клиент присылает остаток
+        swaps = max(0, 1 - (data.get('bonus_swap') or 0))
+        wildcards = max(0, 1 - (data.get('bonus_wildcard') or 0))
+        results = word_engine.validate_challenge(challenge.letters, level_words, swaps, wildcards * WILDCARD_WORDS_PER_USE)
+        for level, result in results.items():
+            level_scores[level] = result['score']
+            if result['rejected']:
+                log.warning("daily words rejected", extra={"challenge_id": challenge_id, "level": level, "rejected": result['rejected'][:10]})
+
+    return sum(level_scores.values()), level_scores
 
 @app.route('/api/daily/score', methods=['POST'])
 @auth_required
@@ -625,10 +918,9 @@ def save_daily_score():
         entry = DailyScore(telegram_id=telegram_id, challenge_id=challenge_id_int, game_date=datetime.utcnow().strftime('%Y-%m-%d'), score=0)
         db.session.add(entry)
     
-    entry.score = data.get('score', 0)
+    entry.score, entry.level_scores = score_daily_levels(entry, challenge_id_int, data)
     entry.username = g.username
     entry.avatar_url = data.get('avatarUrl')
-    entry.level_scores = data.get('levelScores', {})
     
     entry.bonus_time = data.get('bonus_time')
     entry.bonus_hint = data.get('bonus_hint')
@@ -636,6 +928,7 @@ def save_daily_score():
     entry.bonus_wildcard = data.get('bonus_wildcard')
 
     db.session.commit()
+    leaderboard_cache.notify_score('daily', challenge_id_int, telegram_id, entry.score)
     return jsonify({"success": True})
 
 @app.route('/api/daily/check', methods=['GET'])
@@ -660,16 +953,67 @@ def check_daily_score():
         })
     return jsonify(None)
 
+# Long-poll: сколько максимум секунд запрос /api/notifications?wait=N держит соединение
+NOTIFY_MAX_WAIT = float(os.environ.get('NOTIFY_MAX_WAIT', 25))
+
+def load_notifications_since(after_id):
+    with app.app_context():
+        query = db.session.query(Notification.id, Notification.telegram_id)
+        if after_id is not None:
+            query = query.filter(Notification.id > after_id)
+        return query.all()
+
+def notify_listen_connection():
+    # Соединение отвязано от пула: LISTEN держит его постоянно и не должен занимать место в пуле
+    with app.app_context():
+        connection = db.engine.raw_connection()
+    connection.detach()
+    return connection.dbapi_connection
+
+notification_hub = NotificationHub(
+    load_notifications_since,
+    connect=notify_listen_connection if app.config['SQLALCHEMY_DATABASE_URI'].startswith("postgresql") else None,
+)
+
 @app.route('/api/notifications', methods=['GET'])
 @auth_required
 def get_notifications():
+    # Почти у всех игроков уведомлений нет: хаб отвечает из памяти, без запроса к базе.
+    # wait=N — long-poll: если уведомлений нет, ждем их появления до N секунд
+    wait = min(request.args.get('wait', 0, type=float), NOTIFY_MAX_WAIT)
+    if not notification_hub.has_any(g.user_id):
+        if wait <= 0 or not notification_hub.wait(g.user_id, wait):
+            return jsonify([])
+    version = notification_hub.version(g.user_id)
     notifs = Notification.query.filter_by(telegram_id=g.user_id).all()
+    if not notifs:
+        # Уведомления уже разобраны (удаление отметку не снимает) — дальше снова без базы
+        notification_hub.clear(g.user_id, version)
     return jsonify([{
         "id": n.id,
         "type": n.type,
         "data": n.data
     } for n in notifs])
 
+# Сколько уведомлений можно подтвердить одним запросом
+NOTIFY_ACK_MAX = 100
+
+@app.route('/api/notifications/ack', methods=['POST'])
+@auth_required
+def ack_notifications():
+    # Подтверждение (удаление) пачки уведомлений одним запросом
+    ids = (request.json or {}).get('ids')
+    if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+        return jsonify({"error": "ids must be a list of integers"}), 400
+    if len(ids) > NOTIFY_ACK_MAX:
+        return jsonify({"error": f"Too many ids (max {NOTIFY_ACK_MAX})"}), 400
+    deleted = 0
+    if ids:
+        deleted = Notification.query.filter(Notification.telegram_id == g.user_id, Notification.id.in_(ids))\
+            .delete(synchronize_session=False)
+        db.session.commit()
+    return jsonify({"success": True, "deleted": deleted})
+
 @app.route('/api/notifications/<int:id>', methods=['DELETE'])
 @auth_required
 def delete_notification(id):
@@ -677,22 +1021,66 @@ def delete_notification(id):
     db.session.commit()
     return jsonify({"success": True})
 
+# Кэш страниц рейтинга (сбрасывается при сохранении очков, попавших в окно страницы)
+leaderboard_cache = LeaderboardCache()
+LEADERBOARD_MAX_LIMIT = 100
+
+def leaderboard_response(board, scope, model, default_limit):
+    """
+    Страница рейтинга по курсору ?cursor=<score>:<telegram_id> (последний игрок
+    предыдущей страницы). Ответ кэшируется и отдается с ETag/Last-Modified,
+    так что повторный запрос с If-None-Match получает 304.
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', default_limit)), 1), LEADERBOARD_MAX_LIMIT)
+    except ValueError:
+        limit = default_limit
+    raw_cursor = request.args.get('cursor') or None
+    cursor = parse_cursor(raw_cursor)
+    if raw_cursor and cursor is None:
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    page = leaderboard_cache.get(board, scope, cursor, limit)
+    if page is None:
+        query = model.query
+        if scope is not None:
+            query = query.filter_by(challenge_id=scope)
+        count = query.count()
+        if cursor:
+            score, telegram_id = cursor
+            query = query.filter(or_(model.score < score, and_(model.score == score, model.telegram_id > telegram_id)))
+        # Берем на одну строку больше, чтобы узнать, есть ли следующая страница
+        rows = query.order_by(model.score.desc().nullslast(), model.telegram_id).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        payload = {
+            "players": [{"name": r.username, "score": r.score, "avatar_url": r.avatar_url, "telegram_id": r.telegram_id} for r in rows],
+            "count": count,
+            "nextCursor": make_cursor(rows[-1].score or 0, rows[-1].telegram_id) if has_more else None,
+        }
+        page = leaderboard_cache.put(
+            board, scope, cursor, limit, payload,
+            floor=(rows[-1].score or 0) if has_more else None,
+            ceiling=cursor[0] if cursor else None,
+            ids={r.telegram_id for r in rows},
+        )
+
+    response = jsonify(page.payload)
+    response.set_etag(page.etag)
+    response.last_modified = page.last_modified
+    # Браузер хранит ответ, но каждый раз сверяет его с сервером
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
 @app.route('/api/leaderboard')
 def get_leaderboard():
-    users = Leaderboard.query.order_by(Leaderboard.score.desc()).limit(20).all()
-    count = db.session.query(Leaderboard).count()
-    return jsonify({
-        "players": [{"name": u.username, "score": u.score, "avatar_url": u.avatar_url, "telegram_id": u.telegram_id} for u in users],
-        "count": count
-    })
+    return leaderboard_response('global', None, Leaderboard, 20)
 
 @app.route('/api/daily/leaderboard')
 def get_daily_leaderboard():
     try: cid = int(request.args.get('challengeId', 0))
     except: return jsonify({"players": [], "count": 0})
-    scores = DailyScore.query.filter_by(challenge_id=cid).order_by(DailyScore.score.desc()).limit(50).all()
-    count = DailyScore.query.filter_by(challenge_id=cid).count()
-    return jsonify({"players": [{"name": s.username, "score": s.score, "avatar_url": s.avatar_url, "telegram_id": s.telegram_id} for s in scores], "count": count})
+    return leaderboard_response('daily', cid, DailyScore, 50)
 
 @app.route('/api/broadcast', methods=['POST'])
 @auth_required
@@ -705,26 +1093,49 @@ def send_broadcast_api():
     text = data.get('message')
     if not text: return jsonify({"error": "Empty message"}), 400
     
-    # Сохраняем в историю
-    # (Модель Broadcast не была объявлена в server_api.py, но она есть в init_db.sql. 
-    # Если мы хотим использовать ORM, надо добавить класс. Пока просто разошлем).
-    
-    # Рассылка
-    users = Leaderboard.query.all()
-    count = 0
-    for u in users:
-        try:
-            url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-            requests.post(url, json={"chat_id": u.telegram_id, "text": text, "parse_mode": "HTML"})
-            count += 1
-        except: pass
-        
-    return jsonify({"success": True, "count": count})
+    # Рассылку не отправляем в запросе: ставим в очередь,
+    # ее разошлет планировщик (cron_daily.py broadcast)
+    job = Broadcast(message=text, status='queued')
+    db.session.add(job)
+    db.session.commit()
+    return jsonify({"success": True, "jobId": job.id}), 202
+
+@app.route('/api/broadcast/<int:job_id>', methods=['GET'])
+@auth_required
+def get_broadcast_status(job_id):
+    if g.user_id not in ADMIN_IDS:
+        return jsonify({"error": "Forbidden"}), 403
+
+    job = Broadcast.query.get(job_id)
+    if not job: return jsonify({"error": "Not found"}), 404
+
+    sent = job.sent_count or 0
+    failed = job.failed_count or 0
+    done = sent + failed
+    throughput = None
+    if job.started_at:
+        started_at = job.started_at if job.started_at.tzinfo else job.started_at.replace(tzinfo=timezone.utc)
+        finished_at = job.processed_at or datetime.now(timezone.utc)
+        if finished_at.tzinfo is None:
+            finished_at = finished_at.replace(tzinfo=timezone.utc)
+        elapsed = (finished_at - started_at).total_seconds()
+        throughput = round(done / elapsed, 1) if elapsed > 0 else None
+    return jsonify({
+        "id": job.id,
+        "status": job.status,
+        "sent": sent,
+        "failed": failed,
+        "total": job.total_count,
+        "progress": round(done / job.total_count, 4) if job.total_count else None,
+        "throughput": throughput,
+        "startedAt": job.started_at.isoformat() if job.started_at else None,
+        "finishedAt": job.processed_at.isoformat() if job.processed_at else None,
+    })
 
 @app.route('/api/feedback', methods=['POST'])
 @auth_required
 def save_feedback():
-    print(f"📨 Feedback received from {g.username}")
+    log.info("feedback received", extra={"username": g.username})
     data = request.json
     message_text = data.get('message', '')
     
@@ -741,8 +1152,7 @@ def save_feedback():
     for admin_id in ADMIN_IDS:
         # В HTML режиме для красоты
         try:
-            url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-            requests.post(url, json={"chat_id": admin_id, "text": notify_text, "parse_mode": "HTML"})
+            call_telegram("sendMessage", json={"chat_id": admin_id, "text": notify_text, "parse_mode": "HTML"})
         except: pass
 
     return jsonify({"success": True})
@@ -794,6 +1204,40 @@ def get_active_challenge():
         })
     return jsonify(None)
 
+@app.route('/api/challenge/<int:challenge_id>/solutions')
+@auth_required
+def get_challenge_solutions(challenge_id):
+    challenge = Challenge.query.get(challenge_id)
+    if not challenge: return jsonify(None), 404
+
+    # Пока испытание идет, ответы видят только админы
+    end_time = challenge.end_time
+    now = datetime.now(timezone.utc) if end_time and end_time.tzinfo else datetime.utcnow()
+    active = not end_time or end_time > now
+    if active and g.user_id not in ADMIN_IDS:
+        return jsonify({"error": "Forbidden"}), 403
+
+    with_words = request.args.get('words', '1') != '0'
+
+    # Испытания из пула приходят с уже посчитанными решениями
+    try:
+        pooled = ChallengePool.query.filter_by(challenge_id=challenge.id).first()
+    except Exception:
+        db.session.rollback()
+        pooled = None
+
+    levels = {}
+    for level, letters in (challenge.letters or {}).items():
+        if pooled and pooled.stats and level in pooled.stats:
+            stats = dict(pooled.stats[level])
+            words = (pooled.solutions or {}).get(level)
+        else:
+            stats = word_engine.solution_stats(letters, level)
+            words = None
+        if with_words:
+            stats["words"] = words if words is not None else word_engine.solutions(letters)
+        levels[level] = stats
+    return jsonify({"id": str(challenge.id), "levels": levels})
 
 @app.route('/api/rewards/claim', methods=['POST'])
 @auth_required
@@ -848,10 +1292,10 @@ if __name__ == '__main__':
         for _ in range(10):
             try:
                 db.create_all()
-                print("✅ Database connected and tables created!")
+                log.info("database connected and tables created")
                 break
             except Exception as e:
-                print(f"⏳ Waiting for DB... ({e})")
+                log.warning("waiting for DB", extra={"error": str(e)})
                 time.sleep(3)
                 
     app.run(host='0.0.0.0', port=5000)
@@ -754,9 +754,36 @@ export default function App({ saveUserData, saveDailyScore, getUserData, getActi
   }, [tgUser, getUserData, getUserDailyScore, currentChallengeId, fetchUserRank]);
 
   // Загрузка уведомлений (награды за победу в турнирах)
+  // Первый запрос сразу, дальше long-poll: сервер отвечает, когда появится новое уведомление
   useEffect(() => {
-    if (tgUser?.id && fetchNotifications) {
-      fetchNotifications(tgUser.id).then((notifs: any[]) => {
+    if (!tgUser?.id || !fetchNotifications) return;
+    let cancelled = false;
+    const seen = new Set<number>();
+    const NOTIFY_WAIT = 25;
+    const MIN_POLL_INTERVAL = 5000;
+
+    const poll = async (wait?: number) => {
+      while (!cancelled) {
+        const startedAt = Date.now();
+        try {
+          const notifs: any[] = await fetchNotifications(tgUser.id, wait);
+          if (cancelled) return;
+          const fresh = (notifs || []).filter(n => !seen.has(n.id));
+          fresh.forEach(n => seen.add(n.id));
+          addRewards(fresh);
+        } catch (e) {
+          // Сеть/сервер недоступны — подождем и попробуем снова
+        }
+        wait = NOTIFY_WAIT;
+        // Сервер мог ответить сразу (уведомления уже есть или ждущих слишком много) — не долбим его
+        const elapsed = Date.now() - startedAt;
+        if (elapsed < MIN_POLL_INTERVAL) {
+          await new Promise(resolve => setTimeout(resolve, MIN_POLL_INTERVAL - elapsed));
+        }
+      }
+    };
+
+    const addRewards = (notifs: any[]) => {
         if (notifs && notifs.length > 0) {
           const newRewards = notifs.map(n => {
             if (n.type === 'daily_win') {
@@ -774,8 +801,10 @@ export default function App({ saveUserData, saveDailyScore, getUserData, getActi
              setPendingRewards(prev => [...prev, ...newRewards as any]);
           }
         }
-      });
-    }
+    };
+
+    poll();
+    return () => { cancelled = true; };
   }, [tgUser, fetchNotifications]);
 
   const finishGame = useCallback(() => {
@@ -899,7 +928,9 @@ export default function App({ saveUserData, saveDailyScore, getUserData, getActi
           score: totalDailyScore,
           challengeId: currentChallengeId,
           bonuses: currentDailyBonuses,
-          levelScores: newScores
+          levelScores: newScores,
+          // Сервер пересчитывает очки уровня по словам
+          levelWords: { [level]: foundWords.map(w => w.text) }
         });
       }
     }
@@ -921,7 +952,7 @@ export default function App({ saveUserData, saveDailyScore, getUserData, getActi
     playSfx('bonus');
 
     setStatus('results');
-  }, [score, USER_NAME, saveUserData, saveDailyScore, highScore, totalScore, bonusTimeLeft, bonusHintLeft, bonusSwapLeft, bonusWildcardLeft, tgUser, rareWords, streak, hasPlayedToday, isDailyMode, playSfx, showToast, tg, totalWords, currentChallengeId, daysPlayed, dailyStatus.scores]);
+  }, [score, USER_NAME, saveUserData, saveDailyScore, highScore, totalScore, bonusTimeLeft, bonusHintLeft, bonusSwapLeft, bonusWildcardLeft, tgUser, rareWords, streak, hasPlayedToday, isDailyMode, playSfx, showToast, tg, totalWords, currentChallengeId, daysPlayed, dailyStatus.scores, foundWords]);
 
   const handleClaimReward = () => {
     if (!activeReward) return;
@@ -1661,6 +1692,7 @@ export default function App({ saveUserData, saveDailyScore, getUserData, getActi
       {isShopOpen && <ShopModal 
         coins={coins}
         onBuyBonuses={handleBuyBonuses}
+        onCoinsUpdated={setCoins}
         initialTab={shopInitialTab}
         onClose={() => { 
         setIsShopOpen(false); 
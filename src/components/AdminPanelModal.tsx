@@ -1,5 +1,10 @@
 import { useState, useEffect } from 'react';
 import { ArrowLeft, Shield, MessageCircle, BookPlus, Send, Check, Trash2, Edit2, Search, Reply, Archive, Megaphone, X, Eye, Plus, AlertCircle, Info } from 'lucide-react';
+import { apiClient } from '../utils/apiClient';
+
+const SUGGESTIONS_PAGE = 20;
+// Поиск с 2 опечатками дорогой: только по кнопке и для коротких слов (как FUZZY2_MAX_QUERY_LENGTH на сервере)
+const FUZZY2_MAX_QUERY_LENGTH = 12;
 
 interface AdminPanelModalProps {
   onClose: () => void;
@@ -12,7 +17,8 @@ interface AdminPanelModalProps {
   onReply: (feedbackId: number, telegramId: number, text: string) => Promise<boolean>;
   onArchive: (id: number) => Promise<boolean>;
   onDelete: (id: number) => Promise<boolean>;
-  onBroadcast: (message: string) => Promise<boolean>;
+  // id задачи рассылки или null при ошибке
+  onBroadcast: (message: string) => Promise<number | null>;
   onTestModal: (type: string) => void;
   fetchAdminCustomWords?: any;
 }
@@ -37,6 +43,9 @@ export const AdminPanelModal = ({ onClose, playSfx, fetchFeedbacks, addCustomWor
   const [dictSearchQuery, setDictSearchQuery] = useState('');
   const [dictSearchResult, setDictSearchResult] = useState<{ word: string, definition: string } | null>(null);
   const [isSearching, setIsSearching] = useState(false);
+  // Похожие слова, если точного совпадения нет: сначала по префиксу, потом с опечатками
+  const [suggestions, setSuggestions] = useState<{ query: string, mode: 'prefix' | 'fuzzy', distance: number, items: { word: string }[], total: number } | null>(null);
+  const [fuzzy2Query, setFuzzy2Query] = useState<string | null>(null);
   const [wordStatus, setWordStatus] = useState<'idle' | 'success' | 'error' | 'exists'>('idle');
   
   // Edit State for Search Result
@@ -48,6 +57,30 @@ export const AdminPanelModal = ({ onClose, playSfx, fetchFeedbacks, addCustomWor
   const [replyText, setReplyText] = useState('');
   const [feedbackFilter, setFeedbackFilter] = useState<'all' | 'new' | 'replied' | 'archived'>('all');
   const [broadcastMessage, setBroadcastMessage] = useState('');
+  // Последняя рассылка: ее рассылает планировщик, статус опрашиваем, пока она не закончится
+  const [broadcastJobId, setBroadcastJobId] = useState<number | null>(null);
+  const [broadcastJob, setBroadcastJob] = useState<{ status: string, sent: number, failed: number, total: number | null, progress: number | null, throughput: number | null } | null>(null);
+
+  useEffect(() => {
+    if (broadcastJobId === null) return;
+    let stopped = false;
+    let timer: ReturnType<typeof setTimeout>;
+    const poll = async () => {
+      try {
+        const job = await apiClient.getBroadcastStatus(broadcastJobId);
+        if (stopped) return;
+        if (job && job.status) {
+          setBroadcastJob(job);
+          if (job.status === 'sent') return;
+        }
+      } catch (e) {
+        // Сеть моргнула — спросим еще раз
+      }
+      if (!stopped) timer = setTimeout(poll, 3000);
+    };
+    poll();
+    return () => { stopped = true; clearTimeout(timer); };
+  }, [broadcastJobId]);
 
   useEffect(() => {
     if (activeTab === 'feedback') {
@@ -82,20 +115,54 @@ export const AdminPanelModal = ({ onClose, playSfx, fetchFeedbacks, addCustomWor
     }
   };
 
-  const handleDictSearch = async () => {
-    if (!dictSearchQuery.trim()) return;
+  const findSuggestions = async (query: string, distances: readonly (readonly ['prefix' | 'fuzzy', number])[] = [['prefix', 1], ['fuzzy', 1]]) => {
+    for (const [mode, distance] of distances) {
+      const page = await apiClient.searchWords(query, mode, 0, SUGGESTIONS_PAGE, distance);
+      if (page?.items?.length) {
+        setSuggestions({ query, mode, distance, items: page.items, total: page.total });
+        return;
+      }
+    }
+  };
+
+  const findWithTwoTypos = async () => {
+    const query = dictSearchQuery.trim();
+    setFuzzy2Query(query);
+    setIsSearching(true);
+    try {
+      await findSuggestions(query, [['fuzzy', 2]]);
+    } catch (e) {
+      showNotification('Ошибка поиска', 'error');
+    } finally {
+      setIsSearching(false);
+    }
+  };
+
+  const loadMoreSuggestions = async () => {
+    if (!suggestions) return;
+    const page = await apiClient.searchWords(suggestions.query, suggestions.mode, suggestions.items.length, SUGGESTIONS_PAGE, suggestions.distance);
+    if (page?.items) setSuggestions({ ...suggestions, items: [...suggestions.items, ...page.items], total: page.total });
+  };
+
+  const handleDictSearch = async (word?: string) => {
+    const query = (word ?? dictSearchQuery).trim();
+    if (!query) return;
+    if (word) setDictSearchQuery(word);
     setIsSearching(true);
     setDictSearchResult(null);
+    setSuggestions(null);
+    setFuzzy2Query(null);
     setIsEditing(false);
     
     try {
-      const result = await onSearchWord(dictSearchQuery.trim());
+      const result = await onSearchWord(query);
       if (result) {
         setDictSearchResult(result);
         setEditDef(result.definition || '');
       } else {
         setDictSearchResult(null);
         showNotification('Слово не найдено', 'info');
+        await findSuggestions(query);
       }
     } catch (e) {
         showNotification('Ошибка поиска', 'error');
@@ -192,9 +259,11 @@ export const AdminPanelModal = ({ onClose, playSfx, fetchFeedbacks, addCustomWor
     if (!broadcastMessage.trim()) return;
     if (window.confirm('Вы уверены, что хотите отправить это сообщение ВСЕМ игрокам?')) {
       try {
-          const success = await onBroadcast(broadcastMessage);
-          if (success) {
+          const jobId = await onBroadcast(broadcastMessage);
+          if (jobId !== null) {
             setBroadcastMessage('');
+            setBroadcastJob(null);
+            setBroadcastJobId(jobId);
             showNotification('Рассылка поставлена в очередь!', 'success');
           } else {
             showNotification('Ошибка создания рассылки', 'error');
@@ -321,7 +390,7 @@ export const AdminPanelModal = ({ onClose, playSfx, fetchFeedbacks, addCustomWor
                     className="flex-1 admin-input-field" 
                     onKeyDown={(e) => e.key === 'Enter' && handleDictSearch()}
                   />
-                  <button onClick={handleDictSearch} disabled={isSearching} className="p-3 rounded-xl text-white bg-blue-500 hover:bg-blue-600 transition-all">
+                  <button onClick={() => handleDictSearch()} disabled={isSearching} className="p-3 rounded-xl text-white bg-blue-500 hover:bg-blue-600 transition-all">
                     {isSearching ? <div className="spinner w-5 h-5 border-2 border-white rounded-full animate-spin"></div> : <Search size={20} />}
                   </button>
                 </div>
@@ -354,8 +423,27 @@ export const AdminPanelModal = ({ onClose, playSfx, fetchFeedbacks, addCustomWor
                       <p className="text-sm opacity-80 leading-relaxed">{dictSearchResult.definition || "Нет определения"}</p>
                     )}
                   </div>
+                ) : suggestions ? (
+                  <div className="mt-4">
+                    <p className="text-xs opacity-50 mb-2">{suggestions.mode === 'prefix' ? 'Начинаются так же' : 'Похожие слова'} ({suggestions.total}):</p>
+                    <div className="flex flex-wrap gap-2">
+                      {suggestions.items.map(item => (
+                        <button key={item.word} onClick={() => handleDictSearch(item.word)} className="px-2 py-1 bg-white/50 dark:bg-black/20 rounded-lg text-sm font-bold hover:bg-indigo-100 dark:hover:bg-indigo-900/40">{item.word}</button>
+                      ))}
+                    </div>
+                    {suggestions.items.length < suggestions.total && (
+                      <button onClick={loadMoreSuggestions} className="mt-2 text-xs font-bold text-indigo-600 dark:text-indigo-400 hover:underline">Показать ещё</button>
+                    )}
+                  </div>
                 ) : (
-                  dictSearchQuery && !isSearching && <p className="text-center opacity-50 text-xs mt-2">Ничего не найдено</p>
+                  dictSearchQuery && !isSearching && (
+                    <div className="text-center mt-2">
+                      <p className="opacity-50 text-xs">Ничего не найдено</p>
+                      {fuzzy2Query === null && dictSearchQuery.trim().length <= FUZZY2_MAX_QUERY_LENGTH && (
+                        <button onClick={findWithTwoTypos} className="mt-1 text-xs font-bold text-indigo-600 dark:text-indigo-400 hover:underline">Искать с 2 опечатками</button>
+                      )}
+                    </div>
+                  )
                 )}
               </div>
 
@@ -387,6 +475,25 @@ export const AdminPanelModal = ({ onClose, playSfx, fetchFeedbacks, addCustomWor
                 </button>
                 <p className="text-[10px] opacity-50 mt-2 text-center text-gray-600 dark:text-gray-400">Сообщение будет отправлено всем пользователям, запустившим бота.</p>
               </div>
+              {broadcastJobId !== null && (
+                <div className="admin-card">
+                  <label className="admin-section-label">Рассылка #{broadcastJobId}</label>
+                  <p className="text-sm font-bold text-gray-900 dark:text-white mb-2">
+                    {!broadcastJob || broadcastJob.status === 'queued' ? 'В очереди' : broadcastJob.status === 'sent' ? 'Завершена' : 'Отправляется'}
+                  </p>
+                  {broadcastJob && (
+                    <>
+                      <div className="level-progress-bg mb-2">
+                        <div className="level-progress-fill" style={{ width: `${Math.round((broadcastJob.progress ?? (broadcastJob.status === 'sent' ? 1 : 0)) * 100)}%` }}></div>
+                      </div>
+                      <p className="text-xs opacity-70 text-gray-600 dark:text-gray-400">
+                        Отправлено: {broadcastJob.sent}{broadcastJob.total ? ` из ${broadcastJob.total}` : ''} · Ошибок: {broadcastJob.failed}
+                        {broadcastJob.throughput ? ` · ${broadcastJob.throughput} сообщ./с` : ''}
+                      </p>
+                    </>
+                  )}
+                </div>
+              )}
             </div>
           ) : (
             <div className="space-y-4">
@@ -7,10 +7,12 @@ interface ShopModalProps {
   playSfx: (sound: any) => void;
   coins: number;
   onBuyBonuses: (items: { type: 'time' | 'hint' | 'swap' | 'wildcard', cost: number, amount: number }[]) => Promise<boolean>;
+  // Баланс с сервера после оплаты: иначе следующее сохранение профиля запишет старый
+  onCoinsUpdated?: (coins: number) => void;
   initialTab?: 'bonuses' | 'coins';
 }
 
-export const ShopModal = ({ onClose, playSfx, coins, onBuyBonuses, initialTab = 'bonuses' }: ShopModalProps) => {
+export const ShopModal = ({ onClose, playSfx, coins, onBuyBonuses, onCoinsUpdated, initialTab = 'bonuses' }: ShopModalProps) => {
   const [activeTab, setActiveTab] = useState<'bonuses' | 'coins'>(initialTab);
   const [quantities, setQuantities] = useState<Record<string, number>>({});
   const [isBuying, setIsBuying] = useState(false);
@@ -61,6 +63,7 @@ export const ShopModal = ({ onClose, playSfx, coins, onBuyBonuses, initialTab =
                         try {
                             const verifyRes = await apiClient.verifyPayment();
                             if (verifyRes && verifyRes.success) {
+                                if (typeof verifyRes.coins === 'number') onCoinsUpdated?.(verifyRes.coins);
                                 alert(`Успешно! Начислено: ${verifyRes.added} монет.`);
                                 onClose(); // Закрываем магазин, чтобы обновить баланс (или можно обновить стейт)
                             } else {
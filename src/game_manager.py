@@ -2,6 +2,8 @@ import os
 import sys
 import time
 import random
+import queue
+import threading
 import requests
 from datetime import datetime, timedelta, timezone
 from supabase import create_client, Client
@@ -14,6 +16,8 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 
 # Время одного раунда в секундах (24 часа = 86400)
 POLL_INTERVAL = 600 # Проверка каждые 10 минут
+# Сколько получателей рассылки читаем из базы за один запрос
+RECIPIENTS_PAGE_SIZE = 1000
 
 # Инициализация клиента Supabase
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
@@ -62,6 +66,54 @@ def generate_grid(level):
     return letters
 
 # --- РАССЫЛКА СООБЩЕНИЙ ---
+_PAGES_DONE = object()
+
+def iter_recipient_pages(page_size=RECIPIENTS_PAGE_SIZE):
+    """
+    Keyset-пагинация по telegram_id: каждая следующая страница — строго после
+    последнего id предыдущей. В отличие от .range() по offset, база не
+    пролистывает уже отданные строки, и новые игроки не сдвигают страницы.
+    """
+    last_id = None
+    while True:
+        query = supabase.table("leaderboard").select("telegram_id").order("telegram_id").limit(page_size)
+        if last_id is not None:
+            query = query.gt("telegram_id", last_id)
+        rows = query.execute().data
+        if not rows:
+            return
+        yield [row['telegram_id'] for row in rows if row.get('telegram_id')]
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1]['telegram_id']
+
+def stream_recipients(page_size=RECIPIENTS_PAGE_SIZE):
+    """
+    Получатели по одному. Страницы грузит фоновый поток, пока идет отправка
+    текущей; в очереди не больше двух страниц, так что память не зависит
+    от числа игроков.
+    """
+    pages = queue.Queue(maxsize=2)
+    errors = []
+
+    def producer():
+        try:
+            for page in iter_recipient_pages(page_size):
+                pages.put(page)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            pages.put(_PAGES_DONE)
+
+    threading.Thread(target=producer, daemon=True).start()
+    while True:
+        page = pages.get()
+        if page is _PAGES_DONE:
+            break
+        yield from page
+    if errors:
+        raise errors[0]
+
 def process_broadcasts():
     print("Проверка очереди рассылок...")
     try:
@@ -73,47 +125,34 @@ def process_broadcasts():
             print("Нет активных рассылок.")
             return
 
-        # Получаем всех пользователей (с пагинацией, если их много)
-        users = []
-        start = 0
-        step = 1000
-        while True:
-            u_res = supabase.table("leaderboard").select("telegram_id").range(start, start + step - 1).execute()
-            if not u_res.data:
-                break
-            users.extend(u_res.data)
-            if len(u_res.data) < step:
-                break
-            start += step
+        # Один проход по игрокам сразу для всех рассылок
+        print(f"Активных рассылок: {len(broadcasts)}. Рассылаем...")
+        sent_counts = {b['id']: 0 for b in broadcasts}
+        recipients = 0
+        http = requests.Session() # Одно соединение на всю рассылку
         
-        print(f"Найдено {len(users)} пользователей для рассылки.")
-
-        for broadcast in broadcasts:
-            print(f"--- Рассылка ID {broadcast['id']} ---")
-            msg_text = broadcast['message']
-            sent_count = 0
-            
-            for user in users:
-                tid = user.get('telegram_id')
-                if not tid: continue
-                
+        for tid in stream_recipients():
+            recipients += 1
+            for broadcast in broadcasts:
                 try:
-                    requests.post(f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage", json={
+                    http.post(f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage", json={
                         "chat_id": tid,
-                        "text": msg_text
+                        "text": broadcast['message']
                     }, timeout=5)
-                    sent_count += 1
+                    sent_counts[broadcast['id']] += 1
                     time.sleep(0.05) # Задержка 50мс
                 except Exception as e:
                     print(f"Ошибка отправки {tid}: {e}")
-            
+        
+        print(f"Обработано {recipients} пользователей.")
+        for broadcast in broadcasts:
             # Обновляем статус
             supabase.table("broadcasts").update({
                 "status": "sent", 
-                "sent_count": sent_count,
+                "sent_count": sent_counts[broadcast['id']],
                 "processed_at": datetime.now().isoformat()
             }).eq("id", broadcast['id']).execute()
-            print(f"Рассылка завершена. Отправлено: {sent_count}")
+            print(f"--- Рассылка ID {broadcast['id']} завершена. Отправлено: {sent_counts[broadcast['id']]}")
             
     except Exception as e:
         print(f"Ошибка в process_broadcasts: {e}")
@@ -22,6 +22,7 @@ const saveDailyScore = async (data: any) => {
     score: data.score,
     challengeId: data.challengeId,
     levelScores: data.levelScores,
+    levelWords: data.levelWords,
     bonus_time: data.bonuses?.time,
     bonus_hint: data.bonuses?.hint,
     bonus_swap: data.bonuses?.swap,
@@ -55,12 +56,23 @@ const saveFeedback = async (data: any) => {
   await apiClient.saveFeedback(data);
 };
 
-const fetchNotifications = async (_telegramId: number) => {
-  return await apiClient.getNotifications();
+const fetchNotifications = async (_telegramId: number, wait?: number) => {
+  return await apiClient.getNotifications(wait);
 };
 
+// Разобранные уведомления подтверждаем пачкой: награды забирают подряд, запрос — один
+let pendingAcks: number[] = [];
+let ackTimer: ReturnType<typeof setTimeout> | null = null;
+
 const deleteNotification = async (id: number) => {
-  await apiClient.deleteNotification(id);
+  pendingAcks.push(id);
+  if (ackTimer) return;
+  ackTimer = setTimeout(async () => {
+    const ids = pendingAcks;
+    pendingAcks = [];
+    ackTimer = null;
+    await apiClient.ackNotifications(ids);
+  }, 1000);
 };
 
 const getActiveChallenge = async () => {
@@ -84,7 +96,11 @@ const fetchCustomWords = async () => [];
 const sendFeedbackReply = async (feedbackId: number, _telegramId: number, text: string) => (await apiClient.replyFeedback(feedbackId, text)).success;
 const archiveFeedback = async (id: number) => (await apiClient.archiveFeedback(id)).success;
 const deleteFeedback = async (id: number) => (await apiClient.deleteFeedback(id)).success;
-const sendBroadcast = async (message: string) => (await apiClient.sendBroadcast(message)).success;
+const sendBroadcast = async (message: string) => {
+  // id задачи: админка по нему показывает ход рассылки
+  const res = await apiClient.sendBroadcast(message);
+  return res && res.success ? res.jobId as number : null;
+};
 
 
 const rootElement = document.getElementById('root');
@@ -165,14 +165,26 @@ export const apiClient = {
           body: JSON.stringify({ message })
       });
   },
+
+  async getBroadcastStatus(jobId: number) {
+      return await this.request(`/broadcast/${jobId}`);
+  },
   
-  async getNotifications() {
-    return await this.request(`/notifications`);
+  // wait — long-poll: сервер держит запрос до wait секунд, пока не появятся уведомления
+  async getNotifications(wait?: number) {
+    return await this.request(wait ? `/notifications?wait=${wait}` : `/notifications`);
   },
 
   async deleteNotification(id: number) {
     return await this.request(`/notifications/${id}`, { method: 'DELETE' });
   },
+
+  async ackNotifications(ids: number[]) {
+    return await this.request('/notifications/ack', {
+        method: 'POST',
+        body: JSON.stringify({ ids })
+    });
+  },
   
   async createInvoice(packId: number) {
       return await this.request('/payment/create-invoice', {
@@ -199,6 +211,12 @@ export const apiClient = {
       return await this.request(`/words/search?q=${encodeURIComponent(word)}`);
   },
 
+  async searchWords(query: string, mode: 'prefix' | 'fuzzy' | 'substring', offset = 0, limit = 20, distance = 1) {
+      // Страница поиска по словарю: { items: [{ word, definition, distance? }], total, offset, limit }
+      const params = new URLSearchParams({ q: query, mode, offset: String(offset), limit: String(limit), distance: String(distance) });
+      return await this.request(`/words/search?${params}`);
+  },
+
   async updateWord(word: string, definition: string) {
       return await this.request('/words/update', {
           method: 'POST',
@@ -0,0 +1,213 @@
+import os
+import time
+import threading
+from datetime import datetime, timezone
+
+from sqlalchemy import MetaData, Table, Column, BigInteger, Integer, Text, DateTime, JSON, Index, \
+    select, update, case, func, table, column
+from sqlalchemy.dialects import postgresql, sqlite
+
+# Пакеты монет за звезды (id пакета -> монеты, цена в звездах)
+STAR_PACKS = {
+    1: {"amount": 100, "price": 50, "label": "Горсть словокоинов"},
+    2: {"amount": 250, "price": 100, "label": "Мешочек словокоинов"},
+    3: {"amount": 500, "price": 200, "label": "Сундук словокоинов"},
+    4: {"amount": 1000, "price": 350, "label": "Сокровищница"},
+    5: {"amount": 1500, "price": 500, "label": "Гора золота"},
+}
+PACKS_BY_PRICE = {pack["price"]: pack_id for pack_id, pack in STAR_PACKS.items()}
+
+# Сколько транзакций за запрос к getStarTransactions (максимум Bot API — 100)
+STAR_SYNC_PAGE = int(os.environ.get('STAR_SYNC_PAGE', 100))
+# Платежи старше этого (секунды) не начисляются: защита от зачисления давней истории
+STAR_CREDIT_MAX_AGE = int(os.environ.get('STAR_CREDIT_MAX_AGE', 86400))
+# Столько секунд после оплаты cron не начисляет платеж: его начисляет проверка из приложения
+STAR_CREDIT_GRACE = int(os.environ.get('STAR_CREDIT_GRACE', 300))
+# Повторная проверка оплаты в этом окне (секунды) находит уже начисленные платежи
+STAR_VERIFY_WINDOW = int(os.environ.get('STAR_VERIFY_WINDOW', 3600))
+# Не чаще раза в столько секунд воркер API ходит в Telegram за новыми транзакциями
+STAR_SYNC_MIN_INTERVAL = float(os.environ.get('STAR_SYNC_MIN_INTERVAL', 1))
+
+metadata = MetaData()
+
+# Локальная копия транзакций звезд бота, дотягивается по offset
+star_transactions = Table(
+    'star_transactions', metadata,
+    Column('id', Text, primary_key=True),
+    # Кто платил; NULL — исходящая транзакция (возврат, вывод)
+    Column('partner_id', BigInteger),
+    Column('amount', Integer, nullable=False),
+    Column('invoice_payload', Text),
+    Column('date', BigInteger, nullable=False),  # unix time из Bot API
+    Column('data', JSON),
+    Column('fetched_at', DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)),
+    Index('idx_star_transactions_partner', 'partner_id', 'date'),
+)
+
+# Докуда транзакции уже скачаны (offset для getStarTransactions)
+star_sync_state = Table(
+    'star_sync_state', metadata,
+    Column('name', Text, primary_key=True),
+    Column('next_offset', BigInteger, nullable=False),
+    Column('updated_at', DateTime(timezone=True)),
+)
+
+payments = table('payments', column('id'), column('telegram_id'), column('amount'), column('pack_id'), column('created_at'))
+leaderboard = table('leaderboard', column('telegram_id'), column('coins'))
+
+_tables_ready = False
+_tables_lock = threading.Lock()
+
+
+def ensure_tables(bind):
+    # Существующие базы: таблицы создаются при первом обращении
+    global _tables_ready
+    with _tables_lock:
+        if not _tables_ready:
+            metadata.create_all(bind, checkfirst=True)
+            _tables_ready = True
+
+
+def dialect_insert(conn, target):
+    # INSERT ... ON CONFLICT есть и в Postgres, и в sqlite, но конструкторы разные
+    return (postgresql.insert if conn.dialect.name == 'postgresql' else sqlite.insert)(target)
+
+
+def star_page_fetcher(call):
+    """
+    fetch_page(offset, limit) поверх вызова Bot API.
+    call(api_method, params) возвращает разобранный JSON ответа.
+    """
+    def fetch_page(offset, limit):
+        result = call("getStarTransactions", {"offset": offset, "limit": limit})
+        if not result.get('ok'):
+            raise RuntimeError(f"getStarTransactions failed: {result.get('description')}")
+        return result['result']['transactions']
+    return fetch_page
+
+
+def partner_of(tx):
+    """(кто платил, payload инвойса) входящей транзакции; (None, None) для исходящей"""
+    source = tx.get('source')
+    if source is not None:
+        return (source.get('user') or {}).get('id'), source.get('invoice_payload')
+    if tx.get('receiver') is not None:
+        return None, None
+    # Старый формат ответа
+    return tx.get('partner_id') or (tx.get('partner') or {}).get('id'), None
+
+
+def pack_for(amount, payload):
+    """id пакета: по payload инвойса (pack_<id>), иначе по цене"""
+    if payload and payload.startswith('pack_'):
+        try:
+            pack_id = int(payload[len('pack_'):])
+        except ValueError:
+            pack_id = None
+        if pack_id in STAR_PACKS and STAR_PACKS[pack_id]["price"] == amount:
+            return pack_id
+    return PACKS_BY_PRICE.get(amount)
+
+
+def sync_transactions(conn, fetch_page, name='bot'):
+    """
+    Дотягивает транзакции, появившиеся после сохраненного offset (Bot API
+    отдает их в хронологическом порядке). Повторная загрузка безопасна:
+    вставка ON CONFLICT DO NOTHING, offset только растет.
+    Возвращает число новых транзакций.
+    """
+    offset = conn.execute(select(star_sync_state.c.next_offset).where(star_sync_state.c.name == name)).scalar() or 0
+    added = 0
+    while True:
+        txs = fetch_page(offset, STAR_SYNC_PAGE)
+        if txs:
+            rows = []
+            for tx in txs:
+                partner_id, payload = partner_of(tx)
+                rows.append({"id": str(tx['id']), "partner_id": partner_id, "amount": tx['amount'],
+                             "invoice_payload": payload, "date": tx['date'], "data": tx,
+                             "fetched_at": datetime.now(timezone.utc)})
+            added += conn.execute(dialect_insert(conn, star_transactions).on_conflict_do_nothing(index_elements=['id']), rows).rowcount
+        offset += len(txs)
+        state = dialect_insert(conn, star_sync_state).values(name=name, next_offset=offset, updated_at=datetime.now(timezone.utc))
+        conn.execute(state.on_conflict_do_update(index_elements=['name'], set_={
+            # Параллельная синхронизация (другой воркер, cron) могла уйти дальше
+            "next_offset": case((star_sync_state.c.next_offset > state.excluded.next_offset, star_sync_state.c.next_offset),
+                                else_=state.excluded.next_offset),
+            "updated_at": state.excluded.updated_at,
+        }))
+        conn.commit()
+        if len(txs) < STAR_SYNC_PAGE:
+            return added
+
+
+def credit_pending(conn, telegram_id=None, grace=0):
+    """
+    Начисляет монеты за входящие транзакции, по которым еще нет записи в payments
+    (только игроку telegram_id, если задан; только старше grace секунд). Строка payments вставляется
+    ON CONFLICT DO NOTHING в одной транзакции с начислением: из параллельных
+    проверок монеты начислит только та, чья вставка прошла.
+    Возвращает [(telegram_id, id транзакции, монеты)].
+    """
+    st = star_transactions
+    query = select(st.c.id, st.c.partner_id, st.c.amount, st.c.invoice_payload)\
+        .select_from(st.outerjoin(payments, payments.c.id == st.c.id)
+                     .join(leaderboard, leaderboard.c.telegram_id == st.c.partner_id))\
+        .where(payments.c.id.is_(None), st.c.date >= int(time.time()) - STAR_CREDIT_MAX_AGE,
+               st.c.date <= int(time.time()) - grace)\
+        .order_by(st.c.date)
+    if telegram_id is not None:
+        query = query.where(st.c.partner_id == telegram_id)
+
+    credited = []
+    for row in conn.execute(query).all():
+        pack_id = pack_for(row.amount, row.invoice_payload)
+        if pack_id is None:
+            continue  # Неизвестная сумма
+        coins = STAR_PACKS[pack_id]["amount"]
+        inserted = conn.execute(dialect_insert(conn, payments).values(
+            id=row.id, telegram_id=row.partner_id, amount=row.amount, pack_id=pack_id,
+            created_at=datetime.now(timezone.utc),
+        ).on_conflict_do_nothing(index_elements=['id']))
+        if inserted.rowcount:
+            conn.execute(update(leaderboard).where(leaderboard.c.telegram_id == row.partner_id)
+                         .values(coins=func.coalesce(leaderboard.c.coins, 0) + coins))
+            credited.append((row.partner_id, row.id, coins))
+        conn.commit()
+    return credited
+
+
+def recent_credits(conn, telegram_id, window=STAR_VERIFY_WINDOW):
+    """
+    Платежи игрока, начисленные за последние window секунд (cron или прошлой проверкой):
+    [(telegram_id, id транзакции, монеты)]
+    """
+    since = datetime.fromtimestamp(time.time() - window, timezone.utc)
+    rows = conn.execute(select(payments.c.telegram_id, payments.c.id, payments.c.pack_id)
+                        .where(payments.c.telegram_id == telegram_id, payments.c.created_at >= since)
+                        .order_by(payments.c.created_at)).all()
+    return [(row.telegram_id, row.id, STAR_PACKS[row.pack_id]["amount"]) for row in rows if row.pack_id in STAR_PACKS]
+
+
+class SingleFlight:
+    """
+    Синхронизация с Telegram одним потоком за раз. Кто ждал идущую синхронизацию,
+    свою не запускает: та уже забрала транзакции на момент его вызова.
+    """
+
+    def __init__(self, min_interval=STAR_SYNC_MIN_INTERVAL):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._last_started = None
+        self.runs = 0
+
+    def run(self, fn):
+        requested = time.monotonic()
+        with self._lock:
+            if self._last_started is not None and (
+                    self._last_started >= requested or requested - self._last_started < self.min_interval):
+                return False
+            self._last_started = time.monotonic()
+            self.runs += 1
+            fn()
+            return True
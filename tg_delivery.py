@@ -0,0 +1,156 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Адрес Bot API (для тестов можно поднять scripts/fake_bot_api.py)
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org').rstrip('/')
+# Сколько сообщений отправляется параллельно
+TG_WORKERS = int(os.environ.get('TG_WORKERS', 8))
+# Лимиты Telegram: ~30 сообщений в секунду на бота и ~1 в секунду в один чат
+TG_GLOBAL_RATE = float(os.environ.get('TG_GLOBAL_RATE', 25))
+TG_CHAT_RATE = float(os.environ.get('TG_CHAT_RATE', 1))
+TG_MAX_RETRIES = int(os.environ.get('TG_MAX_RETRIES', 5))
+TG_TIMEOUT = float(os.environ.get('TG_TIMEOUT', 10))
+
+SENT = 'sent'
+FAILED = 'failed'
+
+
+class TokenBucket:
+    """Классический token bucket: rate токенов в секунду, не больше capacity в запасе"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+
+
+class ChatLimiter:
+    """Интервал между сообщениями в один чат (1 / TG_CHAT_RATE секунд)"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, chat_id):
+        with self._lock:
+            now = time.monotonic()
+            if len(self._next) > 10000:
+                # Чистим чаты, которым уже можно писать, чтобы словарь не рос бесконечно
+                self._next = {k: v for k, v in self._next.items() if v > now}
+            slot = max(now, self._next.get(chat_id, 0))
+            self._next[chat_id] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class TelegramDelivery:
+    """
+    Отправка сообщений через Bot API: общий пул HTTP-соединений, ограниченное
+    число потоков, token bucket на бота и интервал на чат.
+    На 429 все потоки ждут retry_after (флуд-лимит общий на бота),
+    на 5xx и сетевые ошибки — повтор с нарастающей паузой.
+    """
+
+    def __init__(self, token, api_url=None, workers=None, global_rate=None, chat_rate=None):
+        self.token = token
+        self.api_url = (api_url or TELEGRAM_API_URL).rstrip('/')
+        self.workers = workers or TG_WORKERS
+        # Без запаса (capacity=1): ровный поток, без всплеска после паузы на 429
+        self.bucket = TokenBucket(global_rate or TG_GLOBAL_RATE, capacity=1)
+        self.chats = ChatLimiter(chat_rate or TG_CHAT_RATE)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._paused_until = 0
+        self._pause_lock = threading.Lock()
+        self.retries = 0
+        self.rate_limited = 0
+
+    def _wait_pause(self):
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _pause(self, seconds):
+        with self._pause_lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def call(self, api_method, params=None):
+        """Разовый вызов метода Bot API (без лимитов рассылки). Возвращает разобранный JSON"""
+        res = self.session.get(f"{self.api_url}/bot{self.token}/{api_method}", params=params, timeout=TG_TIMEOUT)
+        return res.json()
+
+    def send(self, chat_id, text, parse_mode="HTML"):
+        """Возвращает (статус, ошибка): (SENT, None) или (FAILED, описание)"""
+        if not self.token:
+            return FAILED, "BOT_TOKEN missing"
+        url = f"{self.api_url}/bot{self.token}/sendMessage"
+        payload = {"chat_id": chat_id, "text": text, "parse_mode": parse_mode}
+        error = None
+        for attempt in range(TG_MAX_RETRIES + 1):
+            if attempt:
+                self.retries += 1
+            self._wait_pause()
+            self.chats.acquire(chat_id)
+            self.bucket.acquire()
+            try:
+                res = self.session.post(url, json=payload, timeout=TG_TIMEOUT)
+                result = res.json()
+            except (requests.RequestException, ValueError) as e:
+                error = str(e)
+                time.sleep(min(2 ** attempt, 30))
+                continue
+
+            if result.get('ok'):
+                return SENT, None
+            error = result.get('description') or f"HTTP {res.status_code}"
+            if res.status_code == 429:
+                self.rate_limited += 1
+                retry_after = (result.get('parameters') or {}).get('retry_after', 1)
+                self._pause(retry_after)
+                continue
+            if res.status_code >= 500:
+                time.sleep(min(2 ** attempt, 30))
+                continue
+            # 400/403 (чат не найден, бот заблокирован) — повторять бесполезно
+            break
+        return FAILED, error
+
+    def deliver(self, messages):
+        """
+        messages — итерируемое (chat_id, text), читается лениво.
+        Генератор (chat_id, статус, ошибка) в порядке завершения.
+        В работе не больше 2 * workers сообщений, так что поток сообщений
+        может быть сколь угодно длинным.
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            in_flight = {}
+            for chat_id, text in messages:
+                if len(in_flight) >= self.workers * 2:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield (in_flight.pop(future),) + future.result()
+                in_flight[pool.submit(self.send, chat_id, text)] = chat_id
+            for future in list(in_flight):
+                yield (in_flight.pop(future),) + future.result()
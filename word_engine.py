@@ -0,0 +1,201 @@
+import re
+import threading
+from collections import Counter
+
+# Алфавит игрового поля. Ё на поле не бывает — в словах она приравнивается к Е
+ALPHABET = "абвгдежзийклмнопрстуфхцчшщъыьэюя"
+LETTER_BITS = {ch: 1 << i for i, ch in enumerate(ALPHABET)}
+
+# Множители очков по уровням (как в App.tsx: 10 букв — x1, 8 — x1.5, 6 — x2)
+LEVEL_MULTIPLIERS = {"10": 1, "8": 1.5, "6": 2}
+MIN_WORD_LENGTH = 2
+
+GAME_WORD_RE = re.compile(r'^[а-я]+$')
+
+
+def normalize_game_word(word):
+    return (word or '').strip().lower().replace('ё', 'е')
+
+
+def letters_mask(letters):
+    """Битовая маска набора букв. None, если есть символ не из алфавита"""
+    mask = 0
+    for ch in letters:
+        bit = LETTER_BITS.get(normalize_game_word(ch))
+        if bit is None:
+            return None
+        mask |= bit
+    return mask
+
+
+def word_points(word, level):
+    multiplier = LEVEL_MULTIPLIERS.get(str(level), 1)
+    return int(round(len(word) * 10 * multiplier))
+
+
+class WordEngine:
+    """
+    Проверка слов дейлика на сервере.
+
+    По правилам игры буквы поля можно использовать повторно, поэтому слово
+    собирается из поля, если множество его букв входит в множество букв поля.
+    Маски слов снимка уже посчитаны в words.bin (dictionary_binary), заново
+    считаются только слова, добавленные журналом; проверка слова — поиск
+    в dict и пара битовых операций.
+    Индекс перестраивается, только если изменилась версия DictionaryStore.
+
+    Для поиска всех решений слова дополнительно сгруппированы по маске.
+    У поля из N разных букв всего 2^N - 1 подмножеств (1023 для N=10),
+    так что «все слова из этих букв» — это перебор подмасок поля
+    и поиск каждой в dict, без прохода по словарю.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._version = None
+        self._masks = {}
+        self._buckets = {}
+
+    def _ensure_index(self):
+        version = self.store.refresh()
+        if version == self._version:
+            return self._masks
+        with self._lock:
+            if version != self._version:
+                version, base, overlay = self.store.snapshot()
+                masks = dict(base.game_items())
+                for word, entry in overlay.items():
+                    if entry is None:
+                        # Удаленное слово; с ё и без ё в словаре могут быть оба варианта
+                        game_word = normalize_game_word(word)
+                        if game_word in masks and not self._has_game_word(base, overlay, game_word):
+                            del masks[game_word]
+                masks.update(self._build_masks(e for e in overlay.values() if e is not None))
+                buckets = {}
+                for word, mask in masks.items():
+                    buckets.setdefault(mask, []).append(word)
+                self._masks, self._buckets = masks, buckets
+                self._version = version
+        return self._masks
+
+    @staticmethod
+    def _has_game_word(base, overlay, game_word):
+        # ё -> е: «ёлка» и «елка» дают одно игровое слово
+        variants = {game_word}
+        for i, ch in enumerate(game_word):
+            if ch == 'е':
+                variants |= {v[:i] + 'ё' + v[i + 1:] for v in variants}
+        for word in variants:
+            entry = overlay[word] if word in overlay else base.get(word)
+            if entry is not None:
+                return True
+        return False
+
+    def _build_masks(self, entries):
+        masks = {}
+        for entry in entries:
+            word = normalize_game_word(entry.get('word'))
+            # Слова с дефисом и прочими символами на поле не собрать
+            if len(word) < MIN_WORD_LENGTH or not GAME_WORD_RE.match(word):
+                continue
+            masks[word] = letters_mask(word)
+        return masks
+
+    def word_mask(self, word):
+        return self._ensure_index().get(normalize_game_word(word))
+
+    def validate_level(self, letters, words, level=None, swaps=0, wildcard_words=0):
+        """
+        Проверяет слова одного уровня.
+        swaps — сколько раз игрок менял букву на поле (каждая замена добавляет
+        одну новую букву), wildcard_words — сколько слов могли быть собраны
+        с джокером (одна любая буква).
+        Возвращает {"score", "accepted": [(слово, очки)], "rejected": [(слово, причина)]}.
+        """
+        masks = self._ensure_index()
+        level = str(level or len(letters))
+        grid_mask = letters_mask(letters) or 0
+
+        accepted, rejected, foreign = [], [], []
+        seen = set()
+        for raw in words:
+            word = normalize_game_word(raw) if isinstance(raw, str) else ''
+            if word in seen:
+                rejected.append((word, "duplicate"))
+                continue
+            seen.add(word)
+            mask = masks.get(word)
+            if mask is None:
+                rejected.append((word, "not_in_dictionary"))
+            elif mask & ~grid_mask:
+                foreign.append((word, mask & ~grid_mask))
+            else:
+                accepted.append(word)
+
+        if foreign:
+            # Заменой в поле могли появиться новые буквы: считаем ими самые частые
+            # «чужие» буквы, остальное может покрыть только джокер (одна буква на слово)
+            swapped_mask = 0
+            if swaps:
+                counter = Counter(ch for _, m in foreign for ch, bit in LETTER_BITS.items() if m & bit)
+                for ch, _ in counter.most_common(swaps):
+                    swapped_mask |= LETTER_BITS[ch]
+            for word, extra in foreign:
+                extra &= ~swapped_mask
+                if not extra:
+                    accepted.append(word)
+                elif wildcard_words > 0 and extra & (extra - 1) == 0:
+                    wildcard_words -= 1
+                    accepted.append(word)
+                else:
+                    rejected.append((word, "letters_not_in_grid"))
+
+        scored = [(w, word_points(w, level)) for w in accepted]
+        return {
+            "score": sum(points for _, points in scored),
+            "accepted": scored,
+            "rejected": rejected,
+        }
+
+    def validate_challenge(self, challenge_letters, level_words, swaps=0, wildcard_words=0):
+        """Проверка сразу нескольких уровней: {"10": [слова], "8": [...], ...}"""
+        results = {}
+        for level, words in (level_words or {}).items():
+            letters = (challenge_letters or {}).get(str(level))
+            if not letters or not isinstance(words, list):
+                continue
+            results[str(level)] = self.validate_level(letters, words, level, swaps, wildcard_words)
+        return results
+
+    def buckets(self):
+        """Слова, сгруппированные по маске букв: {маска: [слова]}"""
+        self._ensure_index()
+        return self._buckets
+
+    # --- ВСЕ РЕШЕНИЯ ПОЛЯ ---
+
+    def solutions(self, letters, min_length=MIN_WORD_LENGTH):
+        """Все слова словаря, которые собираются из букв поля (длинные первыми)"""
+        self._ensure_index()
+        buckets = self._buckets
+        grid_mask = letters_mask(letters) or 0
+        found = []
+        sub = grid_mask
+        while sub:
+            words = buckets.get(sub)
+            if words:
+                found.extend(w for w in words if len(w) >= min_length)
+            sub = (sub - 1) & grid_mask
+        found.sort(key=lambda w: (-len(w), w))
+        return found
+
+    def solution_stats(self, letters, level=None, long_length=7):
+        """Сводка по полю: число слов, длинных (редких) слов и максимум очков"""
+        level = str(level or len(letters))
+        words = self.solutions(letters)
+        return {
+            "count": len(words),
+            "longWords": sum(1 for w in words if len(w) >= long_length),
+            "maxScore": sum(word_points(w, level) for w in words),
+        }
@@ -0,0 +1,251 @@
+import os
+import array
+import threading
+from bisect import bisect_left
+
+from dictionary_store import normalize_word
+
+# Поиск по словарю для админки: по префиксу, с опечатками и по подстроке
+SEARCH_MODES = ("prefix", "fuzzy", "substring")
+SEARCH_PAGE_SIZE = int(os.environ.get('SEARCH_PAGE_SIZE', 50))
+SEARCH_MAX_PAGE_SIZE = 200
+# Максимальное расстояние Левенштейна для поиска с опечатками
+FUZZY_MAX_DISTANCE = 2
+# Запрос длиннее самого длинного слова словаря (24 буквы) ничего не найдет
+SEARCH_MAX_QUERY_LENGTH = int(os.environ.get('SEARCH_MAX_QUERY_LENGTH', 32))
+# Расстояние 2 перебирает всех соседей запроса: число удалений растет как длина^2
+FUZZY2_MAX_QUERY_LENGTH = int(os.environ.get('FUZZY2_MAX_QUERY_LENGTH', 12))
+NGRAM_SIZE = 3
+# Индекс удалений разбит на 2^16 корзин по старшим битам хеша
+BUCKET_BITS = 16
+
+
+def edit_distance(a, b, max_distance):
+    """Расстояние Левенштейна, если оно не больше max_distance, иначе None"""
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        # Строка таблицы целиком больше порога — дальше расстояние только растет
+        if min(current) > max_distance:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= max_distance else None
+
+
+def _deletes(word):
+    """Слово и все варианты без одной буквы"""
+    return {word} | {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _hash32(s):
+    # hash() строки свой в каждом процессе, но индекс тоже живет в процессе
+    return hash(s) & 0xFFFFFFFF
+
+
+def _ngrams(word):
+    """Все подстроки длины 1..NGRAM_SIZE"""
+    return {word[i:i + n] for n in range(1, NGRAM_SIZE + 1) for i in range(len(word) - n + 1)}
+
+
+class WordSearch:
+    """
+    Поиск по словарю DictionaryStore.
+
+    prefix    — двоичный поиск по отсортированным словам снимка words.bin, без своего индекса.
+    fuzzy     — индекс удалений в духе SymSpell: для каждого слова — оно само и все
+                варианты без одной буквы. Слова на расстоянии 1 от запроса находятся
+                поиском удалений запроса в индексе; на расстоянии 2 — через соседей
+                запроса на расстоянии 1 (удаления глубины 2 для всего словаря —
+                в разы больше памяти и секунды построения). Индекс — отсортированный
+                array из (хеш удаления << 32 | номер слова), без отдельных строк,
+                и оглавление корзин по старшим битам хеша вместо двоичного поиска.
+    substring — индекс n-грамм (подстрок длины 1..3): номера слов, где они встречаются.
+                Запрос до 3 букв — готовый список, длиннее — пересечение списков его
+                триграмм и проверка подстрокой.
+
+    Индексы строятся лениво при первом поиске в своем режиме и только по снимку
+    words.bin; правки из журнала (их немного, до сжатия) проверяются перебором.
+    Новый снимок (после сжатия журнала или перезагрузки) — индексы строятся заново.
+    Индекс хранится вместе со снимком, по которому построен, — (base, ...), — и
+    кэшируется, только если этот снимок все еще текущий.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._deletes = None
+        self._ngrams = None
+        self.builds = 0
+
+    def _snapshot(self):
+        _, base, overlay = self.store.snapshot()
+        # Индексы старого снимка больше не нужны — отпускаем память
+        if self._deletes is not None and self._deletes[0] is not base:
+            self._deletes = None
+        if self._ngrams is not None and self._ngrams[0] is not base:
+            self._ngrams = None
+        return base, overlay
+
+    def _is_current(self, base):
+        return self.store.snapshot()[1] is base
+
+    # --- ИНДЕКСЫ ---
+
+    def _deletes_index(self, base):
+        cached = self._deletes
+        if cached is None or cached[0] is not base:
+            with self._lock:
+                cached = self._deletes
+                if cached is None or cached[0] is not base:
+                    keys, alphabet = [], set()
+                    for i, word in enumerate(base.words()):
+                        alphabet.update(word)
+                        keys.extend(_hash32(d) << 32 | i for d in _deletes(word))
+                    keys.sort()
+                    shift = 64 - BUCKET_BITS
+                    buckets = array.array('I', (bisect_left(keys, b << shift) for b in range(1 << BUCKET_BITS)))
+                    buckets.append(len(keys))
+                    cached = (base, (array.array('Q', keys), buckets), ''.join(sorted(alphabet)))
+                    self.builds += 1
+                    # Пока строили, снимок могли сменить: такой индекс отдаем только этому поиску
+                    if self._is_current(base):
+                        self._deletes = cached
+        return cached[1], cached[2]
+
+    def _ngram_index(self, base):
+        cached = self._ngrams
+        if cached is None or cached[0] is not base:
+            with self._lock:
+                cached = self._ngrams
+                if cached is None or cached[0] is not base:
+                    postings = {}
+                    for i, word in enumerate(base.words()):
+                        for gram in _ngrams(word):
+                            postings.setdefault(gram, []).append(i)
+                    cached = (base, {gram: array.array('I', ids) for gram, ids in postings.items()})
+                    self.builds += 1
+                    if self._is_current(base):
+                        self._ngrams = cached
+        return cached[1]
+
+    # --- ПОИСК ПО СНИМКУ ---
+
+    @staticmethod
+    def _lookup_deletes(index, deletes):
+        """Номера слов снимка, у которых есть хотя бы одно из удалений deletes"""
+        keys, buckets = index
+        shift = 32 - BUCKET_BITS
+        found = set()
+        for d in deletes:
+            h = _hash32(d)
+            b = h >> shift
+            found.update(k & 0xFFFFFFFF for k in keys[buckets[b]:buckets[b + 1]] if k >> 32 == h)
+        return found
+
+    def _fuzzy_matches(self, base, query, distance, deleted):
+        """[(расстояние, слово)] снимка в пределах distance от запроса"""
+        index, alphabet = self._deletes_index(base)
+        deletes = _deletes(query)
+        if distance > 1:
+            # Слово на расстоянии 2 — на расстоянии 1 от какого-то соседа запроса
+            neighbours = set()
+            for i in range(len(query) + 1):
+                for ch in alphabet:
+                    neighbours.add(query[:i] + ch + query[i:])
+                    if i < len(query):
+                        neighbours.add(query[:i] + ch + query[i + 1:])
+            for neighbour in neighbours:
+                deletes |= _deletes(neighbour)
+            for d in _deletes(query):
+                deletes |= _deletes(d)
+        candidates = self._lookup_deletes(index, deletes)
+        # Совпадение удалений — еще не расстояние (и хеши могут совпасть): проверяем честно
+        found = []
+        for i in candidates - deleted:
+            word = base.word(i)
+            d = edit_distance(query, word, distance)
+            if d is not None:
+                found.append((d, word))
+        return found
+
+    def _substring_ids(self, base, query):
+        index = self._ngram_index(base)
+        if len(query) <= NGRAM_SIZE:
+            return index.get(query, ())
+        postings = sorted((index.get(query[i:i + NGRAM_SIZE], ()) for i in range(len(query) - NGRAM_SIZE + 1)), key=len)
+        ids = set(postings[0])
+        for other in postings[1:3]:
+            if not ids:
+                break
+            ids.intersection_update(other)
+        return [i for i in sorted(ids) if query in base.word(i)]
+
+    # --- ПОИСК ---
+
+    def search(self, query, mode="prefix", offset=0, limit=SEARCH_PAGE_SIZE, distance=1):
+        """
+        Страница результатов: {"items": [записи], "total", "offset", "limit"}.
+        prefix и substring — по алфавиту, fuzzy — по расстоянию, затем по алфавиту
+        (в записях fuzzy есть поле "distance").
+        ValueError — неизвестный режим или слишком длинный запрос.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"unknown search mode: {mode}")
+        query = normalize_word(query)
+        offset = max(0, offset)
+        limit = min(max(1, limit), SEARCH_MAX_PAGE_SIZE)
+        distance = min(max(1, distance), FUZZY_MAX_DISTANCE)
+        if len(query) > SEARCH_MAX_QUERY_LENGTH:
+            raise ValueError(f"query longer than {SEARCH_MAX_QUERY_LENGTH}")
+        if mode == "fuzzy" and distance > 1 and len(query) > FUZZY2_MAX_QUERY_LENGTH:
+            raise ValueError(f"distance 2 is limited to {FUZZY2_MAX_QUERY_LENGTH} letters")
+        base, overlay = self._snapshot()
+        if not query:
+            return {"items": [], "total": 0, "offset": offset, "limit": limit}
+
+        # Правки журнала поверх снимка: удаленные убираем, добавленные проверяем перебором
+        deleted = {base.find(w) for w, entry in overlay.items() if entry is None} - {-1}
+        added = [w for w, entry in overlay.items() if entry is not None and base.find(w) < 0]
+
+        if mode == "fuzzy":
+            found = self._fuzzy_matches(base, query, distance, deleted)
+            for word in added:
+                d = edit_distance(query, word, distance)
+                if d is not None:
+                    found.append((d, word))
+            found.sort()
+            items = [dict(self._entry(base, overlay, w), distance=d) for d, w in found[offset:offset + limit]]
+            return {"items": items, "total": len(found), "offset": offset, "limit": limit}
+
+        if mode == "prefix":
+            lo, hi = base.prefix_range(query)
+            ids = range(lo, hi)
+            added = [w for w in added if w.startswith(query)]
+        else:
+            ids = self._substring_ids(base, query)
+            added = [w for w in added if query in w]
+        if deleted:
+            ids = [i for i in ids if i not in deleted]
+        if added:
+            page = sorted([base.word(i) for i in ids] + added)[offset:offset + limit]
+        else:
+            # Обычный случай: слова декодируются только для страницы
+            page = [base.word(i) for i in ids[offset:offset + limit]]
+        items = [self._entry(base, overlay, w) for w in page]
+        return {"items": items, "total": len(ids) + len(added), "offset": offset, "limit": limit}
+
+    @staticmethod
+    def _entry(base, overlay, word):
+        entry = overlay[word] if word in overlay else base.get(word)
+        return dict(entry)
+
+    def stats(self):
+        return {
+            "builds": self.builds,
+            "fuzzyKeys": len(self._deletes[1][0]) if self._deletes is not None else 0,
+            "ngrams": len(self._ngrams[1]) if self._ngrams is not None else 0,
+        }
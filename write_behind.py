@@ -0,0 +1,192 @@
+import os
+import time
+import atexit
+import logging
+import threading
+
+log = logging.getLogger("slovodel.write_behind")
+
+# Сколько секунд копим правки перед записью в базу (0 — писать сразу)
+USER_WRITE_DELAY = float(os.environ.get('USER_WRITE_DELAY', 2))
+# Сколько раз повторяем неудачную запись, прежде чем сдаться и сообщить в лог
+USER_WRITE_RETRIES = int(os.environ.get('USER_WRITE_RETRIES', 3))
+
+
+class WriteBehindBuffer:
+    """
+    Отложенная запись с объединением правок.
+    submit(key, changes) складывает изменения в буфер: пока запись по ключу
+    ждет своей очереди, новые правки того же ключа сливаются в нее (последнее
+    значение поля побеждает). Фоновый поток пишет ключ не позже чем через
+    delay секунд после первой правки, одним вызовом flush_fn(key, changes).
+    flush(key) пишет сразу — его зовут перед чтением, которому нужна свежая строка.
+    take(key) забирает правки ключа без записи — их пишет сам вызывающий.
+
+    Неудачная запись возвращается в буфер (более новые правки поверх нее) и
+    повторяется через delay * номер попытки; после retries попыток правки
+    выбрасываются с ошибкой в логе и счетчиком dropped.
+
+    Буфер живет в памяти процесса: у каждого воркера gunicorn свой, поэтому
+    в него кладут только то, что можно записать с опозданием и без потерь
+    от гонок между воркерами (не деньги).
+    """
+
+    def __init__(self, flush_fn, delay=USER_WRITE_DELAY, retries=USER_WRITE_RETRIES, name="write-behind"):
+        self.flush_fn = flush_fn
+        self.delay = delay
+        self.retries = retries
+        self.name = name
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._deadlines = {}
+        self._attempts = {}
+        self._in_flight = set()
+        self._thread = None
+        self.submitted = 0
+        self.flushes = 0
+        self.writes = 0
+        self.merged = 0
+        self.unchanged = 0
+        self.taken = 0
+        self.errors = 0
+        self.retried = 0
+        self.dropped = 0
+        atexit.register(self.close)
+
+    def submit(self, key, changes):
+        if self.delay <= 0:
+            with self._cond:
+                self.submitted += 1
+                self._wait_idle(key)
+                self._in_flight.add(key)
+            self._write(key, changes)
+            return
+        with self._cond:
+            self.submitted += 1
+            if key in self._pending:
+                self._pending[key].update(changes)
+                self.merged += 1
+            else:
+                self._pending[key] = dict(changes)
+                self._deadlines[key] = time.monotonic() + self.delay
+            self._start()
+            self._cond.notify()
+
+    def take(self, key):
+        """Забрать отложенные правки ключа (или None), чтобы записать их вместе со своими"""
+        with self._cond:
+            self._wait_idle(key)
+            changes = self._pending.pop(key, None)
+            self._deadlines.pop(key, None)
+            self._attempts.pop(key, None)
+            if changes:
+                self.taken += 1
+            return changes
+
+    def flush(self, key=None):
+        """Записать сразу правки ключа (или все) и дождаться записи"""
+        with self._cond:
+            keys = [key] if key is not None else list(self._pending)
+            batch = []
+            for k in keys:
+                self._wait_idle(k)
+                changes = self._take(k)
+                if changes:
+                    batch.append((k, changes))
+        for k, changes in batch:
+            self._write(k, changes)
+
+    def close(self):
+        """При остановке процесса: последняя попытка записать все, что осталось"""
+        self.flush()
+        with self._cond:
+            for key, changes in self._pending.items():
+                self.dropped += 1
+                log.error("write-behind changes dropped on exit", extra={
+                    "buffer": self.name, "key": key, "fields": sorted(changes)})
+            self._pending.clear()
+            self._deadlines.clear()
+            self._attempts.clear()
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _wait_idle(self, key):
+        # Запись по ключу уже идет в другом потоке — ждем ее, чтобы не перепутать порядок
+        while key in self._in_flight:
+            self._cond.wait()
+
+    def _take(self, key):
+        changes = self._pending.pop(key, None)
+        self._deadlines.pop(key, None)
+        if changes:
+            self._in_flight.add(key)
+        return changes
+
+    def _write(self, key, changes):
+        try:
+            self.flushes += 1
+            written = self.flush_fn(key, changes)
+        except Exception as e:
+            with self._cond:
+                self.errors += 1
+                self._retry(key, changes, e)
+        else:
+            with self._cond:
+                self.writes += 1 if written else 0
+                self.unchanged += 0 if written else 1
+                self._attempts.pop(key, None)
+        finally:
+            with self._cond:
+                self._in_flight.discard(key)
+                self._cond.notify_all()
+
+    def _retry(self, key, changes, error):
+        attempt = self._attempts.get(key, 0) + 1
+        if attempt > self.retries:
+            self._attempts.pop(key, None)
+            self.dropped += 1
+            log.error("write-behind changes dropped", extra={
+                "buffer": self.name, "key": key, "fields": sorted(changes), "error": str(error)})
+            return
+        self._attempts[key] = attempt
+        self.retried += 1
+        log.warning("write-behind flush failed, will retry", extra={
+            "buffer": self.name, "key": key, "attempt": attempt, "error": str(error)})
+        # Пока шла запись, могли прийти более новые правки — они важнее
+        changes = dict(changes)
+        changes.update(self._pending.get(key, {}))
+        self._pending[key] = changes
+        self._deadlines[key] = time.monotonic() + self.delay * attempt
+        self._start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                due = [k for k, d in self._deadlines.items() if d <= now and k not in self._in_flight]
+                if not due:
+                    timeout = min(self._deadlines.values()) - now if self._deadlines else None
+                    self._cond.wait(timeout if timeout is None or timeout > 0 else 0.01)
+                    continue
+                batch = [(k, self._take(k)) for k in due]
+            for key, changes in batch:
+                self._write(key, changes)
+
+    def stats(self):
+        return {
+            "submitted": self.submitted,
+            "flushes": self.flushes,
+            "writes": self.writes,
+            "merged": self.merged,
+            "unchanged": self.unchanged,
+            "taken": self.taken,
+            # Сколько записей в базу не понадобилось: слитые, забранные в чужую запись и пустые
+            "savedWrites": self.merged + self.taken + self.unchanged,
+            "pending": len(self._pending),
+            "errors": self.errors,
+            "retried": self.retried,
+            "dropped": self.dropped,
+        }